@@ -0,0 +1,211 @@
+"""
+Per athlete counters against the vectorized weekly analysis.
+
+Every athlete has `--per-athlete` activities spread over the week. The
+counters (one `Counter` and one row assignment per athlete) grow with
+athletes x rows, so they are only timed up to `--max-loop` athletes.
+
+With `--season`, a season of `--weeks` weeks is saved instead, with
+`--per-day` activities of every athlete and day. Every week is analyzed
+with the daily totals aggregated by sqlite (`get_weekly_totals`) and with
+every activity loaded (`get_weekly_activities`), and the wall time and
+the peak of the memory allocated (traced in a second run) are compared.
+
+Usage: python benchmarks/bench_analysis.py [n_athletes ...]
+(1k, 10k and 100k athletes by default) or
+python benchmarks/bench_analysis.py --season [n_athletes ...] [--weeks N]
+[--per-day N] (1k athletes, 52 weeks and 3 activities per day by default).
+"""
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from common import (ATHLETE_NAME, isolated_home, print_table, reset_database,
+                    timer)
+
+isolated_home()
+
+from strava_reporter.activities import Activity  # noqa: E402
+from strava_reporter.analysis import WeeklyAnalysis  # noqa: E402
+from strava_reporter.athletes import Athlete  # noqa: E402
+from strava_reporter.handlers.database import DBHandler  # noqa: E402
+from strava_reporter.utils import time as time_utils  # noqa: E402
+from strava_reporter.utils.time import Week  # noqa: E402
+
+WEEK = Week(week_number=1, week_start="2023-04-03", week_end="2023-04-09")
+DATES = [str(x)[:10] for x in pd.date_range("2023-04-03", periods=7)]
+
+
+def get_athletes(n: int, per_athlete: int):
+    """Build `n` athletes with random activities."""
+    rng = np.random.default_rng(0)
+    days = rng.integers(0, 7, size=(n, per_athlete))
+    secs = rng.choice([600, 900, 1800, 3600], size=(n, per_athlete))
+    athletes = []
+    for i in range(n):
+        athlete = Athlete("Athlete {}".format(i), "Athlete{} X.".format(i))
+        for j in range(per_athlete):
+            athlete.activities.append(Activity(
+                activity_id="{}-{}".format(i, j),
+                athlete=athlete.strava_name,
+                name="Activity",
+                date=DATES[days[i, j]],
+                elapsed_time=int(secs[i, j]),
+            ))
+        athletes.append(athlete)
+    return athletes
+
+
+def get_frame(athletes) -> pd.DataFrame:
+    """Get the activities of every athlete as a single frame."""
+    return pd.DataFrame(
+        [
+            (x.athlete, x.date_unix, x.time.total_seconds())
+            for athlete in athletes
+            for x in athlete.activities
+        ],
+        columns=["athlete", "date_unix", "duration_secs"],
+    )
+
+
+def main(sizes, per_athlete, max_loop):
+    """Run the benchmark for every number of athletes."""
+    rows = []
+    for n in sizes:
+        athletes = get_athletes(n, per_athlete)
+        names = [x.name for x in athletes]
+        mapping = {x.strava_name: x.name for x in athletes}
+        frame = get_frame(athletes)
+        results = {}
+
+        vectorized = WeeklyAnalysis(names, WEEK, "csv")
+        with timer(results, "vectorized"):
+            vectorized.count_activities(frame, mapping)
+
+        if n <= max_loop:
+            loop = WeeklyAnalysis(names, WEEK, "csv")
+            with timer(results, "loop"):
+                for athlete in athletes:
+                    loop.count_athlete_activities(athlete)
+            pd.testing.assert_frame_equal(vectorized.data, loop.data)
+            speedup = "{:.1f}x".format(
+                results["loop"] / results["vectorized"]
+            )
+        else:
+            speedup = "-"
+
+        rows.append((
+            n,
+            len(frame),
+            results.get("loop", "-"),
+            results["vectorized"],
+            speedup,
+        ))
+
+    print_table(
+        ("athletes", "activities", "loop_s", "vectorized_s", "speedup"), rows
+    )
+
+
+def build_season(db, n_athletes, weeks, per_day):
+    """Save `per_day` activities of every athlete and day of the season."""
+    first_day = time_utils.str_to_timestamp(DATES[0])
+    last_day = first_day + pd.DateOffset(days=7 * weeks - 1)
+    db.fill_weeks(DATES[0], str(last_day)[:10])
+    for i in range(n_athletes):
+        db.add_athlete("Athlete {}".format(i), ATHLETE_NAME.format(i))
+
+    rng = np.random.default_rng(0)
+    for week_number in range(1, weeks + 1):
+        secs = rng.choice([300, 600, 900, 1800], size=(n_athletes, 7, per_day))
+        week_start = first_day + pd.DateOffset(days=7 * (week_number - 1))
+        activities = []
+        for day in range(7):
+            ts = week_start + pd.DateOffset(days=day)
+            date, date_unix = str(ts)[:10], time_utils.timestamp_to_unix(ts)
+            for i in range(n_athletes):
+                for j in range(per_day):
+                    key = "{}-{}-{}-{}".format(week_number, day, i, j)
+                    activities.append((
+                        key, week_number, "Run", ATHLETE_NAME.format(i),
+                        int(secs[i, day, j]), date, date_unix + 60 * j,
+                        "fp-" + key,
+                    ))
+        db.add_activities(activities)
+
+
+def analyze_season(db, weeks, names, mapping, in_db):
+    """Analyze every week of the season and get the days of every week."""
+    days = []
+    for week_number in range(1, weeks + 1):
+        week = Week(**db.get_week_information(week_number))
+        analysis = WeeklyAnalysis(names, week, "csv")
+        if in_db:
+            analysis.count_daily_totals(db.get_weekly_totals(week_number))
+        else:
+            analysis.count_activities(
+                db.get_weekly_activities(week_number, as_frame=True), mapping
+            )
+        days.append(analysis.data["TOTAL_DAYS"].values)
+    return days
+
+
+def main_season(sizes, weeks, per_day):
+    """Run the season benchmark for every number of athletes."""
+    rows = []
+    for n in sizes:
+        reset_database()
+        db = DBHandler()
+        build_season(db, n, weeks, per_day)
+        names = ["Athlete {}".format(i) for i in range(n)]
+        mapping = dict(zip(map(ATHLETE_NAME.format, range(n)), names))
+
+        results, peaks, days = {}, {}, {}
+        for label, in_db in (("sql", True), ("load", False)):
+            with timer(results, label):
+                days[label] = analyze_season(db, weeks, names, mapping, in_db)
+
+            tracemalloc.start()
+            analyze_season(db, weeks, names, mapping, in_db)
+            peaks[label] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        for sql_days, load_days in zip(days["sql"], days["load"]):
+            np.testing.assert_array_equal(sql_days, load_days)
+        rows.append((
+            n,
+            n * weeks * 7 * per_day,
+            results["sql"],
+            results["load"],
+            "{:.1f}x".format(results["load"] / results["sql"]),
+            "{:.1f}".format(peaks["sql"] / 1e6),
+            "{:.1f}".format(peaks["load"] / 1e6),
+        ))
+
+    print_table(
+        (
+            "athletes", "activities", "sql_s", "load_s", "speedup",
+            "sql_peak_mb", "load_peak_mb",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", type=int, nargs="*")
+    parser.add_argument("--per-athlete", type=int, default=5)
+    parser.add_argument("--max-loop", type=int, default=10000)
+    parser.add_argument("--season", action="store_true")
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--per-day", type=int, default=3)
+    args = parser.parse_args()
+    if args.season:
+        main_season(args.sizes or [1000], args.weeks, args.per_day)
+    else:
+        main(
+            args.sizes or [1000, 10000, 100000],
+            args.per_athlete,
+            args.max_loop,
+        )
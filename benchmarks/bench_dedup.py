@@ -0,0 +1,85 @@
+"""
+Legacy list-based dedup against the fingerprint set on a synthetic feed.
+
+Yesterday's activities are all known and `new` activities were added on top
+of the feed since. The legacy path hashes every activity twice and checks a
+list of yesterday's ids; the fingerprint path hashes once and stops at the
+first known fingerprint.
+
+Usage: python benchmarks/bench_dedup.py [--feed N] [--new N ...]
+(a 50k-activity feed with 100, 1k and 10k new activities by default).
+"""
+import argparse
+
+import pandas as pd
+from common import club_activity, isolated_home, print_table, timer
+
+isolated_home()
+
+from strava_reporter.activities import Activity, dict_hash  # noqa: E402
+from strava_reporter.pipeline import deduplicate, normalize  # noqa: E402
+from strava_reporter.utils.time import str_to_timestamp  # noqa: E402
+
+DATE = str_to_timestamp("2023-04-05")
+
+
+def legacy(feed, date, last_hashes):
+    """Dedup as it was done before fingerprints were stored."""
+    today = str(date)[:10]
+    yesterday = str(date - pd.Timedelta(days=1))[:10]
+    activities = []
+    for activity_raw in feed:
+        activity_raw_dict = dict(activity_raw)
+        activity_raw_dict["date"] = yesterday
+        if dict_hash(activity_raw_dict) in last_hashes:
+            break
+        activity_raw_dict["date"] = today
+        activities.append(
+            Activity(
+                activity_id=dict_hash(activity_raw_dict),
+                **activity_raw_dict
+            )
+        )
+    return activities
+
+
+def main(feed_size, new_sizes):
+    """Run the benchmark for every number of new activities."""
+    yesterday = str(DATE - pd.Timedelta(days=1))[:10]
+    rows = []
+    for n_new in new_sizes:
+        feed = [club_activity(i, 500) for i in range(feed_size)]
+        old = feed[n_new:]
+        last_hashes = [
+            dict_hash({**x, "date": yesterday}) for x in old
+        ]
+        fingerprints = {dict_hash(x) for x in old}
+
+        results = {}
+        with timer(results, "legacy"):
+            saved_legacy = legacy(feed, DATE, last_hashes)
+        with timer(results, "fingerprints"):
+            saved = list(deduplicate(normalize(feed), DATE, fingerprints))
+        assert len(saved) == len(saved_legacy) == n_new
+
+        rows.append((
+            feed_size,
+            n_new,
+            results["legacy"],
+            results["fingerprints"],
+            "{:.1f}x".format(results["legacy"] / results["fingerprints"]),
+        ))
+
+    print_table(
+        ("feed", "new", "legacy_s", "fingerprints_s", "speedup"), rows
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--feed", type=int, default=50000)
+    parser.add_argument(
+        "--new", type=int, nargs="*", default=[100, 1000, 10000]
+    )
+    args = parser.parse_args()
+    main(args.feed, args.new)
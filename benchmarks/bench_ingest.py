@@ -0,0 +1,118 @@
+"""
+End-to-end ingest throughput: fetch, dedup and database write.
+
+Synthetic club feeds are recorded as JSONL and ingested into a fresh
+database, either replayed from the file or served over HTTP by
+`ReplayServer` and read by `ClubActivitiesFetcher` (--server). The time
+includes the analysis update of the ingested days.
+
+Usage: python benchmarks/bench_ingest.py [n_activities ...] [--server]
+(100, 10k and 1M activities by default).
+"""
+import argparse
+import json
+
+from common import (ATHLETE_NAME, club_activity, isolated_home, print_table,
+                    reset_database, timer)
+
+HOME = isolated_home()
+
+from strava_reporter.athletes import Athletes  # noqa: E402
+from strava_reporter.handlers import sources, strava  # noqa: E402
+from strava_reporter.handlers.database import DBHandler  # noqa: E402
+from strava_reporter.pipeline import ingest  # noqa: E402
+from strava_reporter.utils.time import str_to_timestamp  # noqa: E402
+
+DATE = str_to_timestamp("2023-04-05")
+N_ATHLETES = 500
+
+
+class ServerSource(sources.ActivitySource):
+    """Club activities read over HTTP from a replay server."""
+
+    def __init__(self, url: str, per_page: int):
+        """Set instance attributes."""
+        # No limits, only the throughput of the fetcher is measured.
+        limiter = strava.RateLimiter(short_limit=10 ** 9, long_limit=10 ** 9)
+        self.fetcher = strava.ClubActivitiesFetcher(
+            "token", 1, per_page=per_page, base_url=url,
+            rate_limiter=limiter,
+        )
+
+    @property
+    def api_calls(self) -> int:
+        """int: The number of pages requested so far."""
+        return self.fetcher.api_calls
+
+    def iter_club_activities(self, limit=None, offset=0):
+        """Stream the club activities from the server."""
+        return self.fetcher.iter_activities(limit, offset)
+
+
+def write_fixture(n: int):
+    """Record a synthetic feed of `n` activities."""
+    path = HOME / "feed_{}.jsonl".format(n)
+    with open(path, "w") as f:
+        for i in range(n):
+            f.write(json.dumps(club_activity(i, N_ATHLETES)) + "\n")
+    return path
+
+
+def get_database() -> DBHandler:
+    """Get a handler on a fresh database with weeks and athletes."""
+    reset_database()
+    db = DBHandler()
+    db.fill_weeks("2023-04-03", "2023-04-30")
+    with db.transaction():
+        for i in range(N_ATHLETES):
+            db.add_athlete("Athlete {}".format(i), ATHLETE_NAME.format(i))
+    return db
+
+
+def main(sizes, server, per_page, batch_size):
+    """Run the benchmark for every number of activities."""
+    rows = []
+    for n in sizes:
+        fixture = write_fixture(n)
+        db = get_database()
+        results = {}
+
+        if server:
+            feed = sources.read_fixture(fixture)
+            with sources.ReplayServer(feed) as replay:
+                source = ServerSource(replay.url, per_page)
+                with timer(results, "ingest"):
+                    pipeline = ingest(
+                        db, Athletes(), source, DATE, batch_size=batch_size
+                    )
+        else:
+            source = sources.ReplaySource(fixture, per_page=per_page)
+            with timer(results, "ingest"):
+                pipeline = ingest(
+                    db, Athletes(), source, DATE, batch_size=batch_size
+                )
+
+        saved = db.conn.execute("SELECT COUNT(*) FROM ACTIVITIES")
+        assert pipeline.saved == saved.fetchone()[0] == n
+        fixture.unlink()
+
+        rows.append((
+            n,
+            source.api_calls,
+            results["ingest"],
+            int(n / results["ingest"]),
+        ))
+
+    print_table(("activities", "pages", "seconds", "activities_per_s"), rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "sizes", type=int, nargs="*", default=[100, 10000, 1000000]
+    )
+    parser.add_argument("--server", action="store_true")
+    parser.add_argument("--per-page", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    main(args.sizes, args.server, args.per_page, args.batch_size)
@@ -0,0 +1,68 @@
+"""
+Per-row commits against batched inserts of synthetic activities.
+
+Usage: python benchmarks/bench_inserts.py [n_activities ...]
+(10k and 100k activities by default).
+"""
+import argparse
+
+from common import isolated_home, print_table, reset_database, timer
+
+isolated_home()
+
+from strava_reporter.handlers.database import DBHandler  # noqa: E402
+from strava_reporter.utils.time import date_to_unix  # noqa: E402
+
+# Synthetic activities are spread over the days of the first week.
+DAYS = ["2023-04-0{}".format(x) for x in range(3, 10)]
+
+
+def get_rows(n: int):
+    """Build the ACTIVITIES rows of `n` synthetic activities."""
+    dates = [(x, date_to_unix(x)) for x in DAYS]
+    for i in range(n):
+        date, date_unix = dates[i % len(dates)]
+        yield (
+            "id-{}".format(i), 1, "Activity {}".format(i),
+            "Athlete{} X.".format(i % 500), 600 + i % 3000, date, date_unix,
+            "fp-{}".format(i)
+        )
+
+
+def get_database() -> DBHandler:
+    """Get a handler on a fresh database with the weeks filled."""
+    reset_database()
+    db = DBHandler()
+    db.fill_weeks("2023-04-03", "2023-04-30")
+    return db
+
+
+def main(sizes):
+    """Run the benchmark for every number of activities."""
+    rows = []
+    for n in sizes:
+        results = {}
+
+        db = get_database()
+        with timer(results, "per_row"):
+            for row in get_rows(n):
+                db.add_activity(*row)
+
+        db = get_database()
+        with timer(results, "batched"):
+            db.add_activities(get_rows(n))
+
+        rows.append((
+            n,
+            results["per_row"],
+            results["batched"],
+            "{:.1f}x".format(results["per_row"] / results["batched"]),
+        ))
+
+    print_table(("activities", "per_row_s", "batched_s", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", type=int, nargs="*", default=[10000, 100000])
+    main(parser.parse_args().sizes)
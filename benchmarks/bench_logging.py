@@ -0,0 +1,77 @@
+"""
+Ingest throughput with the per-statement SQL tracing off and on.
+
+The same synthetic feed is replayed into a fresh database once with the
+tracing off (the default) and once with it on. The time includes writing
+the queued log records, and the size of the log file written by each run is
+reported.
+
+Usage: python benchmarks/bench_logging.py [n_activities ...]
+(10k and 100k activities by default).
+"""
+import argparse
+
+from bench_ingest import DATE, get_database, write_fixture
+from common import print_table, timer
+
+from strava_reporter.athletes import Athletes
+from strava_reporter.handlers.sources import ReplaySource
+from strava_reporter.pipeline import ingest
+from strava_reporter.utils.log import flush_logs, set_sql_tracing
+from strava_reporter.utils.path_index import LOG_PATH
+
+
+def _log_size():
+    return LOG_PATH.stat().st_size if LOG_PATH.exists() else 0
+
+
+def run(fixture, n, tracing, batch_size):
+    """Ingest a fixture and get the seconds and the bytes logged."""
+    db = get_database()
+    flush_logs()
+    logged = _log_size()
+
+    results = {}
+    set_sql_tracing(tracing)
+    try:
+        with timer(results, "ingest"):
+            pipeline = ingest(
+                db, Athletes(), ReplaySource(fixture), DATE,
+                batch_size=batch_size,
+            )
+            flush_logs()
+    finally:
+        set_sql_tracing(False)
+
+    assert pipeline.saved == n
+    return results["ingest"], _log_size() - logged
+
+
+def main(sizes, batch_size):
+    """Run the benchmark for every number of activities."""
+    rows = []
+    for n in sizes:
+        fixture = write_fixture(n)
+        for tracing in (False, True):
+            seconds, log_bytes = run(fixture, n, tracing, batch_size)
+            rows.append((
+                n,
+                "on" if tracing else "off",
+                seconds,
+                int(n / seconds),
+                "{:.1f}".format(log_bytes / 1000),
+            ))
+        fixture.unlink()
+
+    print_table(
+        ("activities", "tracing", "seconds", "activities_per_s", "log_kb"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", type=int, nargs="*", default=[10000, 100000])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    main(args.sizes, args.batch_size)
@@ -0,0 +1,148 @@
+"""
+Per-query latency of f-string SQL against bound parameters.
+
+Every query is run `n` times with a different value each time. With the
+values formatted into the SQL text (as the handlers did before), every
+query is a new statement that sqlite compiles again. With bound parameters
+the text never changes and the compiled statement is reused from the
+statement cache of the connection, whose size is set with
+`CONNECTION_POOL.configure(cached_statements=...)`. Bound parameters are
+also timed with the cache disabled.
+
+Usage: python benchmarks/bench_queries.py [n_queries ...]
+(10k and 100k queries by default).
+"""
+import argparse
+
+import pandas as pd
+from common import ATHLETE_NAME, isolated_home, print_table, timer
+
+isolated_home()
+
+from strava_reporter.handlers.connections import (  # noqa: E402
+    CACHED_STATEMENTS, CONNECTION_POOL)
+from strava_reporter.handlers.database import DBHandler  # noqa: E402
+from strava_reporter.utils.time import date_to_unix  # noqa: E402
+
+FIRST_DAY = "2023-01-02"
+DAYS = 364
+N_ATHLETES = 500
+
+# Queries as (f-string SQL, bound SQL, parameters) of the i-th value.
+QUERIES = {
+    "week_number": (
+        lambda i: (
+            "SELECT week_number FROM WEEKS WHERE {0} >= week_start_unix "
+            "AND {0} < week_end_unix".format(_unix(i))
+        ),
+        "SELECT week_number FROM WEEKS WHERE ? >= week_start_unix "
+        "AND ? < week_end_unix",
+        lambda i: (_unix(i), _unix(i)),
+    ),
+    "activities_of_day": (
+        lambda i: (
+            "SELECT activity_id FROM ACTIVITIES WHERE date = '{}'".format(
+                _date(i)
+            )
+        ),
+        "SELECT activity_id FROM ACTIVITIES WHERE date = ?",
+        lambda i: (_date(i),),
+    ),
+    "update_athlete": (
+        lambda i: (
+            "UPDATE ATHLETES SET weeks_completed = {} "
+            "WHERE strava_name = '{}'".format(i % 52, _athlete(i))
+        ),
+        "UPDATE ATHLETES SET weeks_completed = ? WHERE strava_name = ?",
+        lambda i: (i % 52, _athlete(i)),
+    ),
+}
+
+_DATES = [str(x)[:10] for x in pd.date_range(FIRST_DAY, periods=DAYS)]
+
+
+def _date(i):
+    return _DATES[i % DAYS]
+
+
+def _unix(i):
+    return date_to_unix(_date(i)) + i % 86400
+
+
+def _athlete(i):
+    return ATHLETE_NAME.format(i % N_ATHLETES)
+
+
+def build_database():
+    """Save the weeks, athletes and an activity per athlete and day."""
+    db = DBHandler()
+    db.fill_weeks(FIRST_DAY, _DATES[-1])
+    for i in range(N_ATHLETES):
+        db.add_athlete("Athlete {}".format(i), _athlete(i))
+    db.add_activities(
+        (
+            "id-{}-{}".format(day, i), day // 7 + 1, "Run", _athlete(i), 1800,
+            date, date_to_unix(date), "fp-{}-{}".format(day, i),
+        )
+        for day, date in enumerate(_DATES)
+        for i in range(0, N_ATHLETES, 50)
+    )
+
+
+def get_connection(cached_statements):
+    """Get a new connection with a statement cache of the given size."""
+    CONNECTION_POOL.close_all()
+    CONNECTION_POOL.configure(cached_statements=cached_statements)
+    return DBHandler().conn
+
+
+def run(conn, n, sql, params):
+    """Run a query `n` times and get the seconds."""
+    results = {}
+    with timer(results, "run"):
+        for i in range(n):
+            if params is None:
+                conn.execute(sql(i)).fetchall()
+            else:
+                conn.execute(sql, params(i)).fetchall()
+    # Updates are not kept.
+    conn.rollback()
+    return results["run"]
+
+
+def main(sizes):
+    """Run the benchmark for every number of queries."""
+    build_database()
+    rows = []
+    for n in sizes:
+        for query, (fstring, bound, params) in QUERIES.items():
+            seconds = {
+                "fstring": run(
+                    get_connection(CACHED_STATEMENTS), n, fstring, None
+                ),
+                "bound": run(
+                    get_connection(CACHED_STATEMENTS), n, bound, params
+                ),
+                "bound_no_cache": run(get_connection(0), n, bound, params),
+            }
+            rows.append((
+                query,
+                n,
+                *("{:.2f}".format(1e6 * x / n) for x in seconds.values()),
+                "{:.1f}x".format(seconds["fstring"] / seconds["bound"]),
+            ))
+
+    print_table(
+        (
+            "query", "queries", "fstring_us", "bound_us",
+            "bound_no_cache_us", "speedup",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", type=int, nargs="*", default=[10000, 100000])
+    args = parser.parse_args()
+    main(args.sizes)
@@ -0,0 +1,101 @@
+"""
+Reconciliation of a season of synthetic activities with the Zapier sheet.
+
+Every day has `per-day` ingested activities and the same rows in the sheet,
+plus 1% of rows that were never ingested. The benchmark times the sync of
+the whole sheet into the mirror, the hash join of a season of records with
+a season of activities, and the reconciliation of a single day through the
+database.
+
+Usage: python benchmarks/bench_reconcile.py [--days N] [--per-day N]
+(a 364-day season with 100 activities per day by default).
+"""
+import argparse
+
+import pandas as pd
+from common import ATHLETE_NAME, isolated_home, print_table, timer
+
+isolated_home()
+
+from strava_reporter import reconcile  # noqa: E402
+from strava_reporter.handlers import zapier  # noqa: E402
+from strava_reporter.handlers.database import DBHandler  # noqa: E402
+from strava_reporter.utils import time as time_utils  # noqa: E402
+
+FIRST_DAY = "2023-01-02"
+N_ATHLETES = 50
+
+
+def build_season(db, days, per_day):
+    """Save the activities of the season and build the rows of the sheet."""
+    first_day = time_utils.str_to_timestamp(FIRST_DAY)
+    last_day = first_day + pd.DateOffset(days=days - 1)
+    db.fill_weeks(FIRST_DAY, str(last_day)[:10])
+    for i in range(N_ATHLETES):
+        db.add_athlete("Athlete {}".format(i), ATHLETE_NAME.format(i))
+
+    sheet = [list(zapier.COLUMNS)]
+    activities = []
+    for day in range(days):
+        ts = first_day + pd.DateOffset(days=day)
+        date, date_unix = str(ts)[:10], time_utils.timestamp_to_unix(ts)
+        week_number = db.get_week_number(ts)
+        for j in range(per_day):
+            i = day * per_day + j
+            athlete = ATHLETE_NAME.format(i % N_ATHLETES)
+            name, secs = "Activity {}".format(i), 600 + i % 3000
+            sheet.append([athlete, name, secs, date_unix + 60 * j])
+            if i % 100 == 99:
+                # Never ingested.
+                continue
+            activities.append((
+                "id-{}".format(i), week_number, name, athlete, secs, date,
+                date_unix, "fp-{}".format(i),
+            ))
+    db.add_activities(activities)
+    return sheet, activities
+
+
+def main(days, per_day):
+    """Run the benchmark for a season."""
+    db = DBHandler()
+    sheet, activities = build_season(db, days, per_day)
+    mirror = zapier.ZapierMirror(db, zapier.LocalWorksheet(sheet))
+    columns = reconcile.get_zapier_columns()
+    first_day = time_utils.str_to_timestamp(FIRST_DAY)
+
+    results = {}
+    with timer(results, "sync"):
+        mirror.sync()
+
+    records = [dict(zip(sheet[0], map(str, row))) for row in sheet[1:]]
+    keys = [reconcile.activity_key(x[3], x[2], x[4]) for x in activities]
+    season = reconcile.Reconciliation(first_day)
+    with timer(results, "season_join"):
+        reconcile.join_activities(records, keys, [], season, columns)
+    assert season.matched == len(activities)
+    assert len(season.missing) == len(records) - len(activities)
+
+    day = first_day + pd.DateOffset(days=days // 2)
+    with timer(results, "day"):
+        reconciliation = reconcile.reconcile(db, day, mirror, sync=False)
+    assert reconciliation.matched == per_day - len(reconciliation.missing)
+
+    print_table(
+        ("rows", "sync_s", "season_join_s", "day_s", "rows_per_s"),
+        [(
+            len(records),
+            results["sync"],
+            results["season_join"],
+            results["day"],
+            "{:.0f}k".format(len(records) / results["season_join"] / 1000),
+        )],
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=364)
+    parser.add_argument("--per-day", type=int, default=100)
+    args = parser.parse_args()
+    main(args.days, args.per_day)
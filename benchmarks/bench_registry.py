@@ -0,0 +1,107 @@
+"""
+Assignment of activities to the athlete registry.
+
+The legacy registry (athletes set as attributes and a linear scan of the
+Strava names per activity) is timed on a sample of `--legacy-sample`
+activities and extrapolated, since it grows with athletes x activities.
+The registry is timed on every activity, one by one through its dict and
+at once with the vectorized table assignment.
+
+Usage: python benchmarks/bench_registry.py [--athletes N] [--activities N]
+(10k athletes and 1M activities by default).
+"""
+import argparse
+
+import numpy as np
+from common import ATHLETE_NAME, isolated_home, print_table, timer
+
+isolated_home()
+
+from strava_reporter.activities import ActivityTable  # noqa: E402
+from strava_reporter.athletes import Athlete, Athletes  # noqa: E402
+from strava_reporter.handlers.database import DBHandler  # noqa: E402
+
+
+class LegacyAthletes:
+    """The registry before it was keyed by Strava name."""
+
+    def __init__(self, athletes):
+        """Set instance attributes."""
+        self.athlete_strava_names = []
+        for athlete in athletes:
+            setattr(self, athlete["strava_name"], Athlete(**athlete))
+            self.athlete_strava_names.append(athlete["strava_name"])
+
+    def get_athlete(self, attr):
+        """Get a registered athlete with a linear scan."""
+        if attr not in self.athlete_strava_names:
+            return None
+        return getattr(self, attr)
+
+
+def get_table(n_activities, n_athletes):
+    """Build the activities, 1% of them by unregistered athletes."""
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, int(n_athletes * 1.01), size=n_activities)
+    return ActivityTable(
+        np.arange(n_activities).astype(str),
+        np.array([ATHLETE_NAME.format(x) for x in range(codes.max() + 1)])[
+            codes
+        ],
+        np.full(n_activities, 1680501600),
+        np.full(n_activities, 1800),
+    )
+
+
+def main(n_athletes, n_activities, legacy_sample):
+    """Run the benchmark."""
+    db = DBHandler()
+    with db.transaction():
+        for i in range(n_athletes):
+            db.add_athlete("Athlete {}".format(i), ATHLETE_NAME.format(i))
+    table = get_table(n_activities, n_athletes)
+    strava_names = [table.athletes[x] for x in table.athlete_codes]
+
+    results = {}
+    legacy = LegacyAthletes(db.get_active_athletes())
+    with timer(results, "legacy"):
+        for strava_name in strava_names[:legacy_sample]:
+            legacy.get_athlete(strava_name)
+    legacy_seconds = results["legacy"] * n_activities / legacy_sample
+
+    athletes = Athletes()
+    with timer(results, "dict"):
+        for strava_name in strava_names:
+            athletes.get_code(strava_name)
+
+    athletes = Athletes()
+    with timer(results, "table"):
+        athletes.assign_activities(table)
+    assigned = sum(len(x.activities) for x in athletes)
+
+    print_table(
+        ("method", "athletes", "activities", "seconds", "activities_per_s"),
+        [
+            (
+                "legacy (extrapolated)", n_athletes, n_activities,
+                legacy_seconds, int(n_activities / legacy_seconds),
+            ),
+            (
+                "registry dict", n_athletes, n_activities, results["dict"],
+                int(n_activities / results["dict"]),
+            ),
+            (
+                "registry table", n_athletes, assigned, results["table"],
+                int(n_activities / results["table"]),
+            ),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--athletes", type=int, default=10000)
+    parser.add_argument("--activities", type=int, default=1000000)
+    parser.add_argument("--legacy-sample", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.athletes, args.activities, args.legacy_sample)
@@ -0,0 +1,115 @@
+"""
+Reading a season of reports as csv files against the pyarrow datasets.
+
+Synthetic weekly reports of `n-athletes` athletes are written for every
+week of the season in every format. The csv season is read by globbing the
+weekly files and concatenating them, and the parquet and feather seasons
+with `read_season`, both whole and filtered to a single athlete. The size
+on disk of the weekly csv files and of the season datasets is reported.
+
+Usage: python benchmarks/bench_reports.py [n_athletes ...] [--weeks N]
+(1k and 10k athletes over 52 weeks by default).
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+from common import isolated_home, print_table, timer
+
+isolated_home()
+
+from strava_reporter import reports  # noqa: E402
+
+DAYS = [
+    "MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY",
+    "SUNDAY",
+]
+
+
+def get_report(n, rng):
+    """Build the weekly report of `n` athletes with random days."""
+    valid = rng.random((n, len(DAYS))) < 0.5
+    athletes = ["Athlete {}".format(i) for i in range(n)]
+    data = pd.DataFrame({"ATHLETE": athletes})
+    for i, day in enumerate(DAYS):
+        data[day] = np.where(valid[:, i], 1, None)
+    data["TOTAL_DAYS"] = valid.sum(axis=1)
+    return data
+
+
+def clear_reports():
+    """Remove the reports of the previous size."""
+    for path in reports.REPORT_FOLDER.rglob("*"):
+        if path.is_file():
+            path.unlink()
+
+
+def read_csv_season(athlete=None):
+    """Read the weekly csv reports as they were read before the datasets."""
+    frames = []
+    for path in sorted(reports.REPORT_FOLDER.glob("athlete_records_*.csv")):
+        data = pd.read_csv(path, dtype={"ATHLETE": str})
+        if athlete is not None:
+            data = data[data["ATHLETE"] == athlete]
+        data["week_number"] = int(path.stem.rsplit("_", 1)[1])
+        frames.append(data)
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_size(paths):
+    """Get the total size of some files in MB."""
+    return "{:.2f}".format(sum(x.stat().st_size for x in paths) / 1e6)
+
+
+def main(sizes, weeks):
+    """Run the benchmark for every number of athletes."""
+    rows = []
+    for n in sizes:
+        clear_reports()
+        rng = np.random.default_rng(0)
+        season = [get_report(n, rng) for _ in range(weeks)]
+        athlete = "Athlete {}".format(n // 2)
+        expected = sum(int(x["TOTAL_DAYS"].sum()) for x in season)
+
+        for report_format in ("csv", "parquet", "feather"):
+            writer = reports.get_report_writer(report_format)
+            for week_number, data in enumerate(season, 1):
+                writer.write(data, week_number)
+
+            results = {}
+            if report_format == "csv":
+                with timer(results, "season"):
+                    data = read_csv_season()
+                with timer(results, "athlete"):
+                    read_csv_season(athlete)
+                files = reports.REPORT_FOLDER.glob("*.csv")
+            else:
+                with timer(results, "season"):
+                    data = writer.read_season()
+                with timer(results, "athlete"):
+                    writer.read_season(athletes=[athlete])
+                files = reports.SEASON_FOLDER.glob(
+                    "*/*.{}".format(writer.extension)
+                )
+
+            assert len(data) == n * weeks
+            assert int(data["TOTAL_DAYS"].sum()) == expected
+            rows.append((
+                n,
+                report_format,
+                results["season"],
+                results["athlete"],
+                get_size(files),
+            ))
+
+    print_table(
+        ("athletes", "format", "season_s", "athlete_s", "size_mb"), rows
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", type=int, nargs="*", default=[1000, 10000])
+    parser.add_argument("--weeks", type=int, default=52)
+    args = parser.parse_args()
+    main(args.sizes, args.weeks)
@@ -0,0 +1,85 @@
+"""
+Season analysis of a synthetic season with an increasing number of workers.
+
+Every athlete has one activity per day of the season, so every week reads
+`n-athletes` x 7 daily totals. The weekly reports are written as in a real
+run, and the results of every number of workers are checked against those
+of a single worker.
+
+Usage: python benchmarks/bench_season.py [workers ...] [--weeks N]
+[--n-athletes N] (1, 2, 4 and 8 workers on 52 weeks of 1000 athletes by
+default).
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+from common import ATHLETE_NAME, isolated_home, print_table, timer
+
+isolated_home()
+
+from strava_reporter.analysis import SeasonAnalysis  # noqa: E402
+from strava_reporter.handlers.database import DBHandler  # noqa: E402
+from strava_reporter.utils import time as time_utils  # noqa: E402
+
+FIRST_DAY = "2023-01-02"
+
+
+def build_season(db, weeks, n_athletes):
+    """Save an activity of every athlete on every day of the season."""
+    first_day = time_utils.str_to_timestamp(FIRST_DAY)
+    last_day = first_day + pd.DateOffset(days=7 * weeks - 1)
+    db.fill_weeks(FIRST_DAY, str(last_day)[:10])
+    for i in range(n_athletes):
+        db.add_athlete("Athlete {}".format(i), ATHLETE_NAME.format(i))
+
+    rng = np.random.default_rng(0)
+    for week_number in range(1, weeks + 1):
+        secs = rng.choice([600, 1200, 1800, 3600], size=(n_athletes, 7))
+        activities = []
+        for day in range(7):
+            ts = first_day + pd.DateOffset(days=7 * (week_number - 1) + day)
+            date, date_unix = str(ts)[:10], time_utils.timestamp_to_unix(ts)
+            for i in range(n_athletes):
+                key = "{}-{}-{}".format(week_number, day, i)
+                activities.append((
+                    key, week_number, "Run", ATHLETE_NAME.format(i),
+                    int(secs[i, day]), date, date_unix, "fp-" + key,
+                ))
+        db.add_activities(activities)
+
+
+def main(workers, weeks, n_athletes):
+    """Run the season analysis with every number of workers."""
+    db = DBHandler()
+    build_season(db, weeks, n_athletes)
+    athletes = ["Athlete {}".format(i) for i in range(n_athletes)]
+    week_numbers = list(range(1, weeks + 1))
+
+    rows = []
+    expected = None
+    for n in workers:
+        season = SeasonAnalysis(week_numbers)
+        results = {}
+        with timer(results, "season"):
+            season.run(athletes, n)
+        if expected is None:
+            expected, baseline = season.summary, results["season"]
+        pd.testing.assert_frame_equal(season.summary, expected)
+        rows.append((
+            n,
+            results["season"],
+            "{:.1f}".format(weeks / results["season"]),
+            "{:.2f}x".format(baseline / results["season"]),
+        ))
+
+    print_table(("workers", "seconds", "weeks_per_s", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workers", type=int, nargs="*", default=[1, 2, 4, 8])
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--n-athletes", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.workers, args.weeks, args.n_athletes)
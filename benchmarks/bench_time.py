@@ -0,0 +1,119 @@
+"""
+Memoized date conversions and day lookups against per-value conversions.
+
+`date_to_unix` is timed on `n` dates drawn from the days of a season, with
+and without its memoization (the caches are cleared first, so the misses
+are included). The day of `n` unix times of a week is then found with
+`DayBoundaries.day_index` (including building the boundaries) and by
+converting every value to a local timestamp with pandas.
+
+Usage: python benchmarks/bench_time.py [n ...] [--days N]
+(10k and 100k values over a 364-day season by default).
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+from common import isolated_home, print_table, timer
+
+isolated_home()
+
+from strava_reporter.utils import time as time_utils  # noqa: E402
+
+FIRST_DAY = "2023-01-02"
+
+
+def date_to_unix_uncached(date):
+    """Convert a date as `date_to_unix` did before being memoized."""
+    return time_utils.timestamp_to_unix(
+        pd.Timestamp(date, tz=time_utils.TIMEZONE)
+    )
+
+
+def day_index_per_value(unix, dates):
+    """Find the day of every unix time with a timezone conversion each."""
+    positions = {x: i for i, x in enumerate(dates)}
+    return np.array([
+        positions.get(
+            str(
+                pd.to_datetime(x, unit="s")
+                .tz_localize("UTC")
+                .tz_convert(time_utils.TIMEZONE)
+            )[:10],
+            -1,
+        )
+        for x in unix
+    ])
+
+
+def bench_date_to_unix(n, days):
+    """Time the conversion of `n` dates of a season."""
+    season = [
+        str(x)[:10] for x in pd.date_range(FIRST_DAY, periods=days)
+    ]
+    rng = np.random.default_rng(0)
+    dates = [season[i] for i in rng.integers(0, days, size=n)]
+
+    results = {}
+    with timer(results, "uncached"):
+        expected = [date_to_unix_uncached(x) for x in dates]
+
+    time_utils.date_to_unix.cache_clear()
+    time_utils._date_to_timestamp.cache_clear()
+    with timer(results, "memoized"):
+        unix = [time_utils.date_to_unix(x) for x in dates]
+
+    assert unix == expected
+    return results
+
+
+def bench_day_index(n):
+    """Time finding the day of `n` unix times of a week."""
+    start = time_utils.str_to_timestamp(FIRST_DAY)
+    end = start + pd.DateOffset(days=6)
+    first = time_utils.timestamp_to_unix(start)
+    rng = np.random.default_rng(0)
+    # Some values fall outside of the week.
+    unix = rng.integers(
+        first - 3600, first + 7 * time_utils.SECONDS_PER_DAY + 3600, size=n
+    )
+
+    results = {}
+    with timer(results, "day_index"):
+        boundaries = time_utils.DayBoundaries(FIRST_DAY, str(end)[:10])
+        idx = boundaries.day_index(unix)
+    with timer(results, "per_value"):
+        expected = day_index_per_value(unix, boundaries.dates)
+
+    np.testing.assert_array_equal(idx, expected)
+    return results
+
+
+def main(sizes, days):
+    """Run both benchmarks for every number of values."""
+    rows = []
+    for n in sizes:
+        for name, results, baseline, optimized in (
+                ("date_to_unix", bench_date_to_unix(n, days),
+                 "uncached", "memoized"),
+                ("day_index", bench_day_index(n), "per_value", "day_index"),
+        ):
+            rows.append((
+                name,
+                n,
+                results[baseline],
+                results[optimized],
+                "{:.1f}x".format(results[baseline] / results[optimized]),
+            ))
+
+    print_table(
+        ("conversion", "values", "before_s", "after_s", "speedup"), rows
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", type=int, nargs="*", default=[10000, 100000])
+    parser.add_argument("--days", type=int, default=364)
+    args = parser.parse_args()
+    main(args.sizes, args.days)
@@ -0,0 +1,124 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Names of the synthetic athletes are 'Athlete<i> X.'.
+ATHLETE_NAME = "Athlete{} X."
+
+
+def isolated_home() -> Path:
+    """
+    Point the package to a temporary home with a fresh database.
+
+    Call it before importing `strava_reporter`, whose folders are resolved
+    on import.
+
+    Returns
+    -------
+    :obj:`Path`
+        The temporary home, removed at exit.
+    """
+    import atexit
+
+    home = Path(tempfile.mkdtemp(prefix="strava_reporter_bench_"))
+    for folder in ("config", "data", "data/reports", "logs"):
+        (home / folder).mkdir()
+    shutil.copy(ROOT / "config" / "config.json", home / "config")
+    shutil.copy(ROOT / "data" / "stravadictos_template.db", home / "data")
+    os.environ["STRAVA_REPORTER_HOME"] = str(home)
+    atexit.register(shutil.rmtree, home, ignore_errors=True)
+
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    return home
+
+
+def reset_database():
+    """Remove the database of the home, so the next handler starts over."""
+    from strava_reporter.handlers.connections import CONNECTION_POOL
+    from strava_reporter.utils.path_index import DATA_PATH
+
+    CONNECTION_POOL.close_all()
+    for path in DATA_PATH.glob("stravadictos.db*"):
+        path.unlink()
+
+
+@contextmanager
+def timer(results: Dict[str, float], label: str) -> Iterator[None]:
+    """
+    Time a block of code.
+
+    Parameters
+    ----------
+    results : Dict[str, float]
+        The seconds of every block, updated with this one.
+    label : str
+        The name of the block.
+    """
+    start = time.perf_counter()
+    yield
+    results[label] = time.perf_counter() - start
+
+
+def club_activity(i: int, n_athletes: int) -> Dict[str, Any]:
+    """
+    Build a synthetic raw club activity.
+
+    Parameters
+    ----------
+    i : int
+        The position of the activity, which makes it unique.
+    n_athletes : int
+        The number of athletes the activities are spread over.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The raw activity.
+    """
+    return {
+        "resource_state": 2,
+        "athlete": {
+            "resource_state": 2,
+            "firstname": "Athlete{}".format(i % n_athletes),
+            "lastname": "X.",
+        },
+        "name": "Activity {}".format(i),
+        "distance": 1000.0 + i % 9000,
+        "moving_time": 600 + i % 3000,
+        "elapsed_time": 600 + i % 3000,
+        "total_elevation_gain": 0.0,
+        "type": "Run",
+        "sport_type": "Run",
+        "workout_type": None,
+    }
+
+
+def print_table(header: Sequence[str], rows: List[Sequence[Any]]):
+    """
+    Print the results of a benchmark as an aligned table.
+
+    Parameters
+    ----------
+    header : Sequence[str]
+        The column names.
+    rows : List[Sequence[Any]]
+        The values of every row.
+    """
+    cells = [list(map(str, header))] + [
+        [
+            "{:.4f}".format(x) if isinstance(x, float) else str(x)
+            for x in row
+        ]
+        for row in rows
+    ]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(header))]
+    for row in cells:
+        print("  ".join(x.rjust(w) for x, w in zip(row, widths)))
@@ -16,8 +16,9 @@ setup(
     author_email="emiliopm1997@gmail.com",
     description=DESCRIPTION,
     long_description=LONG_DESCRIPTION,
-    packages=find_packages(),
-    install_requires=["numpy", "pandas", "stravalib"],
+    packages=find_packages(exclude=["tests", "tests.*"]),
+    install_requires=["numpy", "pandas", "requests", "stravalib"],
+    extras_require={"columnar": ["pyarrow"], "sheets": ["gspread"]},
     keywords=["python", "strava", "reporting"],
     classifiers=[
         "Development Status :: 3 - Alpha",
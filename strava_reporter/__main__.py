@@ -1,15 +1,18 @@
 import argparse
 import time
-from typing import Optional
+from typing import Any, Callable, List, Optional
 
-import pandas as pd
-
-from strava_reporter.activities import Activities
-from strava_reporter.athletes import Athletes
-from strava_reporter.handlers.database import DBHandler
-from strava_reporter.handlers.strava import StravaObjects
-from strava_reporter.utils.log import LOGGER
-from strava_reporter.utils.time import str_to_timestamp
+# Only light modules are imported here, so that parsing the arguments (and
+# subcommands such as --migrations) does not load pandas, stravalib or
+# gspread. Every subcommand imports what it needs.
+from strava_reporter.config import Config
+from strava_reporter.handlers.connections import CONNECTION_POOL
+from strava_reporter.handlers.migrations import SchemaMigrator
+from strava_reporter.reports import REPORT_WRITERS, set_report_format
+from strava_reporter.utils.log import LOGGER, set_sql_tracing
+from strava_reporter.utils.metrics import METRICS, METRICS_FILES
+from strava_reporter.utils.path_index import (DATABASE, DATABASE_TEMPLATE,
+                                              PROFILE_STATS)
 
 
 def main(
@@ -17,6 +20,10 @@ def main(
     stop_after: Optional[int] = None,
     n_skip: Optional[int] = 0,
     test: Optional[bool] = False,
+    source: Optional[str] = None,
+    record: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    reconcile_mode: Optional[str] = None,
 ):
     """
     Run the main pipeline of the package.
@@ -31,40 +38,53 @@ def main(
         Number of activities to skip.
     test : Optional[bool]
         True for test runs, otherwise False.
+    source : Optional[str]
+        'strava' or the path of a JSONL recording of club activities to
+        replay. The default is None (Strava).
+    record : Optional[str]
+        The path where the fetched activities are recorded as JSONL. The
+        default is None (no recording).
+    batch_size : Optional[int]
+        The number of activities saved per transaction. The default is None
+        (the config value).
+    reconcile_mode : Optional[str]
+        'report' or 'backfill' to reconcile the ingest with the Zapier sheet.
+        The default is None (the config value, if any).
     """
+    import pandas as pd
+
+    from strava_reporter.athletes import Athletes
+    from strava_reporter.handlers.database import DBHandler
+    from strava_reporter.handlers.sources import get_activity_source
+    from strava_reporter.pipeline import BATCH_SIZE, ingest
+    from strava_reporter.utils.time import TIMEZONE, str_to_timestamp
+
     if date == "today" and not test:
         wait()
 
     LOGGER.info(
-        "Processing starting at {}.".format(
-            str(pd.Timestamp.now(tz="America/Mexico_City"))[:16]
-        )
+        "Processing starting at %.16s.", pd.Timestamp.now(tz=TIMEZONE)
     )
 
     # Change date str to timestamp
     ts = str_to_timestamp(date)
 
-    strava_obj = StravaObjects()
-    db = DBHandler()
-    week_number = db.get_week_number(ts)
-    last_hashes = db.get_last_hashes(ts)
-
-    all_activities = Activities()
-    LOGGER.info("Retreiving activities...")
-    all_activities.fill_club_activities(
-        strava_obj.club,
+    config = Config()
+    ingest(
+        DBHandler(),
+        Athletes(),
+        get_activity_source(source),
         ts,
-        last_hashes,
         stop_after,
-        n_skip
+        n_skip,
+        test,
+        record,
+        batch_size or getattr(config, "ingest_batch_size", BATCH_SIZE),
+        getattr(config, "dedup_window_days", 1),
+        reconcile_mode=reconcile_mode or getattr(config, "reconcile", None),
     )
 
-    LOGGER.info("Activities received: {}".format(len(all_activities)))
-    LOGGER.info(all_activities)
-    if not test:
-        all_activities.save_activities_to_db(db, week_number)
-        LOGGER.info("Activities saved to db...")
-
+    LOGGER.info("SQLite connections opened: %d", CONNECTION_POOL.opened)
     LOGGER.info("Main process completed succesfully!\n")
 
 
@@ -79,30 +99,197 @@ def analyze(week_number: int, test: Optional[bool] = False):
     test : Optional[bool]
         True for test runs, otherwise False.
     """
-    LOGGER.info("Analysis starting...")
-    weekly_activities = Activities()
-    LOGGER.info(f"Retreiving activities from week {week_number}...")
-    weekly_activities.get_weekly_activities_from_db(week_number)
+    from strava_reporter.athletes import Athletes
 
+    LOGGER.info("Analysis starting...")
     athletes = Athletes()
-    LOGGER.info("Assigning activities to athletes...")
-    athletes.assign_activities(weekly_activities)
 
-    LOGGER.info("Validating athlete's activities...")
-    athletes.analyze(week_number, test)
+    LOGGER.info(
+        "Validating athlete's activities from week %s...", week_number
+    )
+    athletes.analyze(week_number, test, in_db=True)
+    LOGGER.info("SQLite connections opened: %d", CONNECTION_POOL.opened)
     LOGGER.info("Analysis performed correctly!")
 
 
+def analyze_season(
+    week_numbers: Optional[List[int]] = None,
+    workers: Optional[int] = None,
+    test: Optional[bool] = False,
+):
+    """
+    Perform the weekly analysis of several weeks and a season summary.
+
+    Parameters
+    ----------
+    week_numbers : Optional[List[int]]
+        The weeks of interest. The default is None (every week started so
+        far).
+    workers : Optional[int]
+        The number of worker processes. The default is None (one per CPU).
+    test : Optional[bool]
+        True for test runs, otherwise False.
+    """
+    from strava_reporter.analysis import SeasonAnalysis
+    from strava_reporter.athletes import Athletes
+    from strava_reporter.handlers.database import DBHandler
+    from strava_reporter.utils.time import str_to_timestamp
+
+    LOGGER.info("Season analysis starting...")
+    if week_numbers is None:
+        week_numbers = DBHandler().get_week_numbers(str_to_timestamp("today"))
+    athletes = Athletes()
+
+    LOGGER.info("Analyzing weeks %s...", week_numbers)
+    season = SeasonAnalysis(week_numbers)
+    weekly = season.run(athletes.athlete_names, workers, test)
+
+    if not test:
+        season.save()
+        for week_number, data in weekly.items():
+            athletes.save_results(week_number, data)
+    else:
+        print(season.summary)
+    LOGGER.info("Season analysis performed correctly!")
+
+
+def run_daemon(
+    source: Optional[str] = None,
+    poll_minutes: Optional[float] = None,
+    batch_size: Optional[int] = None,
+):
+    """
+    Ingest the activities every day from a long-running process.
+
+    Parameters
+    ----------
+    source : Optional[str]
+        'strava' or the path of a JSONL recording of club activities to
+        replay. The default is None (Strava).
+    poll_minutes : Optional[float]
+        The minutes between polls during the day. The default is None (the
+        config value, if any).
+    batch_size : Optional[int]
+        The number of activities saved per transaction. The default is None
+        (the config value).
+    """
+    from strava_reporter.daemon import INGEST_TIME, Daemon
+    from strava_reporter.handlers.sources import get_activity_source
+    from strava_reporter.pipeline import BATCH_SIZE
+
+    config = Config()
+    daemon = Daemon(
+        get_activity_source(source),
+        getattr(config, "ingest_time", INGEST_TIME),
+        poll_minutes or getattr(config, "poll_minutes", None),
+        batch_size or getattr(config, "ingest_batch_size", BATCH_SIZE),
+        getattr(config, "dedup_window_days", 1),
+        getattr(config, "reconcile", None),
+    )
+    daemon.run()
+
+
+def authorize():
+    """Authorize the application in Strava and cache its tokens."""
+    from strava_reporter.handlers.strava import get_strava_objects
+
+    get_strava_objects().authorize()
+    print("Tokens saved.")
+
+
+def show_migrations():
+    """Print the pending schema migrations and their cost without applying."""
+    # Read-only and without the data base handler, which needs pandas.
+    db_path = DATABASE if DATABASE.exists() else DATABASE_TEMPLATE
+    migrator = SchemaMigrator(CONNECTION_POOL.get(db_path, read_only=True))
+    plan = migrator.migrate(dry_run=True)
+
+    print(
+        "Schema version: {} (latest {})".format(
+            migrator.current_version, migrator.latest_version
+        )
+    )
+    for step in plan:
+        print(
+            "{:03d} {}: rows {}, rebuilds {}".format(
+                step["version"],
+                step["description"],
+                step["rows"],
+                step["rebuilds"] or "none",
+            )
+        )
+
+
+def profile(func: Callable, *args: Any):
+    """
+    Run a function under cProfile and save its stats.
+
+    Parameters
+    ----------
+    func : Callable
+        The function to profile.
+    *args : Any
+        The arguments of the function.
+    """
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(func, *args)
+    finally:
+        profiler.dump_stats(PROFILE_STATS)
+        LOGGER.info("Profile saved to %s.", PROFILE_STATS)
+
+
+def run(args: argparse.Namespace):
+    """
+    Run the subcommand selected by the arguments.
+
+    Parameters
+    ----------
+    args : :obj:`argparse.Namespace`
+        The parsed arguments.
+    """
+    if args.authorize:
+        authorize()
+    elif args.migrations:
+        show_migrations()
+    elif args.daemon:
+        run_daemon(args.source, args.poll_minutes, args.batch_size)
+    elif args.analysis_range:
+        start, end = args.analysis_range
+        analyze_season(list(range(start, end + 1)), args.workers, args.test)
+    elif args.all_weeks:
+        analyze_season(None, args.workers, args.test)
+    elif args.analysis:
+        analyze(args.analysis, args.test)
+    else:
+        main(
+            args.date,
+            args.stop_after,
+            args.n_skip,
+            args.test,
+            args.source,
+            args.record,
+            args.batch_size,
+            args.reconcile,
+        )
+
+
 def wait():
     """Wait until it is close to midnight."""
+    import pandas as pd
+
+    from strava_reporter.utils.time import TIMEZONE
+
     # TODO: generate more checks
-    now = pd.Timestamp.now(tz="America/Mexico_City")
+    now = pd.Timestamp.now(tz=TIMEZONE)
 
     # Calculate threshold.
     date = str(now)[:10]
     t = "23:50:00.0"
     dt = "{} {}".format(date, t)
-    threshold_time = pd.Timestamp(dt, tz="America/Mexico_City")
+    threshold_time = pd.Timestamp(dt, tz=TIMEZONE)
 
     remaining_time = threshold_time - now
 
@@ -122,6 +309,30 @@ if __name__ == "__main__":
         dest="analysis",
         help="The week number of the analysis to be conducted.",
     )
+    parser.add_argument(
+        "--analysis-range",
+        required=False,
+        type=int,
+        nargs=2,
+        default=None,
+        metavar=("START", "END"),
+        dest="analysis_range",
+        help="The first and last week numbers of a season analysis.",
+    )
+    parser.add_argument(
+        "--all-weeks",
+        action="store_true",
+        dest="all_weeks",
+        help="Analyze every week started so far and summarize the season.",
+    )
+    parser.add_argument(
+        "--workers",
+        required=False,
+        type=int,
+        default=None,
+        dest="workers",
+        help="The number of processes of a season analysis.",
+    )
     parser.add_argument(
         "--date",
         required=False,
@@ -146,6 +357,104 @@ if __name__ == "__main__":
         dest="n_skip",
         help="The number of activities to skip.",
     )
+    parser.add_argument(
+        "--report-format",
+        required=False,
+        type=str,
+        default=None,
+        choices=sorted(REPORT_WRITERS),
+        dest="report_format",
+        help="The format of the weekly reports (the config value by default).",
+    )
+    parser.add_argument(
+        "--source",
+        required=False,
+        type=str,
+        default=None,
+        dest="source",
+        help="'strava' (default) or a JSONL recording of activities.",
+    )
+    parser.add_argument(
+        "--record",
+        required=False,
+        type=str,
+        default=None,
+        dest="record",
+        help="The JSONL file where the fetched activities are recorded.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        required=False,
+        type=int,
+        default=None,
+        dest="batch_size",
+        help="The number of activities saved per transaction.",
+    )
+    parser.add_argument(
+        "--reconcile",
+        required=False,
+        type=str,
+        default=None,
+        choices=("report", "backfill"),
+        dest="reconcile",
+        help="Compare the ingest with Zapier ('report') or also 'backfill'.",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        dest="daemon",
+        help="Run as a long-running process that ingests every day.",
+    )
+    parser.add_argument(
+        "--poll-minutes",
+        required=False,
+        type=float,
+        default=None,
+        dest="poll_minutes",
+        help="The minutes between polls of the daemon during the day.",
+    )
+    parser.add_argument(
+        "--authorize",
+        action="store_true",
+        dest="authorize",
+        help="Authorize the application in Strava and cache its tokens.",
+    )
+    parser.add_argument(
+        "--migrations",
+        action="store_true",
+        dest="migrations",
+        help="Show the pending schema migrations without applying them.",
+    )
+
+    parser.add_argument(
+        "--trace-sql",
+        action="store_true",
+        dest="trace_sql",
+        help="Log every SQL statement of the data base handler.",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        dest="profile",
+        help="Run under cProfile and save the stats next to the log.",
+    )
+    parser.add_argument(
+        "--no-metrics",
+        action="store_true",
+        dest="no_metrics",
+        help="Do not record timers and counters nor write their summary.",
+    )
+    parser.add_argument(
+        "--metrics-format",
+        required=False,
+        type=str,
+        default=None,
+        choices=sorted(METRICS_FILES),
+        dest="metrics_format",
+        help="The format of the metrics summary (the config value by "
+        "default).",
+    )
 
     # TODO: Replace by unittests.
     parser.add_argument(
@@ -156,8 +465,20 @@ if __name__ == "__main__":
         help="Whether the code is being run as a test.",
     )
     args = parser.parse_args()
+    config = Config()
+    set_sql_tracing(args.trace_sql)
+    set_report_format(
+        args.report_format or getattr(config, "report_format", "csv")
+    )
+    METRICS.configure(
+        getattr(config, "metrics", True) and not args.no_metrics,
+        args.metrics_format or getattr(config, "metrics_format", "json"),
+    )
 
-    if args.analysis:
-        analyze(args.analysis, args.test)
-    else:
-        main(args.date, args.stop_after, args.n_skip, args.test)
+    try:
+        if args.profile:
+            profile(run, args)
+        else:
+            run(args)
+    finally:
+        METRICS.write()
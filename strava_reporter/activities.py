@@ -1,115 +1,156 @@
 import hashlib
 import json
-from typing import Any, Dict, List, Optional
+from itertools import islice
+from typing import (Any, Dict, Iterable, Iterator, Optional, Sequence, Set,
+                    Tuple)
 
+import numpy as np
 import pandas as pd
-from stravalib.model import Club
 
 from .handlers.database import DBHandler
-from .utils.time import str_to_timestamp, timestamp_to_unix
+from .utils.metrics import METRICS
+from .utils.time import date_to_unix, str_to_timestamp, unix_to_timestamp
+
+
+def dict_hash(dictionary: Dict[str, Any]) -> str:
+    """MD5 hash of a dictionary."""
+    dhash = hashlib.md5()
+    encoded = json.dumps(dictionary, sort_keys=True).encode()
+    dhash.update(encoded)
+    return dhash.hexdigest()
+
+
+def activity_id(fingerprint: str, date: str) -> str:
+    """
+    Get the unique id of an activity.
+
+    Club activities carry neither an id nor a date, so the same activity
+    content on two different dates must result in two different ids.
+
+    Parameters
+    ----------
+    fingerprint : str
+        The date independent hash of the activity.
+    date : str
+        The date of the activity as 'YYYY-MM-DD'.
+
+    Returns
+    -------
+    str
+        The MD5 hash of the fingerprint and the date.
+    """
+    encoded = "{}{}".format(fingerprint, date).encode()
+    return hashlib.md5(encoded).hexdigest()
+
+
+def legacy_id(activity_raw_dict: Dict[str, Any], date: str) -> str:
+    """
+    Get the id an activity had before fingerprints were stored.
+
+    Those ids were the hash of the activity as normalized by stravalib
+    (every field of its model, including the empty ones) plus its date,
+    which differs from the hash of the raw API response.
+
+    Parameters
+    ----------
+    activity_raw_dict : Dict[str, Any]
+        The activity, either raw or normalized by stravalib.
+    date : str
+        The date of the activity as 'YYYY-MM-DD'.
+
+    Returns
+    -------
+    str
+        The MD5 hash of the normalized activity and the date.
+    """
+    from stravalib.model import Activity as StravaActivity
+
+    normalized = StravaActivity.parse_obj(
+        {k: v for k, v in activity_raw_dict.items() if k != "date"}
+    ).dict()
+    normalized["date"] = date
+    return dict_hash(normalized)
 
 
 class Activities(list):
     """Generalized object for activities."""
 
-    def get_weekly_activities_from_db(self, week_number: int):
+    def get_weekly_activities_from_db(
+            self,
+            week_number: int,
+            db: Optional[DBHandler] = None
+    ):
         """
         Retrieve activities from a specific week in the db.
 
+        The activities are loaded as a single `ActivityTable` and added as
+        views of its rows.
+
         Parameters
         ----------
         week_number : int
             The week number corresponding to the data we want to retrieve.
+        db : Optional[DBHandler]
+            The data base handler to use. The default is None (a new one).
         """
-        db = DBHandler()
-        weekly_activities = db.get_weekly_activities(week_number)
-
-        for activity in weekly_activities:
-            self.append(Activity(**activity))
+        self.extend(ActivityTable.from_db(week_number, db))
 
+    @METRICS.timed()
     def fill_club_activities(
         self,
-        club: "Club",
+        club_activities: Iterable[Any],
         date: pd.Timestamp,
-        last_hashes: List[str],
+        known_fingerprints: Set[str],
         stop_after: Optional[int] = None,
         to_ignore: Optional[int] = 0,
+        last_hashes: Optional[Set[str]] = None,
     ):
         """
         Retrieve the activities from a club.
 
         Parameters
         ----------
-        club : :obj:`Club`
-            The club object from where the activities are registered.
+        club_activities : Iterable[Any]
+            The club activities, most recent first, either as raw dictionaries
+            (see StravaObjects.iter_club_activities) or as stravalib objects.
         date : :obj:`pd.Timestamp`
             The date of the activity.
-        last_hashes : List[str]
-            A list of the hashes from the previous date.
+        known_fingerprints : Set[str]
+            The fingerprints of the activities already processed. Reading
+            stops at the first known activity.
         stop_after : Optional[int]
             Number of activities to read before stopping.
         to_ignore: Optional[int]
             Number of activities to ignore, starting from the top. Mainly used
             when analysis is delayed.
+        last_hashes : Optional[Set[str]]
+            The hashes from the previous date of the activities saved before
+            fingerprints were stored. The default is None.
         """
-        self.clear()
-        processed_activities = 0
-
-        ignored = 0
-
-        # Note: result_fetcher only limits to 30 results
-        for activity_raw in club.activities:
-
-            # Skip activities
-            if to_ignore > ignored:
-                ignored += 1
-                continue
+        # Imported here since the pipeline builds on this module.
+        from .pipeline import deduplicate, normalize
 
-            activity_raw_dict = activity_raw.to_dict()
-            # Get hash on yesterday's date to check whether this activity was
-            # already processed.
-            activity_raw_dict["date"] = str(date - pd.Timedelta(days=1))[:10]
-            activity_hash = self.dict_hash(activity_raw_dict)
-
-            if activity_hash in last_hashes:
-                break
-            else:
-                # Correct the hash.
-                activity_raw_dict["date"] = str(date)[:10]
-                activity_hash = self.dict_hash(activity_raw_dict)
-
-            activity = Activity(activity_id=activity_hash, **activity_raw_dict)
-            self.append(activity)
-            processed_activities += 1
-
-            if processed_activities == stop_after:
-                break
-
-    def dict_hash(self, dictionary: Dict[str, Any]) -> str:
-        """MD5 hash of a dictionary."""
-        dhash = hashlib.md5()
-        encoded = json.dumps(dictionary, sort_keys=True).encode()
-        dhash.update(encoded)
-        return dhash.hexdigest()
+        self.clear()
+        activities = deduplicate(
+            normalize(islice(club_activities, to_ignore, None)),
+            date,
+            known_fingerprints,
+            last_hashes
+        )
+        self.extend(islice(activities, stop_after))
 
+    @METRICS.timed()
     def save_activities_to_db(self, db: "DBHandler", week_number):
-        """Save the activities to the database.
+        """Save the activities to the database in a single transaction.
 
         Parameters
         ----------
         db : :obj:`DBHandler`
             The data base handler used to save the activities.
+        week_number : int
+            The week number corresponding to the activities.
         """
-        for activity in self:
-            db.add_activity(
-                activity.activity_id,
-                week_number,
-                activity.name,
-                activity.athlete,
-                activity.time.total_seconds(),
-                str(activity.date)[:10],
-                activity.date_unix
-            )
+        db.add_activities(activity.to_row(week_number) for activity in self)
 
 
 class Activity:
@@ -120,6 +161,8 @@ class Activity:
     ----------
     activity_id : str
         The unique activity id.
+    fingerprint : str
+        The date independent hash of the activity, if known.
     athlete : str
         The athlete's name as it is outputed in Strava.
     date : :obj:`pd.Timestamp`
@@ -132,7 +175,13 @@ class Activity:
         The time the activity took.
     """
 
+    __slots__ = (
+        "activity_id", "fingerprint", "athlete", "date", "date_unix", "name",
+        "time"
+    )
+
     activity_id: str
+    fingerprint: str
     athlete: str
     date: pd.Timestamp
     date_unix: int
@@ -142,6 +191,7 @@ class Activity:
     def __init__(self, **kwargs):
         """Set instance attributes."""
         self.activity_id = kwargs["activity_id"]
+        self.fingerprint = kwargs.get("fingerprint")
 
         if isinstance(kwargs["athlete"], str):
             self.athlete = kwargs["athlete"]
@@ -152,12 +202,253 @@ class Activity:
 
         self.name = kwargs["name"]
         self.date = str_to_timestamp(kwargs["date"])
-        self.date_unix = timestamp_to_unix(self.date)
+        self.date_unix = date_to_unix(kwargs["date"])
         secs = (kwargs["elapsed_time"]
                 if kwargs.get("elapsed_time")
                 else kwargs.get("duration_secs"))
         self.time = pd.Timedelta(seconds=secs)
 
+    def to_row(self, week_number: int) -> Tuple:
+        """
+        Get the activity as a row of the ACTIVITIES table.
+
+        Parameters
+        ----------
+        week_number : int
+            The week number corresponding to the activity.
+
+        Returns
+        -------
+        Tuple
+            The values expected by DBHandler.add_activities.
+        """
+        return (
+            self.activity_id,
+            week_number,
+            self.name,
+            self.athlete,
+            self.time.total_seconds(),
+            str(self.date)[:10],
+            self.date_unix,
+            self.fingerprint
+        )
+
+    def __repr__(self) -> str:
+        """Representation of the object."""
+        return "{} ({}, {})".format(self.name, self.athlete, self.time)
+
+
+class ActivityTable:
+    """
+    Columnar container of activities.
+
+    Activities are kept as NumPy arrays instead of one `Activity` per row,
+    which avoids holding a `pd.Timestamp` and a `pd.Timedelta` per activity.
+    Rows can still be accessed as lightweight `ActivityView` objects.
+
+    Attributes
+    ----------
+    activity_ids : :obj:`np.ndarray`
+        The unique activity ids.
+    athletes : :obj:`np.ndarray`
+        The distinct athlete names (as they are outputed in Strava), sorted.
+    athlete_codes : :obj:`np.ndarray`
+        The position of every activity's athlete in `athletes` (int32).
+    names : :obj:`np.ndarray`
+        The names of the activities.
+    date_unix : :obj:`np.ndarray`
+        The dates of the activities in unix format (int64).
+    duration_secs : :obj:`np.ndarray`
+        The duration of the activities in seconds (int32).
+    """
+
+    def __init__(
+            self,
+            activity_ids: Sequence[str],
+            athletes: Sequence[str],
+            date_unix: Sequence[int],
+            duration_secs: Sequence[int],
+            names: Optional[Sequence[str]] = None,
+    ):
+        """Set instance attributes."""
+        self.activity_ids = np.asarray(activity_ids, dtype=object)
+        self.athletes, codes = np.unique(
+            np.asarray(athletes, dtype=object).astype(str),
+            return_inverse=True
+        )
+        self.athlete_codes = codes.astype(np.int32)
+        self.date_unix = np.asarray(date_unix, dtype=np.int64)
+        self.duration_secs = np.asarray(duration_secs, dtype=np.int32)
+        self.names = (
+            np.asarray(names, dtype=object)
+            if names is not None
+            else np.full(len(self.activity_ids), "", dtype=object)
+        )
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ActivityTable":
+        """
+        Build the table from a DataFrame.
+
+        Parameters
+        ----------
+        df : :obj:`pd.DataFrame`
+            The activities with the 'activity_id', 'athlete', 'date_unix',
+            'duration_secs' and, optionally, 'name' columns.
+
+        Returns
+        -------
+        :obj:`ActivityTable`
+            The activities as a table.
+        """
+        return cls(
+            df["activity_id"].values,
+            df["athlete"].values,
+            df["date_unix"].values,
+            df["duration_secs"].values,
+            df["name"].values if "name" in df else None,
+        )
+
+    @classmethod
+    def from_db(
+            cls,
+            week_number: int,
+            db: Optional["DBHandler"] = None
+    ) -> "ActivityTable":
+        """
+        Retrieve the activities from a specific week in the db.
+
+        Parameters
+        ----------
+        week_number : int
+            The week number corresponding to the data we want to retrieve.
+        db : Optional[DBHandler]
+            The data base handler to use. The default is None (a new one).
+
+        Returns
+        -------
+        :obj:`ActivityTable`
+            The weekly activities as a table.
+        """
+        db = db or DBHandler()
+        return cls.from_frame(
+            db.get_weekly_activities(week_number, as_frame=True)
+        )
+
+    def take(self, indices: np.ndarray) -> "ActivityTable":
+        """
+        Select a subset of the activities.
+
+        Parameters
+        ----------
+        indices : :obj:`np.ndarray`
+            The positions (or a boolean mask) of the activities to keep.
+
+        Returns
+        -------
+        :obj:`ActivityTable`
+            A new table with the selected activities.
+        """
+        table = ActivityTable.__new__(ActivityTable)
+        table.activity_ids = self.activity_ids[indices]
+        table.athletes = self.athletes
+        table.athlete_codes = self.athlete_codes[indices]
+        table.names = self.names[indices]
+        table.date_unix = self.date_unix[indices]
+        table.duration_secs = self.duration_secs[indices]
+        return table
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Convert the table to a DataFrame.
+
+        Returns
+        -------
+        :obj:`pd.DataFrame`
+            The 'activity_id', 'athlete', 'name', 'date_unix' and
+            'duration_secs' columns, with 'athlete' as a categorical.
+        """
+        return pd.DataFrame({
+            "activity_id": self.activity_ids,
+            "athlete": pd.Categorical.from_codes(
+                self.athlete_codes, self.athletes
+            ),
+            "name": self.names,
+            "date_unix": self.date_unix,
+            "duration_secs": self.duration_secs,
+        })
+
+    def __len__(self) -> int:
+        """Get the number of activities."""
+        return len(self.activity_ids)
+
+    def __getitem__(self, i: int) -> "ActivityView":
+        """Access a single activity."""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Activity index out of range.")
+        return ActivityView(self, i)
+
+    def __iter__(self) -> Iterator["ActivityView"]:
+        """Iterate over the activities as views."""
+        for i in range(len(self)):
+            yield ActivityView(self, i)
+
+    def __repr__(self) -> str:
+        """Representation of the object."""
+        return "ActivityTable({} activities)".format(len(self))
+
+
+class ActivityView:
+    """
+    Read-only access to a row of an `ActivityTable`.
+
+    It exposes the same attributes as `Activity`, but pandas objects are only
+    built when `date` or `time` are accessed.
+    """
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: ActivityTable, index: int):
+        """Set instance attributes."""
+        self._table = table
+        self._index = index
+
+    @property
+    def activity_id(self) -> str:
+        """str: The unique activity id."""
+        return self._table.activity_ids[self._index]
+
+    @property
+    def athlete(self) -> str:
+        """str: The athlete's name as it is outputed in Strava."""
+        return str(
+            self._table.athletes[self._table.athlete_codes[self._index]]
+        )
+
+    @property
+    def name(self) -> str:
+        """str: The name of the activity."""
+        return self._table.names[self._index]
+
+    @property
+    def date_unix(self) -> int:
+        """int: The date in unix format."""
+        return int(self._table.date_unix[self._index])
+
+    @property
+    def date(self) -> pd.Timestamp:
+        """:obj:`pd.Timestamp`: The date of when the activity took place."""
+        return unix_to_timestamp(self.date_unix)
+
+    @property
+    def time(self) -> pd.Timedelta:
+        """:obj:`pd.Timedelta`: The time the activity took."""
+        return pd.Timedelta(
+            seconds=int(self._table.duration_secs[self._index])
+        )
+
     def __repr__(self) -> str:
         """Representation of the object."""
         return "{} ({}, {})".format(self.name, self.athlete, self.time)
@@ -1,16 +1,23 @@
-from pathlib import Path
-from typing import TYPE_CHECKING, List
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional
 
+import numpy as np
 import pandas as pd
 
+from .activities import ActivityTable
+from .handlers.database import DBHandler
+from .reports import REPORT_FOLDER, get_report_format, get_report_writer
 from .utils.log import LOGGER
-from .utils.time import Week, timestamp_to_unix, unix_to_timestamp
+from .utils.metrics import METRICS
+from .utils.time import Week, unix_to_timestamp
 
 if TYPE_CHECKING:
     from .activities import Activity
     from .athletes import Athlete
 
-REPORT_FOLDER = Path(".").parent / "data" / "reports"
+# Daily time required for the activities to count. Added 3 min tolerance.
+MINIMUM_TIME = pd.Timedelta(minutes=27)
 
 
 class Counter:
@@ -31,10 +38,7 @@ class Counter:
 
     def __init__(self, week: Week, athlete_name: str):
         """Set instance attributes."""
-        week_dates = [
-            timestamp_to_unix(week.week_start + pd.Timedelta(days=i))
-            for i in range(7)
-        ]
+        week_dates = week.days_unix
         self.time_counter = {x: pd.Timedelta(seconds=0) for x in week_dates}
         self.day_counter = {x: None for x in week_dates}
         self.athlete_name = athlete_name
@@ -52,16 +56,14 @@ class Counter:
 
     def validate_activities(self):
         """Validate activities."""
-        # Added 3 min tolerance.
-        minimum_time = pd.Timedelta(minutes=27)
         for date, time in self.time_counter.items():
-            if time >= minimum_time:
+            if time >= MINIMUM_TIME:
                 self.day_counter[date] = 1
             elif time > pd.Timedelta(seconds=0):
                 LOGGER.info(
-                    "The activities of '{}' on {} are not valid.".format(
-                        self.athlete_name, str(unix_to_timestamp(date))[:10]
-                    )
+                    "The activities of '%s' on %.10s are not valid.",
+                    self.athlete_name,
+                    unix_to_timestamp(date),
                 )
 
 
@@ -83,16 +85,23 @@ class WeeklyAnalysis:
         The reference date and time.
     file_path : :obj:`Path`
         The name of the file where the analysis is located. This is based on
-        the week's start date and end date.
+        the week's number and the report format.
     last_monday : :obj:`pd.Timestamp`
         The date of the beginning of the week.
+    writer : :obj:`ReportWriter`
+        The writer of the report ('csv', 'parquet' or 'feather').
     """
 
-    def __init__(self, athletes: List[str], week: Week):
+    def __init__(
+            self,
+            athletes: List[str],
+            week: Week,
+            report_format: Optional[str] = None
+    ):
         """Set instance attributes."""
         self.week = week
-        file_name = "athlete_records_{}.csv".format(self.week.week_number)
-        self.file_path = REPORT_FOLDER / file_name
+        self.writer = get_report_writer(report_format)
+        self.file_path = self.writer.path(self.week.week_number)
 
         self.data = self._get_data_template(athletes)
 
@@ -101,7 +110,7 @@ class WeeklyAnalysis:
         columns.append("ATHLETE")
 
         for i in range(7):
-            day = self.week.week_start + pd.Timedelta(days=i)
+            day = self.week.week_start + pd.DateOffset(days=i)
             columns.append(day.day_name().upper())
 
         data = pd.DataFrame(columns=columns)
@@ -110,6 +119,7 @@ class WeeklyAnalysis:
 
         return data
 
+    @METRICS.timed()
     def count_athlete_activities(self, athlete: "Athlete"):
         """
         Count the daily activities of a given athlete.
@@ -119,7 +129,14 @@ class WeeklyAnalysis:
         athlete : Athlete
             An athlete with their data.
         """
-        if not athlete.activities:
+        if not len(athlete.activities):
+            return
+
+        if isinstance(athlete.activities, ActivityTable):
+            self.count_activities(
+                athlete.activities.to_frame(),
+                {athlete.strava_name: athlete.name}
+            )
             return
 
         counter = Counter(self.week, athlete.name)
@@ -128,6 +145,97 @@ class WeeklyAnalysis:
         counter.validate_activities()
         self._add_athletes_data(athlete, counter)
 
+    def count_activities(
+            self,
+            activities: pd.DataFrame,
+            athlete_names: Mapping[str, str]
+    ):
+        """
+        Count the daily activities of every athlete at once.
+
+        This is the vectorized equivalent of calling
+        `count_athlete_activities` for every athlete: durations are summed
+        per athlete and day in a single group by and validated as a whole.
+
+        Parameters
+        ----------
+        activities : :obj:`pd.DataFrame`
+            The activities of the week with, at least, the 'athlete' (as it is
+            outputed in Strava), 'date_unix' and 'duration_secs' columns.
+        athlete_names : Mapping[str, str]
+            The athletes' names by their Strava names. Activities of athletes
+            not in the mapping are ignored.
+        """
+        names = activities["athlete"].astype(object).map(athlete_names)
+        mask = names.notna()
+        self.count_daily_totals(
+            pd.DataFrame({
+                "athlete": names[mask],
+                "date_unix": activities["date_unix"][mask],
+                "duration_secs": activities["duration_secs"][mask],
+            })
+        )
+
+    def count_daily_totals(self, totals: pd.DataFrame):
+        """
+        Count the days validated by the daily durations of every athlete.
+
+        Parameters
+        ----------
+        totals : :obj:`pd.DataFrame`
+            The 'athlete' (by their name), 'date_unix' and 'duration_secs'
+            columns. Several rows for the same athlete and day are summed, so
+            both single activities and per day aggregates are valid inputs
+            (see DBHandler.get_weekly_totals).
+        """
+        if totals.empty:
+            return
+
+        week_days = self.week.days_unix
+        days = self.week.day_boundaries.day_index(totals["date_unix"].values)
+
+        outside = days < 0
+        if outside.any():
+            LOGGER.info(
+                "%d activities outside of week %d were ignored.",
+                outside.sum(),
+                self.week.week_number,
+            )
+
+        mask = ~outside
+        totals = (
+            pd.DataFrame({
+                "athlete": totals["athlete"].values[mask],
+                "day": days[mask],
+                "secs": totals["duration_secs"].values[mask],
+            })
+            .groupby(["athlete", "day"])["secs"]
+            .sum()
+            .unstack(fill_value=0)
+            .reindex(columns=range(7), fill_value=0)
+        )
+        if totals.empty:
+            return
+
+        valid = totals >= MINIMUM_TIME.total_seconds()
+        invalid = ((totals > 0) & ~valid).stack()
+        for athlete_name, day in invalid[invalid].index:
+            LOGGER.info(
+                "The activities of '%s' on %.10s are not valid.",
+                athlete_name,
+                unix_to_timestamp(week_days[day]),
+            )
+
+        day_columns = self.data.columns[1:8]
+        flags = pd.DataFrame(
+            np.where(valid, 1, None), index=totals.index, columns=day_columns
+        )
+        flags["TOTAL_DAYS"] = valid.sum(axis=1)
+
+        rows = self.data["ATHLETE"].isin(totals.index)
+        athletes = self.data.loc[rows, "ATHLETE"]
+        self.data.loc[rows, flags.columns] = flags.loc[athletes].values
+
     def _add_athletes_data(self, athlete: "Athlete", counter: "Counter"):
         """
         Add athlete's counter to data.
@@ -149,7 +257,216 @@ class WeeklyAnalysis:
         s = self.data.loc[athlete_row, week.keys()].sum(axis=1).astype(int)
         self.data.loc[athlete_row, "TOTAL_DAYS"] = s
 
+    def load(self) -> bool:
+        """
+        Load the previously saved results of the week, if any.
+
+        Athletes registered after the file was saved start with no days.
+
+        Returns
+        -------
+        bool
+            True if the file existed, otherwise False.
+        """
+        saved = self.writer.read(self.week.week_number)
+        if saved is None:
+            return False
+
+        saved["ATHLETE"] = saved["ATHLETE"].astype(str)
+        data = self.data[["ATHLETE"]].merge(saved, on="ATHLETE", how="left")
+
+        day_columns = self.data.columns[1:8]
+        data[day_columns] = np.where(data[day_columns].values == 1, 1, None)
+        data["TOTAL_DAYS"] = data["TOTAL_DAYS"].fillna(0).astype(int)
+        self.data = data[self.data.columns]
+        return True
+
+    def update_daily_totals(self, totals: pd.DataFrame):
+        """
+        Re-validate only the given athlete days.
+
+        Unlike `count_daily_totals`, the rest of the week is kept as it is, so
+        the cost depends on the number of updated days only.
+
+        Parameters
+        ----------
+        totals : :obj:`pd.DataFrame`
+            The 'athlete' (by their name), 'date_unix' and 'duration_secs'
+            columns, with the complete total of every updated day.
+        """
+        days = self.week.day_boundaries.day_index(totals["date_unix"].values)
+        rows = pd.Index(self.data["ATHLETE"]).get_indexer(totals["athlete"])
+        day_columns = self.data.columns[1:8]
+        touched = set()
+
+        for (athlete_name, date_unix, secs), day, row in zip(
+                totals.itertuples(index=False), days, rows
+        ):
+            if day < 0:
+                LOGGER.info(
+                    "Day %d is outside of week %d.",
+                    date_unix,
+                    self.week.week_number,
+                )
+                continue
+
+            valid = secs >= MINIMUM_TIME.total_seconds()
+            if not valid and secs > 0:
+                LOGGER.info(
+                    "The activities of '%s' on %.10s are not valid.",
+                    athlete_name,
+                    unix_to_timestamp(date_unix),
+                )
+
+            if row < 0:
+                continue
+            # The day columns follow the ATHLETE column.
+            self.data.iat[row, day + 1] = 1 if valid else None
+            touched.add(athlete_name)
+
+        rows = self.data["ATHLETE"].isin(touched)
+        self.data.loc[rows, "TOTAL_DAYS"] = (
+            (self.data.loc[rows, day_columns] == 1).sum(axis=1).astype(int)
+        )
+
     def save(self):
-        """Save file to csv."""
+        """Save file in the report format."""
         LOGGER.info("Saving data file...")
-        self.data.to_csv(self.file_path, index=False)
+        self.writer.write(self.data, self.week.week_number)
+
+
+def _analyze_week(
+        week_number: int,
+        athletes: List[str],
+        test: bool,
+        report_format: str
+) -> pd.DataFrame:
+    """
+    Analyze a single week with a read-only connection.
+
+    Module level function so that it can be sent to a process pool.
+
+    Parameters
+    ----------
+    week_number : int
+        The week number of the analysis.
+    athletes : List[str]
+        The names of the athletes in the analysis.
+    test : bool
+        True for test runs, otherwise False.
+    report_format : str
+        The format of the weekly report. Given explicitly since workers do
+        not necessarily share the module state of the parent process.
+
+    Returns
+    -------
+    :obj:`pd.DataFrame`
+        The weekly results.
+    """
+    db = DBHandler(read_only=True)
+    week = Week(**db.get_week_information(week_number))
+    analysis = WeeklyAnalysis(athletes, week, report_format)
+    analysis.count_daily_totals(db.get_weekly_totals(week_number))
+
+    if not test:
+        analysis.save()
+    return analysis.data
+
+
+class SeasonAnalysis:
+    """
+    The weekly analyses of several weeks of the challenge.
+
+    Weeks are analyzed in parallel by a process pool, each worker with its
+    own read-only database connection. Every weekly report is saved as
+    usual and the number of days of every athlete per week is gathered in a
+    season summary.
+
+    Attributes
+    ----------
+    week_numbers : List[int]
+        The weeks to analyze.
+    file_path : :obj:`Path`
+        The path of the season summary.
+    summary : :obj:`pd.DataFrame`
+        The TOTAL_DAYS of every athlete ('WEEK_<n>' columns) and their sum
+        ('TOTAL_DAYS').
+    """
+
+    def __init__(self, week_numbers: List[int]):
+        """Set instance attributes."""
+        self.week_numbers = list(week_numbers)
+        self.file_path = REPORT_FOLDER / "season_summary.csv"
+        self.summary = pd.DataFrame()
+
+    def run(
+            self,
+            athletes: List[str],
+            max_workers: Optional[int] = None,
+            test: Optional[bool] = False
+    ) -> Dict[int, pd.DataFrame]:
+        """
+        Analyze every week.
+
+        Parameters
+        ----------
+        athletes : List[str]
+            The names of the athletes in the analysis.
+        max_workers : Optional[int]
+            The number of worker processes. The default is None (one per
+            CPU). With 1, weeks are analyzed in the current process.
+        test : Optional[bool]
+            True for test runs, otherwise False.
+
+        Returns
+        -------
+        Dict[int, pd.DataFrame]
+            The results of every week by week number.
+        """
+        start = perf_counter()
+        n = len(self.week_numbers)
+        report_format = get_report_format()
+
+        if max_workers == 1:
+            results = [
+                _analyze_week(week_number, athletes, test, report_format)
+                for week_number in self.week_numbers
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(
+                    _analyze_week,
+                    self.week_numbers,
+                    [athletes] * n,
+                    [test] * n,
+                    [report_format] * n,
+                ))
+
+        LOGGER.info(
+            "%d weeks analyzed in %.2f s with %s workers.",
+            n,
+            perf_counter() - start,
+            max_workers or "default",
+        )
+
+        weekly = dict(zip(self.week_numbers, results))
+        self.summary = self._get_summary(athletes, weekly)
+        return weekly
+
+    def _get_summary(
+            self,
+            athletes: List[str],
+            weekly: Dict[int, pd.DataFrame]
+    ) -> pd.DataFrame:
+        summary = pd.DataFrame({"ATHLETE": athletes})
+        for week_number, data in weekly.items():
+            summary["WEEK_{}".format(week_number)] = (
+                data["TOTAL_DAYS"].astype(int).values
+            )
+        summary["TOTAL_DAYS"] = summary.iloc[:, 1:].sum(axis=1).astype(int)
+        return summary
+
+    def save(self):
+        """Save the season summary to csv."""
+        LOGGER.info("Saving season summary...")
+        self.summary.to_csv(self.file_path, index=False)
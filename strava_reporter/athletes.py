@@ -1,13 +1,29 @@
-from pathlib import Path
-from typing import List, Optional
+from typing import (Dict, Iterable, Iterator, List, Optional, Sequence, Tuple,
+                    Union)
 
-from .activities import Activities
+import numpy as np
+import pandas as pd
+
+from .activities import Activities, ActivityTable
 from .analysis import WeeklyAnalysis
+from .config import Config
 from .handlers.database import DBHandler
 from .utils.log import LOGGER
-from .utils.time import Week
+from .utils.metrics import METRICS
+from .utils.time import TIMEZONE, Week, timestamp_to_unix
+
+
+def get_required_days() -> Optional[int]:
+    """
+    Get the days needed to complete a week.
 
-ATHLETES_JSON = Path(".").parent / "config" / "athletes.json"
+    Returns
+    -------
+    Optional[int]
+        The 'required_days' of the config, or None if it is not configured
+        (no weekly results are saved).
+    """
+    return getattr(Config(), "required_days", None)
 
 
 class Athlete:
@@ -20,7 +36,7 @@ class Athlete:
         The athlete's complete name.
     strava_name: str
         The athlete's name as it is outputed in Strava.
-    activities: :obj:`Activities`
+    activities: Union[:obj:`Activities`, :obj:`ActivityTable`]
         The activities that the athlete has completed.
     """
 
@@ -37,7 +53,10 @@ class Athlete:
 
 class Athletes:
     """
-    Generalized object for athletes.
+    Registry of the athletes in the challenge.
+
+    Athletes are indexed by their Strava name and identified by an integer
+    code, their position in the registry.
 
     Attributes
     ----------
@@ -47,18 +66,36 @@ class Athletes:
         The registered athletes in the challenge as they appear in Strava.
     """
 
-    athlete_names: List[str] = []
-    athlete_strava_names: List[str] = []
-
     def __init__(self):
         """Set instance attributes."""
         self._db = DBHandler()
-        athletes_raw = self._db.get_active_athletes()
+        self._athletes: List[Athlete] = []
+        self._codes: Dict[str, int] = {}
+        self.athlete_names: List[str] = []
+        self.athlete_strava_names: List[str] = []
+
+        for athlete in self._db.get_active_athletes():
+            self._register(Athlete(**athlete))
+
+        self._index = pd.Index(self.athlete_strava_names)
+
+    def _register(self, athlete: "Athlete"):
+        if athlete.strava_name in self._codes:
+            LOGGER.info("Athlete '%s' is duplicated.", athlete.strava_name)
+            return
+
+        self._codes[athlete.strava_name] = len(self._athletes)
+        self._athletes.append(athlete)
+        self.athlete_names.append(athlete.name)
+        self.athlete_strava_names.append(athlete.strava_name)
 
-        for athlete in athletes_raw:
-            setattr(self, athlete["strava_name"], Athlete(**athlete))
-            self.athlete_names.append(athlete["name"])
-            self.athlete_strava_names.append(athlete["strava_name"])
+    def __len__(self) -> int:
+        """Get the number of registered athletes."""
+        return len(self._athletes)
+
+    def __iter__(self) -> Iterator["Athlete"]:
+        """Iterate over the registered athletes."""
+        return iter(self._athletes)
 
     def get_athlete(self, attr: str) -> "Athlete":
         """
@@ -74,20 +111,69 @@ class Athletes:
         :obj:`Athlete`
             The athlete in question.
         """
-        if attr not in self.athlete_strava_names:
-            LOGGER.info("Athlete '{}' was not found.".format(attr))
+        code = self._codes.get(attr)
+        if code is None:
+            LOGGER.info("Athlete '%s' was not found.", attr)
             return None
-        return getattr(self, attr)
+        return self._athletes[code]
+
+    def get_code(self, strava_name: str) -> int:
+        """
+        Get the code of a registered athlete.
+
+        Parameters
+        ----------
+        strava_name : str
+            The athlete name as it appears in Strava.
+
+        Returns
+        -------
+        int
+            The athlete's code, or -1 if the athlete is not registered.
+        """
+        return self._codes.get(strava_name, -1)
 
-    def assign_activities(self, activities: "Activities"):
+    def encode(self, strava_names: Sequence[str]) -> np.ndarray:
+        """
+        Get the codes of several athletes at once.
+
+        Parameters
+        ----------
+        strava_names : Sequence[str]
+            The athletes' names as they appear in Strava, e.g. the 'athlete'
+            column of the activities.
+
+        Returns
+        -------
+        :obj:`np.ndarray`
+            The athletes' codes, -1 for those not registered.
+        """
+        return self._index.get_indexer(strava_names)
+
+    @METRICS.timed()
+    def assign_activities(
+            self,
+            activities: Union["Activities", "ActivityTable"]
+    ):
         """
         Asign the activities to its corresponding athlete.
 
+        The activities replace those assigned before, so athletes without
+        activities in `activities` are left with none.
+
         Parameters
         ----------
-        activities : :obj:`Activities`
-            The activities to be assigned.
+        activities : Union[:obj:`Activities`, :obj:`ActivityTable`]
+            The activities to be assigned. Tables are split by athlete at
+            once and every athlete receives a sub-table.
         """
+        if isinstance(activities, ActivityTable):
+            self._assign_activity_table(activities)
+            return
+
+        for athlete in self._athletes:
+            athlete.activities = Activities()
+
         for activity in activities:
             athlete = self.get_athlete(activity.athlete)
 
@@ -95,24 +181,205 @@ class Athletes:
             if athlete:
                 athlete.activities.append(activity)
 
-    def analyze(self, week_number: int, test: Optional[bool] = False):
+    def load_activities(self, week_number: int):
+        """
+        Assign the activities of a week saved in the database.
+
+        The activities are read as a single `ActivityTable` and every athlete
+        receives the sub-table of their activities.
+
+        Parameters
+        ----------
+        week_number : int
+            The week number of the activities.
+        """
+        self.assign_activities(ActivityTable.from_db(week_number, self._db))
+
+    def _assign_activity_table(self, activities: "ActivityTable"):
+        table_codes = self.encode(activities.athletes)
+        for strava_name in activities.athletes[table_codes < 0]:
+            LOGGER.info("Athlete '%s' was not found.", strava_name)
+
+        # Registry code of every activity.
+        codes = table_codes[activities.athlete_codes]
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(self) + 1))
+
+        # To only assign activities of active athletes.
+        for code, athlete in enumerate(self._athletes):
+            if bounds[code] < bounds[code + 1]:
+                athlete.activities = activities.take(
+                    order[bounds[code]:bounds[code + 1]]
+                )
+            else:
+                athlete.activities = Activities()
+
+    @METRICS.timed()
+    def update_analysis(
+            self,
+            week_number: int,
+            days: Iterable[Tuple[str, int]],
+            test: Optional[bool] = False
+    ):
         """
-        Analyze the daily activities and save the data on a csv.
+        Update the saved weekly analysis with the days that changed.
 
+        Only the given athlete days are re-validated, using the daily totals
+        kept in the database. If the week was never analyzed, a complete
+        analysis is performed instead.
+
+        Parameters
+        ----------
         week_number : int
             The week number of the analysis.
+        days : Iterable[Tuple[str, int]]
+            The updated days as (athlete as it appears in Strava, date_unix).
         test : Optional[bool]
             True for test runs, otherwise False.
         """
         week_data = Week(**self._db.get_week_information(week_number))
         analysis = WeeklyAnalysis(self.athlete_names, week_data)
 
-        # Update table based on the athletes activity.
-        for athlete_name in self.athlete_strava_names:
-            athlete = self.get_athlete(athlete_name)
-            analysis.count_athlete_activities(athlete)
+        if not analysis.load():
+            LOGGER.info("No previous analysis found for this week.")
+            self.analyze(week_number, test, in_db=True, with_results=False)
+            return
+
+        totals = []
+        for strava_name, date_unix in set(days):
+            total = self._db.get_daily_total(strava_name, date_unix)
+
+            # To only update the days of active athletes.
+            if total:
+                totals.append((total[0], date_unix, total[1]))
+
+        analysis.update_daily_totals(
+            pd.DataFrame(
+                totals, columns=["athlete", "date_unix", "duration_secs"]
+            )
+        )
 
         if not test:
             analysis.save()
         else:
             print(analysis.data)
+
+    @METRICS.timed()
+    def analyze(
+            self,
+            week_number: int,
+            test: Optional[bool] = False,
+            activities: Optional[pd.DataFrame] = None,
+            in_db: Optional[bool] = False,
+            with_results: Optional[bool] = True,
+            now: Optional[pd.Timestamp] = None
+    ):
+        """
+        Analyze the daily activities and save the report and debts.
+
+        week_number : int
+            The week number of the analysis.
+        test : Optional[bool]
+            True for test runs, otherwise False.
+        activities : Optional[pd.DataFrame]
+            The activities of the week as a single table. If given, they are
+            counted at once instead of using the activities assigned to each
+            athlete. The default is None.
+        in_db : Optional[bool]
+            If True, the daily durations are aggregated by the database and
+            neither the assigned activities nor `activities` are used. If
+            False, the activities of the week are loaded from the database
+            and assigned, replacing those assigned before (see
+            `load_activities`). The default is False.
+        with_results : Optional[bool]
+            If True, the completed weeks and debts are saved as well, once
+            the week is over (see `save_results`). The default is True.
+        now : Optional[pd.Timestamp]
+            The current local time, which tells whether the week is over.
+            The default is None (the time of the call).
+        """
+        week_data = Week(**self._db.get_week_information(week_number))
+        analysis = WeeklyAnalysis(self.athlete_names, week_data)
+
+        if in_db:
+            analysis.count_daily_totals(
+                self._db.get_weekly_totals(week_number)
+            )
+        elif activities is not None:
+            analysis.count_activities(
+                activities,
+                dict(zip(self.athlete_strava_names, self.athlete_names))
+            )
+        else:
+            self.load_activities(week_number)
+
+            # Update table based on the athletes activity.
+            for athlete in self:
+                analysis.count_athlete_activities(athlete)
+
+        if not test:
+            analysis.save()
+            if with_results:
+                self.save_results(week_number, analysis.data, now)
+        else:
+            print(analysis.data)
+
+    def save_results(
+            self,
+            week_number: int,
+            data: pd.DataFrame,
+            now: Optional[pd.Timestamp] = None
+    ) -> bool:
+        """
+        Save the completed weeks and debts of a weekly analysis.
+
+        Results of a week that is not over are only reported, so that the
+        days still to come do not generate debts. The days needed to
+        complete a week are read from the 'required_days' setting; without
+        it, no results are saved.
+
+        Parameters
+        ----------
+        week_number : int
+            The week number of the analysis.
+        data : :obj:`pd.DataFrame`
+            The weekly results, with a row per registered athlete in the same
+            order (see WeeklyAnalysis.data).
+        now : Optional[pd.Timestamp]
+            The current local time. The default is None (the time of the
+            call).
+
+        Returns
+        -------
+        bool
+            True if the results were saved, otherwise False.
+        """
+        required_days = get_required_days()
+        if required_days is None:
+            LOGGER.info(
+                "'required_days' is not configured, results of week %d are "
+                "not saved.",
+                week_number,
+            )
+            return False
+
+        now = now if now is not None else pd.Timestamp.now(tz=TIMEZONE)
+        week_end_unix = self._db.get_week_information(week_number)[
+            "week_end_unix"
+        ]
+        if week_end_unix > timestamp_to_unix(now):
+            LOGGER.info(
+                "Week %d is not over, its results are not saved.", week_number
+            )
+            return False
+
+        LOGGER.info("Saving weekly results and debts...")
+        self._db.save_weekly_results(
+            week_number,
+            zip(
+                self.athlete_strava_names,
+                data["TOTAL_DAYS"].astype(int).tolist()
+            ),
+            required_days
+        )
+        return True
@@ -0,0 +1,234 @@
+import time
+from typing import Callable, Optional
+
+import pandas as pd
+
+from .athletes import Athletes, get_required_days
+from .handlers.database import DBHandler
+from .handlers.sources import ActivitySource
+from .pipeline import BATCH_SIZE, ingest
+from .utils.log import LOGGER
+from .utils.metrics import METRICS
+from .utils.time import TIMEZONE, str_to_timestamp
+
+# Local time of the daily ingest.
+INGEST_TIME = "23:50"
+
+
+def _now() -> pd.Timestamp:
+    return pd.Timestamp.now(tz=TIMEZONE)
+
+
+class Daemon:
+    """
+    Long-running process that ingests the club activities every day.
+
+    The database connection, the athlete registry and the activity source
+    are created once and kept warm between runs. Every day at the ingest
+    time, the activities are ingested with the date of that day, and after
+    the ingest of a Sunday the week is analyzed. Between daily runs, the
+    activities can optionally be polled so that they are saved (with the
+    current date) as they are posted.
+
+    When started and on every wake up, missed runs are caught up: the ingest
+    of the last scheduled day, if it did not finish (e.g. the daemon was
+    down or the ingest failed), and the analysis of every finished week
+    without saved results. The daemon also wakes up at midnight, so that the
+    results of a week are saved as soon as it is over. Without the
+    'required_days' setting no results are saved, so finished weeks are not
+    caught up. Earlier ingests cannot be recovered, since club activities
+    carry no date.
+
+    Attributes
+    ----------
+    db : :obj:`DBHandler`
+        The data base handler.
+    athletes : :obj:`Athletes`
+        The registry of the athletes.
+    source : :obj:`ActivitySource`
+        The source of the club activities.
+    ingest_time : str
+        The local time of the daily ingest as 'HH:MM'.
+    poll_minutes : Optional[float]
+        The minutes between polls, or None to only ingest once a day.
+    batch_size : int
+        The number of activities saved per transaction.
+    window_days : int
+        The number of previous days whose activities stop the reading.
+    reconcile_mode : Optional[str]
+        'report' or 'backfill' to reconcile every daily ingest with the
+        Zapier sheet (polls are not reconciled), or None.
+    """
+
+    def __init__(
+            self,
+            source: ActivitySource,
+            ingest_time: Optional[str] = INGEST_TIME,
+            poll_minutes: Optional[float] = None,
+            batch_size: Optional[int] = BATCH_SIZE,
+            window_days: Optional[int] = 1,
+            reconcile_mode: Optional[str] = None,
+            clock: Optional[Callable[[], pd.Timestamp]] = _now,
+            sleep: Optional[Callable[[float], None]] = time.sleep,
+    ):
+        """Set instance attributes."""
+        self.db = DBHandler()
+        self.athletes = Athletes()
+        self.source = source
+        self.ingest_time = ingest_time
+        self.poll_minutes = poll_minutes
+        self.batch_size = batch_size
+        self.window_days = window_days
+        self.reconcile_mode = reconcile_mode
+        self._clock = clock
+        self._sleep = sleep
+
+        now = self._clock()
+        self._next_ingest = self.next_ingest(now)
+        self._next_poll = self._get_next_poll(now)
+        self._next_midnight = self._get_next_midnight(now)
+
+    def next_ingest(self, now: pd.Timestamp) -> pd.Timestamp:
+        """
+        Get the time of the next daily ingest.
+
+        Parameters
+        ----------
+        now : :obj:`pd.Timestamp`
+            The current local time.
+
+        Returns
+        -------
+        :obj:`pd.Timestamp`
+            The first ingest time after `now`.
+        """
+        scheduled = self._scheduled_on(now)
+        if scheduled <= now:
+            scheduled = self._scheduled_on(now + pd.DateOffset(days=1))
+        return scheduled
+
+    def run(self, max_runs: Optional[int] = None):
+        """
+        Catch up and run the scheduled tasks until interrupted.
+
+        Parameters
+        ----------
+        max_runs : Optional[int]
+            The number of scheduled wake ups before returning. The default
+            is None (run forever).
+        """
+        LOGGER.info("Daemon started, next ingest at %.16s.", self._next_ingest)
+        self.catch_up()
+
+        runs = 0
+        while max_runs is None or runs < max_runs:
+            now = self._clock()
+            wake_up = min(self._next_ingest, self._next_midnight)
+            if self._next_poll is not None:
+                wake_up = min(wake_up, self._next_poll)
+            if wake_up > now:
+                self._sleep((wake_up - now).total_seconds())
+            self.tick()
+            runs += 1
+
+    def tick(self):
+        """Run the tasks that are due and catch up the missed ones."""
+        now = self._clock()
+
+        if now >= self._next_ingest:
+            scheduled = self._next_ingest
+            self._next_ingest = self.next_ingest(now)
+            self._run_task(self._ingest_day, scheduled)
+            # Polls are postponed by any ingest.
+            self._next_poll = self._get_next_poll(now)
+        elif self._next_poll is not None and now >= self._next_poll:
+            self._run_task(self._poll, now)
+            self._next_poll = self._get_next_poll(now)
+
+        self._next_midnight = self._get_next_midnight(now)
+
+        self.catch_up()
+
+    def catch_up(self):
+        """Run the ingest and analyses missed while the daemon was down."""
+        now = self._clock()
+        last_scheduled = self.next_ingest(now) - pd.DateOffset(days=1)
+        if not self._ingested(last_scheduled):
+            LOGGER.info("Catching up the ingest of %.10s.", last_scheduled)
+            self._run_task(self._ingest_day, last_scheduled)
+
+        if get_required_days() is None:
+            # The weeks would be analyzed again on every wake up.
+            return
+
+        for week_number in self.db.get_unanalyzed_weeks(now):
+            LOGGER.info("Catching up the analysis of week %s.", week_number)
+            self._run_task(self._analyze, week_number)
+
+    def _ingested(self, scheduled: pd.Timestamp) -> bool:
+        date = str(scheduled)[:10]
+        checkpoint = self.db.get_ingest_checkpoint(date)
+        if checkpoint:
+            return checkpoint[1]
+        if self.db.get_ingest_checkpoint(date, "poll"):
+            # Activities posted after the last poll are still missing.
+            return False
+
+        # Days ingested before checkpoints were kept.
+        day = str_to_timestamp(str(scheduled)[:10])
+        return bool(self.db.get_last_hashes(day + pd.DateOffset(days=1)))
+
+    def _ingest_day(self, scheduled: pd.Timestamp):
+        date = str_to_timestamp(str(scheduled)[:10])
+        pipeline = self._ingest(date, self.reconcile_mode)
+        if date.day_name() == "Sunday":
+            self._analyze(pipeline.week_number)
+
+    def _poll(self, now: pd.Timestamp):
+        self._ingest(str_to_timestamp(str(now)[:10]), kind="poll")
+
+    def _ingest(
+            self,
+            date: pd.Timestamp,
+            reconcile_mode: Optional[str] = None,
+            kind: Optional[str] = "daily"
+    ):
+        LOGGER.info("Ingesting the activities of %.10s...", date)
+        return ingest(
+            self.db,
+            self.athletes,
+            self.source,
+            date,
+            batch_size=self.batch_size,
+            window_days=self.window_days,
+            include_today=True,
+            reconcile_mode=reconcile_mode,
+            kind=kind,
+        )
+
+    def _analyze(self, week_number: int):
+        LOGGER.info("Analyzing week %s...", week_number)
+        self.athletes.analyze(week_number, in_db=True, now=self._clock())
+
+    def _run_task(self, task: Callable, *args):
+        # A failed task must not stop the daemon.
+        try:
+            task(*args)
+        except Exception:
+            LOGGER.error("Task '%s' failed.", task.__name__, exc_info=True)
+        finally:
+            # The metrics of the process so far.
+            METRICS.write()
+
+    def _scheduled_on(self, day: pd.Timestamp) -> pd.Timestamp:
+        return pd.Timestamp(
+            "{} {}".format(str(day)[:10], self.ingest_time), tz=TIMEZONE
+        )
+
+    def _get_next_midnight(self, now: pd.Timestamp) -> pd.Timestamp:
+        return str_to_timestamp(str(now + pd.DateOffset(days=1))[:10])
+
+    def _get_next_poll(self, now: pd.Timestamp) -> Optional[pd.Timestamp]:
+        if not self.poll_minutes:
+            return None
+        return now + pd.Timedelta(minutes=self.poll_minutes)
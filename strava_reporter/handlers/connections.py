@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Number of compiled statements kept by sqlite3 per connection.
+CACHED_STATEMENTS = 256
+
+# PRAGMAs applied to every pooled connection. WAL lets readers (e.g. an
+# analysis) proceed while the nightly ingest is writing. Read-only
+# connections skip 'journal_mode', which they cannot change.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # Negative values are expressed in KiB.
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+
+class _Connection(sqlite3.Connection):
+    """sqlite3 connection that keeps track of explicit transactions."""
+
+    def __init__(self, *args, **kwargs):
+        """Set instance attributes."""
+        super().__init__(*args, **kwargs)
+        self.in_handler_transaction = False
+
+
+class _ConnectionPool:
+    """
+    Process-wide manager of sqlite connections.
+
+    A single connection is kept per database file, mode and thread, since
+    sqlite3 connections cannot be shared across threads. Connections are not
+    inherited by forked processes (e.g. the workers of a process pool),
+    which open their own.
+
+    Attributes
+    ----------
+    pragmas : Dict[str, Any]
+        The PRAGMAs applied to every new connection.
+    cached_statements : int
+        The size of the statement cache of every new connection.
+    opened : int
+        The number of connections opened so far by the process.
+    """
+
+    def __init__(self):
+        """Set instance attributes."""
+        self.pragmas = dict(PRAGMAS)
+        self.cached_statements = CACHED_STATEMENTS
+        self.opened = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._pid = os.getpid()
+
+    def configure(
+            self,
+            cached_statements: Optional[int] = None,
+            **pragmas: Any
+    ):
+        """
+        Change the settings of the connections opened from now on.
+
+        Parameters
+        ----------
+        cached_statements : Optional[int]
+            The size of the statement cache.
+        **pragmas : Any
+            PRAGMAs to set or override, e.g. `synchronous="FULL"`.
+        """
+        if cached_statements is not None:
+            self.cached_statements = cached_statements
+        self.pragmas.update(pragmas)
+
+    def get(
+            self,
+            db_path: Path,
+            read_only: Optional[bool] = False
+    ) -> sqlite3.Connection:
+        """
+        Retrieve the connection of the current thread to a database.
+
+        Parameters
+        ----------
+        db_path : :obj:`Path`
+            The path of the database.
+        read_only : Optional[bool]
+            True to get a connection that cannot write. The default is False.
+
+        Returns
+        -------
+        :obj:`sqlite3.dbapi2.Connection`
+            The shared connection, opened if needed.
+        """
+        if os.getpid() != self._pid:
+            self._reset_after_fork()
+
+        connections = self._thread_connections()
+        key = (str(Path(db_path).resolve()), read_only)
+        if key not in connections:
+            connections[key] = self._connect(db_path, read_only)
+        return connections[key]
+
+    def close_all(self):
+        """Close every connection opened by the pool."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+            self._local = threading.local()
+
+    def _reset_after_fork(self):
+        # The parent's connections must not be used (nor closed) here.
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = []
+        self._pid = os.getpid()
+
+    def _thread_connections(self) -> Dict[Any, sqlite3.Connection]:
+        if not hasattr(self._local, "connections"):
+            self._local.connections = {}
+        return self._local.connections
+
+    def _connect(self, db_path: Path, read_only: bool) -> sqlite3.Connection:
+        if read_only:
+            database = "file:{}?mode=ro".format(Path(db_path).resolve())
+        else:
+            database = str(db_path)
+        # Connections are only used by their thread, but `close_all` closes
+        # them from any thread.
+        conn = sqlite3.connect(
+            database,
+            cached_statements=self.cached_statements,
+            factory=_Connection,
+            uri=read_only,
+            check_same_thread=False,
+        )
+        for pragma, value in self.pragmas.items():
+            if read_only and pragma == "journal_mode":
+                continue
+            conn.execute(f"PRAGMA {pragma} = {value}")
+
+        with self._lock:
+            self._connections.append(conn)
+            self.opened += 1
+        return conn
+
+
+CONNECTION_POOL = _ConnectionPool()
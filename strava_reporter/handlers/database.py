@@ -1,13 +1,19 @@
 import shutil
 import sqlite3
+from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import (Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple,
+                    Union)
 
 import pandas as pd
 
-from ..utils.log import LOGGER
+from ..utils.log import LOGGER, SQL_LOGGER
+from ..utils.metrics import METRICS
 from ..utils.path_index import DATABASE, DATABASE_TEMPLATE
 from ..utils.time import str_to_timestamp, timestamp_to_unix
+from .connections import CONNECTION_POOL, _Connection
+from .migrations import SchemaMigrator
 
 
 class _AthletesTable:
@@ -39,7 +45,7 @@ class _AthletesTable:
             The number of weeks that the athlete has completed the challenge.
             The default is 0.
         """
-        values = f"('{name}', '{strava_name}', {active}, {weeks_completed})"
+        values = (name, strava_name, active, weeks_completed)
         self._insert(self.__table, values)
 
     def drop_athlete_by_strava_name(
@@ -55,8 +61,8 @@ class _AthletesTable:
             The athlete name as it appears in Strava. See get_athletes_in_club
             method inside the StravaObjects class.
         """
-        condition = f"strava_name = '{strava_name}'"
-        self._delete(self.__table, condition)
+        condition = "strava_name = ?"
+        self._delete(self.__table, condition, (strava_name,))
 
     def update_weeks_completed_in_athlete(
             self,
@@ -74,9 +80,11 @@ class _AthletesTable:
         new_weeks : int
             The number of weeks that the athlete has completed.
         """
-        changes = f"weeks_completed = {new_weeks}"
-        condition = f"strava_name = '{strava_name}'"
-        self._update(self.__table, changes, condition)
+        changes = "weeks_completed = ?"
+        condition = "strava_name = ?"
+        self._update(
+            self.__table, changes, condition, (new_weeks, strava_name)
+        )
 
     def get_active_athletes(self) -> List[Dict[str, str]]:
         """
@@ -118,23 +126,31 @@ class _WeeksTable:
         self._validate_weeks_dates(start_date, end_date)
 
         # Fill the WEEKS table with the corresponding dates.
+        self._insert_many(
+            self.__table, self._iter_weeks(start_date, end_date)
+        )
+
+    def _iter_weeks(
+            self,
+            start_date: pd.Timestamp,
+            end_date: pd.Timestamp
+    ) -> Iterator[Tuple[int, str, str, int, int]]:
         monday = start_date
         week_n = 1
 
         while monday < end_date:
-            sunday = monday + pd.Timedelta(days=6)
+            sunday = monday + pd.DateOffset(days=6)
 
             # The second unix is given the fact that we would like to account
             # for Sunday.
-            values = "({}, '{}', '{}', {}, {})".format(
+            yield (
                 week_n,
                 str(monday)[:10],
                 str(sunday)[:10],
                 timestamp_to_unix(monday),
-                timestamp_to_unix(monday + pd.Timedelta(days=7)),
+                timestamp_to_unix(monday + pd.DateOffset(days=7)),
             )
-            self._insert(self.__table, values)
-            monday += pd.Timedelta(days=7)
+            monday += pd.DateOffset(days=7)
             week_n += 1
 
     def _validate_weeks_dates(self, start_date: str, end_date: str):
@@ -164,11 +180,37 @@ class _WeeksTable:
         """
         unix_ts = timestamp_to_unix(ts)
         col = "week_number"
-        additionals = ("WHERE {0} >= week_start_unix "
-                       "AND {0} < week_end_unix".format(unix_ts))
-        res = self._select(col, self.__table, additionals)
+        additionals = "WHERE ? >= week_start_unix AND ? < week_end_unix"
+        res = self._select(col, self.__table, additionals, (unix_ts, unix_ts))
         return res[0][0]
 
+    def get_week_numbers(
+            self,
+            until: Optional[pd.Timestamp] = None
+    ) -> List[int]:
+        """
+        Retreive the week numbers of the challenge.
+
+        Parameters
+        ----------
+        until : Optional[pd.Timestamp]
+            If given, only the weeks started by then are retrieved. The
+            default is None (every week).
+
+        Returns
+        -------
+        List[int]
+            The week numbers in order.
+        """
+        col = "week_number"
+        additionals = "ORDER BY week_number"
+        params = ()
+        if until is not None:
+            additionals = "WHERE week_start_unix <= ? " + additionals
+            params = (timestamp_to_unix(until),)
+        res = self._select(col, self.__table, additionals, params)
+        return [x[0] for x in res]
+
     def get_week_information(self, week_num: int) -> Dict[str, Any]:
         """
         Retreive the week data based on a week number.
@@ -188,8 +230,8 @@ class _WeeksTable:
             "week_end_unix"
         ]
         what = ", ".join(columns)
-        additionals = ("WHERE week_number = {}".format(week_num))
-        res = self._select(what, self.__table, additionals)
+        additionals = "WHERE week_number = ?"
+        res = self._select(what, self.__table, additionals, (week_num,))
         week_data = pd.DataFrame(res, columns=columns).to_dict("records")[0]
         return week_data
 
@@ -198,6 +240,10 @@ class _ActivitiesTable:
     """Private object used to modify items in the ACTIVITIES table."""
 
     __table = "ACTIVITIES"
+    __columns = (
+        "activity_id", "week_number", "name", "athlete", "duration_secs",
+        "date", "date_unix", "fingerprint"
+    )
 
     def add_activity(
             self,
@@ -207,7 +253,8 @@ class _ActivitiesTable:
             athlete: str,
             duration_secs: int,
             date: str,
-            date_unix: int
+            date_unix: int,
+            fingerprint: Optional[str] = None
     ):
         """
         Add an activity to the database.
@@ -229,62 +276,207 @@ class _ActivitiesTable:
             The date corresponding to this activity expressed as 'YYYY-MM-DD'.
         date_unix : int
             The previous date in the unix format.
+        fingerprint : Optional[str]
+            The date independent hash of the activity, used to detect
+            activities that were already processed.
         """
-        values = "('{}', {}, '{}', '{}', {}, '{}', {})".format(
+        values = (
             activity_id,
             week_number,
             name,
             athlete,
             duration_secs,
             date,
-            date_unix
+            date_unix,
+            fingerprint
         )
-        self._insert(self.__table, values)
+        with self.transaction():
+            self._insert(self.__table, values, self.__columns)
+            self.add_to_daily_totals(
+                [(athlete, week_number, date_unix, duration_secs)]
+            )
+
+    def add_activities(
+            self,
+            activities: Iterable[
+                Tuple[str, int, str, str, int, str, int, Optional[str]]
+            ]
+    ):
+        """
+        Add several activities to the database in a single transaction.
+
+        The daily totals of the athletes are updated in the same transaction.
+
+        Parameters
+        ----------
+        activities : Iterable[Tuple[str, int, str, str, int, str, int, str]]
+            The activities as tuples following the same order as the
+            arguments of `add_activity`, i.e. (activity_id, week_number,
+            name, athlete, duration_secs, date, date_unix, fingerprint).
+        """
+        activities = list(activities)
+        deltas = defaultdict(int)
+        for _, week, _, athlete, secs, _, date_unix, _ in activities:
+            deltas[(athlete, week, date_unix)] += secs
+
+        with self.transaction():
+            self._insert_many(self.__table, activities, self.__columns)
+            self.add_to_daily_totals(
+                (athlete, week, date_unix, secs)
+                for (athlete, week, date_unix), secs in deltas.items()
+            )
+
+    def get_known_fingerprints(
+            self,
+            ts: pd.Timestamp,
+            window_days: Optional[int] = 1,
+            include_today: Optional[bool] = False
+    ) -> Set[str]:
+        """Retrieve the fingerprints of the activities of the previous days.
+
+        Parameters
+        ----------
+        ts : :obj:`pd.Timestamp`
+            A local timestamp.
+        window_days : Optional[int]
+            The number of days before `ts` to look at. The default is 1.
+        include_today : Optional[bool]
+            If True, the activities already saved on the date of `ts` are
+            also included, e.g. when ingesting several times a day. The
+            default is False.
 
-    def get_last_hashes(self, ts: pd.Timestamp) -> List[str]:
+        Return
+        ------
+        Set[str]
+            The fingerprints of the activities within the window.
+        """
+        first_day = str(ts - pd.DateOffset(days=window_days))[:10]
+        last_day = str(ts)[:10]
+
+        what = "fingerprint"
+        conditions = (
+            "WHERE date >= ? AND date {} ? AND fingerprint IS NOT NULL"
+        ).format("<=" if include_today else "<")
+
+        res = self._select(
+            what, self.__table, conditions, (first_day, last_day)
+        )
+        return {x[0] for x in res}
+
+    def get_last_hashes(
+            self,
+            ts: pd.Timestamp,
+            legacy_only: Optional[bool] = False
+    ) -> List[str]:
         """Retrieve the hashes from the previous day.
 
         Parameters
         ----------
         ts : :obj:`pd.Timestamp`
             A local timestamp.
+        legacy_only : Optional[bool]
+            If True, only retrieve the hashes of the activities saved without
+            a fingerprint. The default is False.
 
         Return
         ------
         List[str]
             The list of the hashes from the previous day.
         """
-        day_before = ts - pd.Timedelta(days=1)
+        day_before = ts - pd.DateOffset(days=1)
         day_before = str(day_before)[:10]
 
         what = "activity_id"
-        conditions = f"WHERE date = '{day_before}'"
+        conditions = "WHERE date = ?"
+        if legacy_only:
+            conditions += " AND fingerprint IS NULL"
 
-        res = self._select(what, self.__table, conditions)
+        res = self._select(what, self.__table, conditions, (day_before,))
         res = [x[0] for x in res]  # Remove tuple level
         return res
 
-    def get_weekly_activities(self, week_num: int) -> List[Dict[str, Any]]:
+    @METRICS.timed()
+    def get_weekly_activities(
+            self,
+            week_num: int,
+            as_frame: Optional[bool] = False
+    ) -> Union[List[Dict[str, Any]], pd.DataFrame]:
         """Retrieve the activities from a given week.
 
         Parameters
         ----------
         week_num : int
             The week number of interest.
+        as_frame : Optional[bool]
+            If True, return the activities as a single DataFrame instead of
+            one dictionary per activity. The default is False.
 
         Return
         ------
-        List[Dict[str, Any]]
-            A list of the weekly activities in the form of a dictionary.
+        Union[List[Dict[str, Any]], pd.DataFrame]
+            The weekly activities.
         """
         columns = [
             "activity_id", "athlete", "name",
             "date", "date_unix", "duration_secs"
         ]
         what = ", ".join(columns)
-        conditions = f"WHERE week_number = {week_num}"
-        res = self._select(what, self.__table, conditions)
-        return pd.DataFrame(res, columns=columns).to_dict("records")
+        conditions = "WHERE week_number = ?"
+        res = self._select(what, self.__table, conditions, (week_num,))
+        df = pd.DataFrame(res, columns=columns)
+        return df if as_frame else df.to_dict("records")
+
+    def get_activity_keys(
+            self,
+            first_day: str,
+            last_day: str
+    ) -> List[Tuple[str, str, str, int]]:
+        """Retrieve the matching keys of the activities of several days.
+
+        Parameters
+        ----------
+        first_day : str
+            The first date as 'YYYY-MM-DD'.
+        last_day : str
+            The last date (included) as 'YYYY-MM-DD'.
+
+        Return
+        ------
+        List[Tuple[str, str, str, int]]
+            The (date, athlete, name, duration_secs) of every activity.
+        """
+        what = "date, athlete, name, duration_secs"
+        conditions = "WHERE date >= ? AND date <= ?"
+        return self._select(
+            what, self.__table, conditions, (first_day, last_day)
+        )
+
+    def get_weekly_totals(self, week_num: int) -> pd.DataFrame:
+        """Retrieve the daily time of the active athletes in a given week.
+
+        The aggregation is done by sqlite, so only one row per athlete and
+        day is returned.
+
+        Parameters
+        ----------
+        week_num : int
+            The week number of interest.
+
+        Return
+        ------
+        :obj:`pd.DataFrame`
+            The 'athlete' (their name), 'date_unix' and 'duration_secs' (the
+            sum of the day) columns.
+        """
+        columns = ["athlete", "date_unix", "duration_secs"]
+        what = "ATHLETES.name, a.date_unix, SUM(a.duration_secs)"
+        conditions = (
+            "AS a JOIN ATHLETES ON a.athlete = ATHLETES.strava_name "
+            "WHERE a.week_number = ? AND ATHLETES.active = 1 "
+            "GROUP BY a.athlete, a.date_unix"
+        )
+        res = self._select(what, self.__table, conditions, (week_num,))
+        return pd.DataFrame(res, columns=columns)
 
     def drop_activity_by_hash(self, hash: str):
         """
@@ -295,31 +487,464 @@ class _ActivitiesTable:
         hash : str
             The hash of the activity to be dropped.
         """
-        condition = f"activity_id = '{hash}'"
-        self._delete(self.__table, condition)
+        what = "athlete, week_number, date_unix, duration_secs"
+        res = self._select(
+            what, self.__table, "WHERE activity_id = ?", (hash,)
+        )
+
+        with self.transaction():
+            condition = "activity_id = ?"
+            self._delete(self.__table, condition, (hash,))
+            self.add_to_daily_totals(
+                (athlete, week, date_unix, -secs)
+                for athlete, week, date_unix, secs in res
+            )
+
+
+class _DailyTotalsTable:
+    """Private object used to modify items in the DAILY_TOTALS table."""
+
+    __table = "DAILY_TOTALS"
+
+    def add_to_daily_totals(
+            self,
+            deltas: Iterable[Tuple[str, int, int, int]]
+    ):
+        """
+        Add durations to the daily totals of the athletes.
+
+        Parameters
+        ----------
+        deltas : Iterable[Tuple[str, int, int, int]]
+            The durations to add as (athlete, week_number, date_unix,
+            duration_secs) tuples, where athlete is the name as it appears in
+            Strava. Negative durations are subtracted.
+        """
+        rows = iter(deltas)
+        first = next(rows, None)
+        if first is None:
+            return
+
+        sql = (
+            f"INSERT INTO {self.__table} VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (athlete, date_unix) DO UPDATE SET "
+            "duration_secs = duration_secs + excluded.duration_secs"
+        )
+        SQL_LOGGER.debug("%s", sql)
+        with self.transaction():
+            self.cur.execute(sql, first)
+            written = self.cur.rowcount
+            self.cur.executemany(sql, rows)
+            written += self.cur.rowcount
+        METRICS.increment("rows_written", written, table=self.__table)
+
+    def get_daily_total(
+            self,
+            athlete: str,
+            date_unix: int
+    ) -> Optional[Tuple[str, int]]:
+        """
+        Retrieve the daily total of an active athlete on a given day.
+
+        Parameters
+        ----------
+        athlete : str
+            The athlete name as it appears in Strava.
+        date_unix : int
+            The day in unix format.
+
+        Returns
+        -------
+        Optional[Tuple[str, int]]
+            The athlete's name and the seconds of activity on that day, or None
+            if the athlete is not active.
+        """
+        what = "ATHLETES.name, COALESCE(SUM(t.duration_secs), 0)"
+        conditions = (
+            "AS t JOIN ATHLETES ON t.athlete = ATHLETES.strava_name "
+            "WHERE t.athlete = ? AND t.date_unix = ? AND ATHLETES.active = 1"
+        )
+        res = self._select(
+            what, self.__table, conditions, (athlete, date_unix)
+        )
+        return res[0] if res and res[0][0] is not None else None
+
+
+class _DebtsTable:
+    """Private object used to modify items in the DEBTS table."""
+
+    __table = "DEBTS"
+
+    def save_weekly_results(
+            self,
+            week_number: int,
+            results: Iterable[Tuple[str, int]],
+            required_days: int
+    ):
+        """
+        Save the results of a week together with the debts they generate.
+
+        Everything is written in a single transaction: the results are
+        upserted, athletes that did not complete the week get a debt (a total
+        abandonment if they did no day at all), debts that are no longer due
+        and were not paid are removed, and the weeks completed by every
+        athlete change by the completion of this week only, so that counts
+        kept before the results were stored are preserved. Running it again
+        for the same week gives the same state.
+
+        Parameters
+        ----------
+        week_number : int
+            The week number of the results.
+        results : Iterable[Tuple[str, int]]
+            The days completed by every athlete as (athlete, days), where
+            athlete is the name as it appears in Strava.
+        required_days : int
+            The number of days needed to complete the week.
+        """
+        rows = [
+            (athlete, week_number, days, days >= required_days)
+            for athlete, days in results
+        ]
+        select_completed = (
+            "SELECT athlete, completed FROM WEEKLY_RESULTS "
+            "WHERE week_number = ?"
+        )
+        upsert_results = (
+            "INSERT INTO WEEKLY_RESULTS VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (athlete, week_number) DO UPDATE SET "
+            "days = excluded.days, completed = excluded.completed"
+        )
+        upsert_debts = (
+            f"INSERT INTO {self.__table} "
+            "SELECT athlete, week_number, days = 0, 0 FROM WEEKLY_RESULTS "
+            "WHERE week_number = ? AND completed = 0 "
+            "ON CONFLICT (week_number, athlete) DO UPDATE SET "
+            "total_abandonment = excluded.total_abandonment"
+        )
+        delete_debts = (
+            f"DELETE FROM {self.__table} WHERE week_number = ? AND paid = 0 "
+            "AND athlete IN (SELECT athlete FROM WEEKLY_RESULTS "
+            "WHERE week_number = ? AND completed = 1)"
+        )
+        update_athletes = (
+            "UPDATE ATHLETES SET weeks_completed = weeks_completed + ? "
+            "WHERE strava_name = ?"
+        )
+
+        with self.transaction():
+            SQL_LOGGER.debug("%s", select_completed)
+            previous = dict(
+                self.cur.execute(select_completed, (week_number,))
+            )
+            changes = [
+                (int(completed) - previous.get(athlete, 0), athlete)
+                for athlete, _, _, completed in rows
+                if int(completed) != previous.get(athlete, 0)
+            ]
+            SQL_LOGGER.debug("%s", upsert_results)
+            self.cur.executemany(upsert_results, rows)
+            results = self.cur.rowcount
+            SQL_LOGGER.debug("%s", upsert_debts)
+            self.cur.execute(upsert_debts, (week_number,))
+            debts = self.cur.rowcount
+            SQL_LOGGER.debug("%s", delete_debts)
+            self.cur.execute(delete_debts, (week_number, week_number))
+            debts += self.cur.rowcount
+            SQL_LOGGER.debug("%s", update_athletes)
+            self.cur.executemany(update_athletes, changes)
+            athletes = self.cur.rowcount
+
+        METRICS.increment("rows_written", results, table="WEEKLY_RESULTS")
+        METRICS.increment("rows_written", debts, table=self.__table)
+        METRICS.increment("rows_written", athletes, table="ATHLETES")
+
+    def get_unanalyzed_weeks(self, ts: pd.Timestamp) -> List[int]:
+        """
+        Retrieve the weeks finished by a date whose results were not saved.
+
+        Only weeks with activities are considered.
+
+        Parameters
+        ----------
+        ts : :obj:`pd.Timestamp`
+            A local timestamp.
+
+        Returns
+        -------
+        List[int]
+            The week numbers in order.
+        """
+        what = "week_number"
+        additionals = (
+            "WHERE week_end_unix <= ? "
+            "AND week_number IN (SELECT week_number FROM DAILY_TOTALS) "
+            "AND week_number NOT IN (SELECT week_number FROM WEEKLY_RESULTS) "
+            "ORDER BY week_number"
+        )
+        res = self._select(
+            what, "WEEKS", additionals, (timestamp_to_unix(ts),)
+        )
+        return [x[0] for x in res]
+
+    def get_debts(self, week_number: int) -> List[Tuple[str, bool, bool]]:
+        """
+        Retrieve the debts of a week.
+
+        Parameters
+        ----------
+        week_number : int
+            The week number of the debts.
+
+        Returns
+        -------
+        List[Tuple[str, bool, bool]]
+            The debts as (athlete, total_abandonment, paid), where athlete is
+            the name as it appears in Strava.
+        """
+        what = "athlete, total_abandonment, paid"
+        additionals = "WHERE week_number = ? ORDER BY athlete"
+        res = self._select(what, self.__table, additionals, (week_number,))
+        return [(x, bool(y), bool(z)) for x, y, z in res]
+
+
+class _IngestCheckpointsTable:
+    """Private object used to modify items in the INGEST_CHECKPOINTS table."""
+
+    __table = "INGEST_CHECKPOINTS"
+
+    def get_ingest_checkpoint(
+            self,
+            date: str,
+            kind: Optional[str] = "daily"
+    ) -> Optional[Tuple[int, bool]]:
+        """
+        Retrieve the checkpoint of the ingest of a day.
+
+        Parameters
+        ----------
+        date : str
+            The date of the ingest as 'YYYY-MM-DD'.
+        kind : Optional[str]
+            'daily' for the ingest of the day or 'poll' for the ingests
+            between daily ones. The default is 'daily'.
+
+        Returns
+        -------
+        Optional[Tuple[int, bool]]
+            The number of club activities read up to the last commit and
+            whether the ingest finished, or None if it never started.
+        """
+        what = "position, completed"
+        additionals = "WHERE date = ? AND kind = ?"
+        res = self._select(what, self.__table, additionals, (date, kind))
+        return (res[0][0], bool(res[0][1])) if res else None
+
+    def set_ingest_checkpoint(
+            self,
+            date: str,
+            position: int,
+            completed: Optional[bool] = False,
+            kind: Optional[str] = "daily"
+    ):
+        """
+        Save the checkpoint of the ingest of a day.
+
+        Call it inside the transaction that commits the activities, so that
+        the checkpoint never gets ahead of the saved activities.
+
+        Parameters
+        ----------
+        date : str
+            The date of the ingest as 'YYYY-MM-DD'.
+        position : int
+            The number of club activities read (saved, skipped or ignored),
+            starting from the most recent one. Informational only, since
+            interrupted ingests are resumed from the top.
+        completed : Optional[bool]
+            True if the ingest finished. The default is False.
+        kind : Optional[str]
+            'daily' for the ingest of the day or 'poll' for the ingests
+            between daily ones. The default is 'daily'.
+        """
+        sql = (
+            f"INSERT INTO {self.__table} (date, kind, position, completed) "
+            "VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (date, kind) DO UPDATE SET "
+            "position = excluded.position, completed = excluded.completed"
+        )
+        SQL_LOGGER.debug("%s", sql)
+        self.cur.execute(sql, (date, kind, position, completed))
+        METRICS.increment(
+            "rows_written", self.cur.rowcount, table=self.__table
+        )
+        self._commit()
+
+
+class _ZapierRowsTable:
+    """Private object used to modify items in the ZAPIER_ROWS table."""
+
+    __table = "ZAPIER_ROWS"
+
+    def add_zapier_rows(self, rows: Iterable[Tuple[int, Optional[int], str]]):
+        """
+        Add rows of the Zapier spreadsheet to its mirror.
+
+        Parameters
+        ----------
+        rows : Iterable[Tuple[int, Optional[int], str]]
+            The (row_number, unix_upload_time, record) of every row, where
+            the record is the JSON of the row keyed by the sheet header.
+        """
+        self._insert_many(self.__table, rows)
+
+    def get_last_zapier_row(self) -> int:
+        """
+        Retrieve the last row of the spreadsheet already mirrored.
+
+        Returns
+        -------
+        int
+            The sheet row number, or 0 if nothing was mirrored yet.
+        """
+        res = self._select("MAX(row_number)", self.__table, "")
+        return res[0][0] or 0
+
+    def count_zapier_uploads(self, start_unix: int, end_unix: int) -> int:
+        """
+        Count the mirrored rows uploaded within a period.
+
+        Parameters
+        ----------
+        start_unix : int
+            The start of the period (included) as unix time.
+        end_unix : int
+            The end of the period (excluded) as unix time.
+
+        Returns
+        -------
+        int
+            The number of rows.
+        """
+        additionals = "WHERE unix_upload_time >= ? AND unix_upload_time < ?"
+        res = self._select(
+            "COUNT(*)", self.__table, additionals, (start_unix, end_unix)
+        )
+        return res[0][0]
+
+    def get_zapier_records(
+            self,
+            start_unix: int,
+            end_unix: int
+    ) -> List[Tuple[int, str]]:
+        """
+        Retrieve the mirrored rows uploaded within a period.
+
+        Parameters
+        ----------
+        start_unix : int
+            The start of the period (included) as unix time.
+        end_unix : int
+            The end of the period (excluded) as unix time.
+
+        Returns
+        -------
+        List[Tuple[int, str]]
+            The (row_number, record) of every row, in sheet order.
+        """
+        additionals = (
+            "WHERE unix_upload_time >= ? AND unix_upload_time < ? "
+            "ORDER BY row_number"
+        )
+        return self._select(
+            "row_number, record", self.__table, additionals,
+            (start_unix, end_unix)
+        )
 
+    def clear_zapier_rows(self):
+        """Remove every mirrored row, e.g. before a full resync."""
+        self._delete(self.__table, "row_number > ?", (0,))
 
-class DBHandler(_ActivitiesTable, _AthletesTable, _WeeksTable):
+
+class DBHandler(
+        _ActivitiesTable,
+        _AthletesTable,
+        _DailyTotalsTable,
+        _DebtsTable,
+        _IngestCheckpointsTable,
+        _WeeksTable,
+        _ZapierRowsTable
+):
     """
     Data base handler for athletes, activities, weeks, and debts.
 
     Attributes
     ----------
     conn : :obj:`sqlite3.dbapi2.Connection`
-        A 'Connection' object pointing to the data base.
+        A 'Connection' object pointing to the data base. Handlers created in
+        the same thread share the connection of CONNECTION_POOL.
     cur : :obj:`sqlite3.dbapi2.Cursor`
         A 'Cursor' object based on the previous connection.
+
+    Notes
+    -----
+    All queries are built with bound parameters only, so that the SQL text of
+    a given query never changes and sqlite3 can reuse its compiled statement
+    from the connection's statement cache. The size of the cache is set for
+    every connection with `CONNECTION_POOL.configure(cached_statements=...)`.
     """
 
-    def __init__(self, set_template: Optional[bool] = False):
+    def __init__(
+            self,
+            set_template: Optional[bool] = False,
+            migrate: Optional[bool] = True,
+            read_only: Optional[bool] = False
+    ):
         """Set instance attributes."""
         if not set_template:
             self._validate_db(DATABASE, DATABASE_TEMPLATE)
-            self.conn = sqlite3.connect(DATABASE)
+            self.conn = CONNECTION_POOL.get(DATABASE, read_only)
         else:
-            self.conn = sqlite3.connect(DATABASE_TEMPLATE)
+            # The template is kept out of the pool so that its journal mode
+            # is never changed.
+            self.conn = sqlite3.connect(DATABASE_TEMPLATE, factory=_Connection)
         self.cur = self.conn.cursor()
 
+        if not set_template and migrate and not read_only:
+            SchemaMigrator(self.conn).migrate()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Group several statements into a single transaction.
+
+        Statements executed inside the context are committed once at the end
+        or rolled back altogether if an exception is raised.
+
+        Yields
+        ------
+        :obj:`sqlite3.dbapi2.Cursor`
+            The cursor of the handler.
+        """
+        if self.conn.in_handler_transaction:
+            # Nested transactions are merged into the outer one.
+            yield self.cur
+            return
+
+        self.conn.in_handler_transaction = True
+        try:
+            yield self.cur
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.in_handler_transaction = False
+
+    def _commit(self):
+        if not self.conn.in_handler_transaction:
+            self.conn.commit()
+
     def _validate_db(self, db_path: Path, db_template_path: Path):
 
         # Check if db exists, if not copy from template.
@@ -331,26 +956,82 @@ class DBHandler(_ActivitiesTable, _AthletesTable, _WeeksTable):
             LOGGER.info("Copying database from template...")
             shutil.copy(db_template_path, db_path)
 
-    def _insert(self, table: str, values: str):
-        sql = f"INSERT INTO {table} VALUES {values}"
-        print(sql)
-        self.cur.execute(sql)
-        self.conn.commit()
+    def _insert(
+            self,
+            table: str,
+            values: Tuple,
+            columns: Optional[Tuple[str, ...]] = None
+    ):
+        sql = self._insert_sql(table, len(values), columns)
+        SQL_LOGGER.debug("%s", sql)
+        self.cur.execute(sql, values)
+        METRICS.increment("rows_written", self.cur.rowcount, table=table)
+        self._commit()
+
+    def _insert_many(
+            self,
+            table: str,
+            rows: Iterable[Tuple],
+            columns: Optional[Tuple[str, ...]] = None
+    ):
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return
+
+        sql = self._insert_sql(table, len(first), columns)
+        SQL_LOGGER.debug("%s", sql)
+        with self.transaction():
+            self.cur.execute(sql, first)
+            written = self.cur.rowcount
+            self.cur.executemany(sql, rows)
+            written += self.cur.rowcount
+        METRICS.increment("rows_written", written, table=table)
 
-    def _update(self, table: str, changes: str, condition: str):
+    def _insert_sql(
+            self,
+            table: str,
+            n_values: int,
+            columns: Optional[Tuple[str, ...]] = None
+    ) -> str:
+        placeholders = ", ".join("?" * n_values)
+        if columns:
+            table = "{} ({})".format(table, ", ".join(columns))
+        return f"INSERT INTO {table} VALUES ({placeholders})"
+
+    def _update(
+            self,
+            table: str,
+            changes: str,
+            condition: str,
+            params: Optional[Tuple] = ()
+    ):
         sql = f"UPDATE {table} SET {changes} WHERE {condition}"
-        print(sql)
-        self.cur.execute(sql)
-        self.conn.commit()
+        SQL_LOGGER.debug("%s", sql)
+        self.cur.execute(sql, params)
+        METRICS.increment("rows_written", self.cur.rowcount, table=table)
+        self._commit()
 
-    def _delete(self, table: str, conditions: str):
+    def _delete(
+            self,
+            table: str,
+            conditions: str,
+            params: Optional[Tuple] = ()
+    ):
         sql = f"DELETE FROM {table} WHERE {conditions}"
-        print(sql)
-        self.cur.execute(sql)
-        self.conn.commit()
+        SQL_LOGGER.debug("%s", sql)
+        self.cur.execute(sql, params)
+        METRICS.increment("rows_written", self.cur.rowcount, table=table)
+        self._commit()
 
-    def _select(self, what: str, table: str, additionals: str) -> List:
+    def _select(
+            self,
+            what: str,
+            table: str,
+            additionals: str,
+            params: Optional[Tuple] = ()
+    ) -> List:
         sql = f"SELECT {what} FROM {table} {additionals}"
-        print(sql)
-        result = self.cur.execute(sql).fetchall()
+        SQL_LOGGER.debug("%s", sql)
+        result = self.cur.execute(sql, params).fetchall()
         return result
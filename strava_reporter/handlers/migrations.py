@@ -0,0 +1,321 @@
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.log import LOGGER
+
+
+class Migration:
+    """
+    A numbered change to the database schema.
+
+    Every step of a migration must be idempotent, so that a migration
+    interrupted halfway can safely be applied again.
+
+    Attributes
+    ----------
+    version : int
+        The schema version reached once the migration is applied.
+    description : str
+        A short description of the change.
+    tables : List[str]
+        The existing tables touched by the migration.
+    statements : List[str]
+        The SQL statements to execute.
+    columns : List[Tuple[str, str]]
+        Columns to add as (table, column definition). They are only added
+        when missing, since sqlite has no 'ADD COLUMN IF NOT EXISTS'.
+    rebuilds : List[str]
+        The tables that are copied over entirely by the migration.
+    """
+
+    def __init__(
+            self,
+            version: int,
+            description: str,
+            tables: Optional[List[str]] = None,
+            statements: Optional[List[str]] = None,
+            columns: Optional[List[Tuple[str, str]]] = None,
+            rebuilds: Optional[List[str]] = None,
+    ):
+        """Set instance attributes."""
+        self.version = version
+        self.description = description
+        self.tables = tables or []
+        self.statements = statements or []
+        self.columns = columns or []
+        self.rebuilds = rebuilds or []
+
+    def apply(self, cur: sqlite3.Cursor):
+        """
+        Execute the migration steps.
+
+        Parameters
+        ----------
+        cur : :obj:`sqlite3.dbapi2.Cursor`
+            The cursor used to execute the statements.
+        """
+        for table, definition in self.columns:
+            column = definition.split()[0]
+            info = cur.execute(f"PRAGMA table_info({table})").fetchall()
+            existing = [x[1] for x in info]
+            if column not in existing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+
+        for sql in self.statements:
+            cur.execute(sql)
+
+    def __repr__(self) -> str:
+        """Representation of the object."""
+        return "{:03d} ({})".format(self.version, self.description)
+
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "Secondary indexes for the most frequent queries",
+        tables=["ACTIVITIES", "WEEKS", "DEBTS"],
+        statements=[
+            # get_weekly_activities (covering for the weekly aggregation).
+            "CREATE INDEX IF NOT EXISTS IDX_ACTIVITIES_WEEK ON ACTIVITIES "
+            "(week_number, athlete, date_unix, duration_secs)",
+            # get_last_hashes.
+            "CREATE INDEX IF NOT EXISTS IDX_ACTIVITIES_DATE ON ACTIVITIES "
+            "(date, activity_id)",
+            # get_week_number.
+            "CREATE INDEX IF NOT EXISTS IDX_WEEKS_UNIX ON WEEKS "
+            "(week_start_unix, week_end_unix)",
+            "CREATE INDEX IF NOT EXISTS IDX_DEBTS_WEEK ON DEBTS "
+            "(week_number, athlete)",
+        ],
+    ),
+    Migration(
+        2,
+        "Date independent activity fingerprints",
+        tables=["ACTIVITIES"],
+        columns=[("ACTIVITIES", "fingerprint VARCHAR(32)")],
+        statements=[
+            # get_known_fingerprints.
+            "CREATE INDEX IF NOT EXISTS IDX_ACTIVITIES_FINGERPRINT ON "
+            "ACTIVITIES (date, fingerprint)",
+        ],
+    ),
+    Migration(
+        3,
+        "Athletes index for the weekly aggregation join",
+        tables=["ATHLETES"],
+        statements=[
+            # get_weekly_totals.
+            "CREATE INDEX IF NOT EXISTS IDX_ATHLETES_STRAVA_NAME ON ATHLETES "
+            "(strava_name, active, name)",
+        ],
+    ),
+    Migration(
+        4,
+        "Per athlete daily totals for the incremental analysis",
+        tables=["ACTIVITIES"],
+        statements=[
+            "CREATE TABLE IF NOT EXISTS DAILY_TOTALS ("
+            "athlete VARCHAR(255) NOT NULL, "
+            "week_number INTEGER NOT NULL, "
+            "date_unix INT NOT NULL, "
+            "duration_secs INT NOT NULL, "
+            "PRIMARY KEY (athlete, date_unix), "
+            "FOREIGN KEY (week_number) REFERENCES WEEKS(week_number))",
+            # Backfill with the activities already saved.
+            "INSERT OR IGNORE INTO DAILY_TOTALS "
+            "SELECT athlete, week_number, date_unix, SUM(duration_secs) "
+            "FROM ACTIVITIES GROUP BY athlete, date_unix",
+        ],
+    ),
+    Migration(
+        5,
+        "Weekly results and one debt per athlete and week",
+        tables=["DEBTS"],
+        statements=[
+            "CREATE TABLE IF NOT EXISTS WEEKLY_RESULTS ("
+            "athlete VARCHAR(255) NOT NULL, "
+            "week_number INTEGER NOT NULL, "
+            "days INT NOT NULL, "
+            "completed BIT NOT NULL, "
+            "PRIMARY KEY (athlete, week_number), "
+            "FOREIGN KEY (week_number) REFERENCES WEEKS(week_number))",
+            # Keep a single debt per athlete and week before enforcing it.
+            "DELETE FROM DEBTS WHERE rowid NOT IN ("
+            "SELECT MIN(rowid) FROM DEBTS GROUP BY athlete, week_number)",
+            "DROP INDEX IF EXISTS IDX_DEBTS_WEEK",
+            "CREATE UNIQUE INDEX IF NOT EXISTS IDX_DEBTS_WEEK ON DEBTS "
+            "(week_number, athlete)",
+        ],
+    ),
+    Migration(
+        6,
+        "Checkpoints of the daily ingest",
+        statements=[
+            "CREATE TABLE IF NOT EXISTS INGEST_CHECKPOINTS ("
+            "date VARCHAR(10) NOT NULL PRIMARY KEY, "
+            "position INT NOT NULL, "
+            "completed BIT NOT NULL)",
+        ],
+    ),
+    Migration(
+        7,
+        "Local mirror of the Zapier spreadsheet",
+        statements=[
+            "CREATE TABLE IF NOT EXISTS ZAPIER_ROWS ("
+            "row_number INTEGER NOT NULL PRIMARY KEY, "
+            "unix_upload_time INT, "
+            "record TEXT NOT NULL)",
+            # count_zapier_uploads.
+            "CREATE INDEX IF NOT EXISTS IDX_ZAPIER_UPLOAD_TIME ON ZAPIER_ROWS "
+            "(unix_upload_time)",
+        ],
+    ),
+    Migration(
+        8,
+        "Separate checkpoints for the daily ingest and the polls",
+        tables=["INGEST_CHECKPOINTS"],
+        rebuilds=["INGEST_CHECKPOINTS"],
+        statements=[
+            "CREATE TABLE IF NOT EXISTS INGEST_CHECKPOINTS_NEW ("
+            "date VARCHAR(10) NOT NULL, "
+            "kind VARCHAR(5) NOT NULL, "
+            "position INT NOT NULL, "
+            "completed BIT NOT NULL, "
+            "PRIMARY KEY (date, kind))",
+            # Earlier checkpoints are kept as daily ones.
+            "INSERT OR IGNORE INTO INGEST_CHECKPOINTS_NEW "
+            "SELECT date, 'daily', position, completed "
+            "FROM INGEST_CHECKPOINTS",
+            "DROP TABLE INGEST_CHECKPOINTS",
+            "ALTER TABLE INGEST_CHECKPOINTS_NEW RENAME TO INGEST_CHECKPOINTS",
+        ],
+    ),
+]
+
+
+class SchemaMigrator:
+    """
+    Bring a database up to the latest schema version.
+
+    The current version is stored in 'PRAGMA user_version', which is 0 for
+    databases created from the original template.
+
+    Attributes
+    ----------
+    conn : :obj:`sqlite3.dbapi2.Connection`
+        A 'Connection' object pointing to the data base.
+    migrations : List[Migration]
+        All known migrations, sorted by version.
+    """
+
+    def __init__(
+            self,
+            conn: sqlite3.Connection,
+            migrations: Optional[List[Migration]] = None
+    ):
+        """Set instance attributes."""
+        self.conn = conn
+        self.migrations = sorted(
+            migrations if migrations is not None else MIGRATIONS,
+            key=lambda x: x.version
+        )
+
+    @property
+    def current_version(self) -> int:
+        """int: The schema version of the database."""
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    @property
+    def latest_version(self) -> int:
+        """int: The schema version after applying every migration."""
+        return self.migrations[-1].version if self.migrations else 0
+
+    def pending(self) -> List[Migration]:
+        """
+        Retrieve the migrations that have not been applied yet.
+
+        Returns
+        -------
+        List[Migration]
+            The pending migrations, sorted by version.
+        """
+        version = self.current_version
+        return [x for x in self.migrations if x.version > version]
+
+    def plan(self) -> List[Dict[str, Any]]:
+        """
+        Estimate the cost of the pending migrations without applying them.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            One dictionary per pending migration with its version, its
+            description, the number of rows of every table it touches and the
+            tables it rebuilds.
+        """
+        return [
+            {
+                "version": migration.version,
+                "description": migration.description,
+                "rows": {
+                    table: self._count_rows(table)
+                    for table in migration.tables
+                },
+                "rebuilds": migration.rebuilds,
+            }
+            for migration in self.pending()
+        ]
+
+    def migrate(self, dry_run: Optional[bool] = False) -> List[Dict[str, Any]]:
+        """
+        Apply the pending migrations in order.
+
+        Each migration runs in its own transaction together with the update
+        of the schema version.
+
+        Parameters
+        ----------
+        dry_run : Optional[bool]
+            If True, only log the migration plan. The default is False.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            The migration plan. See `plan`.
+        """
+        plan = self.plan()
+        for step in plan:
+            LOGGER.info(
+                "Migration %03d (%s): rows %s, rebuilds %s.",
+                step["version"],
+                step["description"],
+                step["rows"],
+                step["rebuilds"] or "none",
+            )
+
+        if dry_run:
+            return plan
+
+        for migration in self.pending():
+            LOGGER.info("Applying migration %s...", migration)
+            cur = self.conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                migration.apply(cur)
+                cur.execute(f"PRAGMA user_version = {migration.version}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                LOGGER.error("Migration %s failed.", migration)
+                raise
+
+        return plan
+
+    def _count_rows(self, table: str) -> int:
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table,)
+        ).fetchone()
+        if not exists:
+            return 0
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
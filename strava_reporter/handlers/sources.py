@@ -0,0 +1,355 @@
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+from ..utils.log import LOGGER
+from ..utils.metrics import METRICS
+
+
+class ActivitySource(ABC):
+    """
+    Base class of the providers of club activities.
+
+    Sources stream the raw activities of the club (as returned by the
+    club activities endpoint of Strava), most recent first.
+
+    Attributes
+    ----------
+    api_calls : int
+        The number of pages requested so far.
+    """
+
+    api_calls = 0
+
+    @abstractmethod
+    def iter_club_activities(
+            self,
+            limit: Optional[int] = None,
+            offset: Optional[int] = 0
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the club activities, most recent first.
+
+        Parameters
+        ----------
+        limit : Optional[int]
+            The maximum number of activities to retrieve. The default is None
+            (every activity available).
+        offset : Optional[int]
+            The number of most recent activities to leave out. The default is
+            0.
+
+        Returns
+        -------
+        Iterator[Dict[str, Any]]
+            The raw activities.
+        """
+
+    def get_athletes_in_club(self) -> Set[str]:
+        """
+        Retrieve the athletes that are members of the club.
+
+        Returns
+        -------
+        Set[str]
+            The athletes names.
+        """
+        threshold = 250
+
+        members = set()
+
+        # Iterate over activities and extract club members.
+        for act_dict in self.iter_club_activities(limit=threshold):
+            name = "{} {}".format(
+                act_dict["athlete"]["firstname"],
+                act_dict["athlete"]["lastname"],
+            )
+            members.add(name)
+
+        return members
+
+
+class ReplaySource(ActivitySource):
+    """
+    Source that replays the club activities recorded in a JSONL file.
+
+    The file holds an activity per line, most recent first (see
+    `record_activities`). It is read lazily, a page at a time, so that large
+    fixtures can be replayed without loading them.
+
+    Attributes
+    ----------
+    fixture : :obj:`Path`
+        The path of the recorded activities.
+    per_page : int
+        The number of activities per simulated page.
+    latency : float
+        The seconds waited before every page, to simulate the API.
+    """
+
+    def __init__(
+            self,
+            fixture: Path,
+            per_page: Optional[int] = 100,
+            latency: Optional[float] = 0.0,
+            sleep: Optional[Callable[[float], None]] = time.sleep,
+    ):
+        """Set instance attributes."""
+        self.fixture = Path(fixture)
+        self.per_page = per_page
+        self.latency = latency
+        self.api_calls = 0
+        self._sleep = sleep
+
+    def iter_club_activities(
+            self,
+            limit: Optional[int] = None,
+            offset: Optional[int] = 0
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the recorded activities.
+
+        Parameters
+        ----------
+        limit : Optional[int]
+            The maximum number of activities to retrieve. The default is None
+            (every activity recorded).
+        offset : Optional[int]
+            The number of most recent activities to leave out. The default is
+            0.
+
+        Yields
+        ------
+        Dict[str, Any]
+            A raw activity.
+        """
+        stop = offset + limit if limit is not None else None
+        activities = islice(read_fixture(self.fixture), offset, stop)
+        for i, activity in enumerate(activities, offset):
+            if i == offset or i % self.per_page == 0:
+                self.api_calls += 1
+                METRICS.increment("api_calls", source="replay")
+                if self.latency:
+                    self._sleep(self.latency)
+            yield activity
+
+
+class ReplayServer:
+    """
+    Local stand-in of the club activities endpoint of the Strava API.
+
+    Pages of the recorded activities are served on
+    '<url>/clubs/<club_id>/activities' (for any club id) with the 'page' and
+    'per_page' parameters, so that `ClubActivitiesFetcher` can be pointed at
+    it through its `base_url`. It can be used as a context manager.
+
+    Attributes
+    ----------
+    activities : List[Dict[str, Any]]
+        The recorded activities, most recent first.
+    latency : float
+        The seconds waited before answering every request.
+    short_limit : int
+        The short term limit reported in 'X-RateLimit-Limit'.
+    long_limit : int
+        The long term limit reported in 'X-RateLimit-Limit'.
+    throttle_every : Optional[int]
+        If given, every n-th request is rejected with a 429 status.
+    retry_after : Optional[int]
+        The 'Retry-After' header of the rejected requests, or None to leave
+        it out.
+    requests : int
+        The number of requests received so far.
+    """
+
+    def __init__(
+            self,
+            activities: Iterable[Dict[str, Any]],
+            latency: Optional[float] = 0.0,
+            short_limit: Optional[int] = 100,
+            long_limit: Optional[int] = 1000,
+            throttle_every: Optional[int] = None,
+            retry_after: Optional[int] = 0,
+    ):
+        """Set instance attributes."""
+        self.activities = list(activities)
+        self.latency = latency
+        self.short_limit = short_limit
+        self.long_limit = long_limit
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """str: The base url of the server (see `STRAVA_API`)."""
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self) -> "ReplayServer":
+        """
+        Start serving in a background thread on a free local port.
+
+        Returns
+        -------
+        :obj:`ReplayServer`
+            The server itself.
+        """
+        self._server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), self._get_handler()
+        )
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        ).start()
+        LOGGER.info("Replay server listening on %s.", self.url)
+        return self
+
+    def stop(self):
+        """Stop serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "ReplayServer":
+        """Start the server."""
+        return self.start()
+
+    def __exit__(self, *args):
+        """Stop the server."""
+        self.stop()
+
+    def _get_page(self, page: int, per_page: int) -> bytes:
+        start = (page - 1) * per_page
+        return json.dumps(self.activities[start:start + per_page]).encode()
+
+    def _get_handler(self) -> type:
+        replay = self
+
+        class _Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                with replay._lock:
+                    replay.requests += 1
+                    n = replay.requests
+
+                if replay.latency:
+                    time.sleep(replay.latency)
+
+                url = urlparse(self.path)
+                if not url.path.endswith("/activities"):
+                    self.send_error(404)
+                    return
+
+                if replay.throttle_every and n % replay.throttle_every == 0:
+                    self.send_response(429)
+                    if replay.retry_after is not None:
+                        self.send_header(
+                            "Retry-After", str(replay.retry_after)
+                        )
+                    self.end_headers()
+                    return
+
+                query = parse_qs(url.query)
+                body = replay._get_page(
+                    int(query.get("page", [1])[0]),
+                    int(query.get("per_page", [30])[0]),
+                )
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header(
+                    "X-RateLimit-Limit",
+                    "{},{}".format(replay.short_limit, replay.long_limit)
+                )
+                self.send_header("X-RateLimit-Usage", "{},{}".format(n, n))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
+
+
+def read_fixture(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Read recorded activities lazily.
+
+    Parameters
+    ----------
+    path : :obj:`Path`
+        The path of a JSONL file with an activity per line.
+
+    Yields
+    ------
+    Dict[str, Any]
+        A raw activity.
+    """
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def record_activities(
+        activities: Iterable[Dict[str, Any]],
+        path: Path
+) -> Iterator[Dict[str, Any]]:
+    """
+    Save the activities that go through the iterator in a JSONL file.
+
+    Parameters
+    ----------
+    activities : Iterable[Dict[str, Any]]
+        The raw activities of any source.
+    path : :obj:`Path`
+        The path of the recording. It is overwritten.
+
+    Yields
+    ------
+    Dict[str, Any]
+        The same activities, unchanged.
+    """
+    with open(path, "w") as f:
+        for activity in activities:
+            f.write(json.dumps(activity) + "\n")
+            yield activity
+
+
+def get_activity_source(source: Optional[str] = None) -> ActivitySource:
+    """
+    Get the source of the club activities.
+
+    Parameters
+    ----------
+    source : Optional[str]
+        'strava' for the Strava API or the path of a JSONL recording to
+        replay. The default is None (Strava).
+
+    Returns
+    -------
+    :obj:`ActivitySource`
+        The activity source.
+    """
+    if source is None or source == "strava":
+        from .strava import get_strava_objects
+
+        return get_strava_objects()
+
+    if not Path(source).exists():
+        msg = "Activity source '{}' not found.".format(source)
+        LOGGER.error(msg)
+        raise FileNotFoundError(msg)
+
+    LOGGER.info("Replaying activities from '%s'.", source)
+    return ReplaySource(Path(source))
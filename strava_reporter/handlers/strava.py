@@ -1,95 +1,399 @@
-import os
-from typing import Set
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import (Any, Callable, Dict, Iterator, List, Mapping, Optional,
+                    Union)
 
-from dotenv import load_dotenv
+import requests
 from stravalib.client import Client
-from stravalib.exc import AccessUnauthorized
+from stravalib.model import Club
 
 from ..config import Config
 from ..utils.log import LOGGER
-from ..utils.path_index import ENV_VARS
+from ..utils.metrics import METRICS
+from .sources import ActivitySource
+from .tokens import TokenManager, get_token_manager
 
+STRAVA_API = "https://www.strava.com/api/v3"
 
-class StravaObjects:
-    """Access Strava with account and retrieve the club object.
+
+class RateLimiter:
+    """
+    Scheduler that keeps requests within Strava's rate limits.
+
+    Strava reports a short term (15 minutes) and a long term (daily) limit
+    and usage through the 'X-RateLimit-Limit' and 'X-RateLimit-Usage'
+    headers as 'short,long'. Short term windows reset every quarter of an
+    hour and the long term window at midnight UTC.
 
     Attributes
     ----------
-    client : :obj:`Client`
-        The Strava API client.
-    club : :obj:`Club`
-        The club object extracted through its id.
+    short_limit : int
+        The number of requests allowed every 15 minutes.
+    long_limit : int
+        The number of requests allowed per day.
+    short_usage : int
+        The requests made in the current 15 minutes window.
+    long_usage : int
+        The requests made in the current day.
     """
 
-    def __init__(self):
+    short_window = 15 * 60
+    long_window = 24 * 60 * 60
+
+    def __init__(
+            self,
+            short_limit: Optional[int] = 100,
+            long_limit: Optional[int] = 1000,
+            clock: Optional[Callable[[], float]] = time.time,
+            sleep: Optional[Callable[[float], None]] = time.sleep,
+    ):
         """Set instance attributes."""
-        self._load_environment_variables()
-        self._read_environment_variables()
-        self.__config = Config()
+        self.short_limit = short_limit
+        self.long_limit = long_limit
+        self.short_usage = 0
+        self.long_usage = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._short_reset = self._next_reset(self.short_window)
+        self._long_reset = self._next_reset(self.long_window)
 
-        try:
-            if not self.__access_token:
-                raise ValueError
-            self.client = Client(self.__access_token)
-            self.club = self.client.get_club(self.__config.club_id)
-            LOGGER.info("Access granted with Access Token.")
-        except (AccessUnauthorized, ValueError):
-            self.client = Client()
-            print("Access required through Code.")
-            self._request_token()
-            self.club = self.client.get_club(self.__config.club_id)
-            LOGGER.info("Access granted with Code.")
-
-    def get_athletes_in_club(self) -> Set[str]:
+    def acquire(self):
+        """Reserve a request, waiting for the next window if required."""
+        with self._lock:
+            self._roll_windows()
+
+            if self.long_usage >= self.long_limit:
+                msg = "Strava daily rate limit reached."
+                LOGGER.error(msg)
+                raise RuntimeError(msg)
+
+            if self.short_usage >= self.short_limit:
+                remaining = self._short_reset - self._clock()
+                LOGGER.info("Rate limit reached, waiting %.0f s.", remaining)
+                self._sleep(max(remaining, 0) + 1)
+                self._roll_windows()
+
+            self.short_usage += 1
+            self.long_usage += 1
+
+    def update(self, headers: Mapping[str, str]):
+        """
+        Synchronize limits and usage with the headers of a response.
+
+        Parameters
+        ----------
+        headers : Mapping[str, str]
+            The headers of a Strava API response.
+        """
+        limit = headers.get("X-RateLimit-Limit")
+        usage = headers.get("X-RateLimit-Usage")
+        if not limit or not usage:
+            return
+
+        with self._lock:
+            self.short_limit, self.long_limit = map(int, limit.split(","))
+            self.short_usage, self.long_usage = map(int, usage.split(","))
+
+    def exhaust_short_window(self):
+        """Block further requests until the short term window resets."""
+        with self._lock:
+            self.short_usage = self.short_limit
+
+    def wait(self, seconds: float):
+        """
+        Pause the calling thread with the scheduler's sleep function.
+
+        Parameters
+        ----------
+        seconds : float
+            The seconds to wait.
         """
-        Retrieve the athletes that are members of the club.
+        self._sleep(max(seconds, 0))
+
+    def _roll_windows(self):
+        now = self._clock()
+        if now >= self._short_reset:
+            self.short_usage = 0
+            self._short_reset = self._next_reset(self.short_window)
+        if now >= self._long_reset:
+            self.long_usage = 0
+            self._long_reset = self._next_reset(self.long_window)
+
+    def _next_reset(self, window: int) -> float:
+        return (self._clock() // window + 1) * window
+
+
+class ClubActivitiesFetcher:
+    """
+    Paginated, concurrent reader of a club's activities.
+
+    Pages are requested in parallel through a bounded thread pool and the
+    activities are yielded in the order Strava returns them as soon as their
+    page (and all the previous ones) arrived. The number of pages in flight
+    starts at one and doubles after every full page up to `max_workers`, so
+    that short runs (which usually stop on the first page) do not spend
+    requests on pages they never read.
+
+    Attributes
+    ----------
+    club_id : int
+        The id of the club.
+    per_page : int
+        The number of activities requested per page (200 at most).
+    max_workers : int
+        The maximum number of pages requested at the same time.
+    rate_limiter : :obj:`RateLimiter`
+        The scheduler shared by every request of the fetcher.
+    """
+
+    def __init__(
+            self,
+            access_token: Union[str, Callable[[], str]],
+            club_id: int,
+            per_page: Optional[int] = 100,
+            max_workers: Optional[int] = 4,
+            base_url: Optional[str] = STRAVA_API,
+            rate_limiter: Optional[RateLimiter] = None,
+            max_retries: Optional[int] = 5,
+            timeout: Optional[float] = 30.0,
+    ):
+        """Set instance attributes."""
+        self.club_id = club_id
+        self.per_page = per_page
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.api_calls = 0
+        self._url = "{}/clubs/{}/activities".format(base_url, club_id)
+        self._access_token = access_token
+        self._max_retries = max_retries
+        self._timeout = timeout
+
+    @METRICS.timed()
+    def fetch_page(self, page: int) -> List[Dict[str, Any]]:
+        """
+        Retrieve a single page of activities.
+
+        Requests rejected with a 429 status are retried after the
+        'Retry-After' header when present. Otherwise the short term window is
+        considered exhausted (e.g. by requests made outside this process), so
+        every request of the fetcher waits for its reset.
+
+        Parameters
+        ----------
+        page : int
+            The page number, starting at 1.
 
         Returns
         -------
-        Set[str]
-            The athletes names.
+        List[Dict[str, Any]]
+            The raw activities of the page.
         """
-        counter = 0
-        threshold = 250
-
-        members = set()
-
-        # Iterate over activities and extract club members.
-        for activity in self.club.activities:
-            counter += 1
-            act_dict = activity.to_dict()
-            name = "{} {}".format(
-                act_dict["athlete"]["firstname"],
-                act_dict["athlete"]["lastname"],
+        params = {"page": page, "per_page": self.per_page}
+
+        for _ in range(self._max_retries + 1):
+            self.rate_limiter.acquire()
+            response = requests.get(
+                self._url,
+                headers=self._get_headers(),
+                params=params,
+                timeout=self._timeout,
             )
-            members.add(name)
-            if counter == threshold:
-                break
+            self.api_calls += 1
+            METRICS.increment("api_calls", source="strava")
+            self.rate_limiter.update(response.headers)
 
-        return members
+            if response.status_code != 429:
+                response.raise_for_status()
+                return response.json()
 
-    def _load_environment_variables(self):
-        load_dotenv(ENV_VARS)
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                LOGGER.info(
+                    "Page %d throttled by Strava, retrying in %.0f s.",
+                    page,
+                    float(retry_after),
+                )
+                self.rate_limiter.wait(float(retry_after))
+            else:
+                LOGGER.info(
+                    "Page %d throttled by Strava, waiting for the next "
+                    "rate limit window.",
+                    page,
+                )
+                self.rate_limiter.exhaust_short_window()
 
-    def _read_environment_variables(self):
-        self.__client_id = int(os.environ.get("CLIENT_ID"))
-        self.__client_secret = os.environ.get("CLIENT_SECRET")
-        self.__access_token = os.environ.get("ACCESS_TOKEN")
+        msg = "Page {} could not be retrieved after {} retries.".format(
+            page, self._max_retries
+        )
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
+
+    def _get_headers(self) -> Dict[str, str]:
+        access_token = (
+            self._access_token()
+            if callable(self._access_token)
+            else self._access_token
+        )
+        return {"Authorization": "Bearer {}".format(access_token)}
 
-    def _request_token(self):
-        authorize_url = self.client.authorization_url(
-            client_id=self.__client_id,
+    def iter_activities(
+            self,
+            limit: Optional[int] = None,
+            offset: Optional[int] = 0
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the club activities, most recent first.
+
+        Parameters
+        ----------
+        limit : Optional[int]
+            The maximum number of activities to yield. The default is None
+            (every activity available).
+        offset : Optional[int]
+            The number of most recent activities to leave out. Pages before
+            the offset are not requested. The default is 0.
+
+        Yields
+        ------
+        Dict[str, Any]
+            A raw activity.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending: Dict[int, Future] = {}
+        next_page = offset // self.per_page + 1
+        to_skip = offset % self.per_page
+        window = 1
+        yielded = 0
+
+        try:
+            page = next_page
+            while True:
+                while len(pending) < window:
+                    pending[next_page] = executor.submit(
+                        self.fetch_page, next_page
+                    )
+                    next_page += 1
+
+                activities = pending.pop(page).result()
+                for activity in activities[to_skip:]:
+                    yield activity
+                    yielded += 1
+                    if yielded == limit:
+                        return
+
+                if len(activities) < self.per_page:
+                    return
+
+                page += 1
+                to_skip = 0
+                window = min(window * 2, self.max_workers)
+        finally:
+            for future in pending.values():
+                future.cancel()
+            executor.shutdown(wait=False)
+
+
+class StravaObjects(ActivitySource):
+    """Access Strava with account and retrieve the club object.
+
+    Tokens come from a `TokenManager` (by default, the one shared by the
+    process), so creating the object only reads the cached tokens and no
+    request is made until the API is actually used.
+
+    Attributes
+    ----------
+    client : :obj:`Client`
+        The Strava API client, with a valid access token.
+    club : :obj:`Club`
+        The club object extracted through its id, retrieved on first use.
+    """
+
+    def __init__(self, token_manager: Optional[TokenManager] = None):
+        """Set instance attributes."""
+        self.__config = Config()
+        self._tokens = token_manager or get_token_manager()
+        self._client = None
+        self._club = None
+        self._fetcher = None
+
+    @property
+    def client(self) -> Client:
+        """:obj:`Client`: The Strava API client."""
+        access_token = self._tokens.get_access_token()
+        if self._client is None:
+            self._client = Client(access_token)
+        else:
+            self._client.access_token = access_token
+        return self._client
+
+    @property
+    def club(self) -> Club:
+        """:obj:`Club`: The club object extracted through its id."""
+        if self._club is None:
+            self._club = self.client.get_club(self.__config.club_id)
+        return self._club
+
+    def authorize(self):
+        """Authorize the application interactively and cache its tokens."""
+        authorize_url = Client().authorization_url(
+            client_id=self._tokens.client_id,
             redirect_uri="http://127.0.0.1:5000/authorization",
             scope=self.__config.scope,
         )
         print(authorize_url)
         code = input("Insert code: ")
 
-        token_response = self.client.exchange_code_for_token(
-            client_id=self.__client_id,
-            client_secret=self.__client_secret,
-            code=code,
-        )
-        self.client.access_token = token_response["access_token"]
-        self.client.refresh_token = token_response["refresh_token"]
-        self.client.expires_at = token_response["expires_at"]
+        self._tokens.exchange_code(code)
+        LOGGER.info("Access granted with Code.")
+
+    @property
+    def api_calls(self) -> int:
+        """int: The number of pages requested so far."""
+        return self._fetcher.api_calls if self._fetcher else 0
+
+    def iter_club_activities(
+            self,
+            limit: Optional[int] = None,
+            offset: Optional[int] = 0
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the club activities, most recent first.
+
+        Parameters
+        ----------
+        limit : Optional[int]
+            The maximum number of activities to retrieve. The default is None
+            (every activity available).
+        offset : Optional[int]
+            The number of most recent activities to leave out. The default is
+            0.
+
+        Returns
+        -------
+        Iterator[Dict[str, Any]]
+            The raw activities, fetched page by page in parallel.
+        """
+        if self._fetcher is None:
+            self._fetcher = ClubActivitiesFetcher(
+                self._tokens.get_access_token,
+                self.__config.club_id,
+                per_page=getattr(self.__config, "fetch_per_page", 100),
+                max_workers=getattr(self.__config, "fetch_workers", 4),
+            )
+        return self._fetcher.iter_activities(limit, offset)
+
+
+@lru_cache(maxsize=None)
+def get_strava_objects() -> StravaObjects:
+    """
+    Get the Strava access shared by the whole process.
+
+    Returns
+    -------
+    :obj:`StravaObjects`
+        The Strava objects.
+    """
+    return StravaObjects()
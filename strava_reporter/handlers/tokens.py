@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from dotenv import load_dotenv
+
+from ..utils.log import LOGGER
+from ..utils.path_index import ENV_VARS, TOKENS_JSON
+
+STRAVA_OAUTH_TOKEN = "https://www.strava.com/oauth/token"
+
+# Seconds before 'expires_at' at which tokens are refreshed.
+REFRESH_MARGIN = 10 * 60
+
+
+class TokenStore:
+    """
+    File cache of the Strava OAuth tokens.
+
+    Attributes
+    ----------
+    path : :obj:`Path`
+        The path of the JSON file with the 'access_token', 'refresh_token'
+        and 'expires_at' keys.
+    """
+
+    def __init__(self, path: Optional[Path] = TOKENS_JSON):
+        """Set instance attributes."""
+        self.path = Path(path)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the cached tokens.
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            The tokens, or None if they were never saved.
+        """
+        if not self.path.exists():
+            return None
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def save(self, tokens: Dict[str, Any]):
+        """
+        Replace the cached tokens.
+
+        The file is written next to its final location and then renamed, so
+        that an interrupted write never leaves a truncated file, and it is
+        only readable by its owner.
+
+        Parameters
+        ----------
+        tokens : Dict[str, Any]
+            The tokens to cache.
+        """
+        tmp_path = self.path.with_suffix(".tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(tokens, f)
+        os.replace(tmp_path, self.path)
+
+
+class TokenManager:
+    """
+    Provider of valid Strava access tokens.
+
+    Tokens are read once from the store and refreshed through the OAuth
+    token endpoint shortly before they expire, so that requests never go
+    out with an expired token. Refreshed tokens are saved right away, since
+    Strava invalidates the previous refresh token.
+
+    Attributes
+    ----------
+    client_id : int
+        The id of the Strava application.
+    store : :obj:`TokenStore`
+        The cache of the tokens.
+    token_url : str
+        The OAuth token endpoint.
+    refresh_margin : float
+        The seconds before expiration at which tokens are refreshed.
+    """
+
+    def __init__(
+            self,
+            client_id: int,
+            client_secret: str,
+            store: Optional[TokenStore] = None,
+            token_url: Optional[str] = STRAVA_OAUTH_TOKEN,
+            refresh_margin: Optional[float] = REFRESH_MARGIN,
+            clock: Optional[Callable[[], float]] = time.time,
+            timeout: Optional[float] = 30.0,
+    ):
+        """Set instance attributes."""
+        self.client_id = client_id
+        self.store = store or TokenStore()
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin
+        self.__client_secret = client_secret
+        self._clock = clock
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._tokens: Optional[Dict[str, Any]] = None
+
+    def get_access_token(self) -> str:
+        """
+        Get a valid access token, refreshing it if it is about to expire.
+
+        Returns
+        -------
+        str
+            The access token.
+        """
+        with self._lock:
+            if self._tokens is None:
+                self._tokens = self._load()
+
+            expires_at = self._tokens.get("expires_at")
+            if expires_at is not None and self._expires_soon(expires_at):
+                self._refresh(self._tokens["refresh_token"])
+
+            return self._tokens["access_token"]
+
+    def exchange_code(self, code: str):
+        """
+        Get and cache the first tokens from an authorization code.
+
+        Parameters
+        ----------
+        code : str
+            The code received by the redirect uri of the authorization.
+        """
+        with self._lock:
+            self._request(grant_type="authorization_code", code=code)
+
+    def _expires_soon(self, expires_at: float) -> bool:
+        return self._clock() >= expires_at - self.refresh_margin
+
+    def _load(self) -> Dict[str, Any]:
+        tokens = self.store.load()
+        if tokens:
+            return tokens
+
+        # Tokens set up before the store existed.
+        refresh_token = os.environ.get("REFRESH_TOKEN")
+        access_token = os.environ.get("ACCESS_TOKEN")
+        if refresh_token:
+            self._refresh(refresh_token)
+            return self._tokens
+        if access_token:
+            LOGGER.info("Using the access token of the environment.")
+            return {"access_token": access_token, "expires_at": None}
+
+        msg = (
+            "No Strava tokens found. "
+            "Run 'python -m strava_reporter --authorize' first."
+        )
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
+
+    def _refresh(self, refresh_token: str):
+        LOGGER.info("Refreshing the Strava access token...")
+        self._request(grant_type="refresh_token", refresh_token=refresh_token)
+
+    def _request(self, **data: str):
+        response = requests.post(
+            self.token_url,
+            data={
+                "client_id": self.client_id,
+                "client_secret": self.__client_secret,
+                **data,
+            },
+            timeout=self._timeout,
+        )
+        response.raise_for_status()
+        body = response.json()
+
+        self._tokens = {
+            "access_token": body["access_token"],
+            "refresh_token": body["refresh_token"],
+            "expires_at": body["expires_at"],
+        }
+        self.store.save(self._tokens)
+
+
+@lru_cache(maxsize=None)
+def get_token_manager() -> TokenManager:
+    """
+    Get the token manager shared by the whole process.
+
+    The application credentials are read from the environment (see
+    `ENV_VARS`).
+
+    Returns
+    -------
+    :obj:`TokenManager`
+        The token manager.
+    """
+    load_dotenv(ENV_VARS)
+    return TokenManager(
+        int(os.environ.get("CLIENT_ID")),
+        os.environ.get("CLIENT_SECRET"),
+    )
@@ -1,9 +1,221 @@
+import json
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
 
-import gspread
 import pandas as pd
 
+from ..utils.log import LOGGER
+from ..utils.metrics import METRICS
 from ..utils.path_index import GOOGLE_CONFIG
 from ..utils.time import timestamp_to_unix
+from .database import DBHandler
+
+SPREADSHEET = "Stravadictos Activities"
+WORKSHEET = "Sheet1"
+
+# Columns written by the Zap for every activity.
+ATHLETE = "ATHLETE"
+NAME = "NAME"
+ELAPSED_TIME = "ELAPSED_TIME"
+UPLOAD_TIME = "UNIX_UPLOAD_TIME"
+COLUMNS = (ATHLETE, NAME, ELAPSED_TIME, UPLOAD_TIME)
+
+# Number of sheet rows requested per range read.
+CHUNK_SIZE = 1000
+
+
+class LocalWorksheet:
+    """
+    Stand-in of a gspread worksheet kept in memory.
+
+    Only the reads used by `ZapierMirror` are supported, so that the mirror
+    can be exercised (and its requests counted) without Google.
+
+    Attributes
+    ----------
+    rows : List[List[str]]
+        The values of the sheet, starting with the header row.
+    requests : int
+        The number of reads made so far.
+    """
+
+    def __init__(self, rows: Optional[List[List[Any]]] = None):
+        """Set instance attributes."""
+        self.rows = [[str(x) for x in row] for row in rows or []]
+        self.requests = 0
+
+    def append_row(self, values: Sequence[Any]):
+        """
+        Add a row at the end of the sheet, as Zapier does.
+
+        Parameters
+        ----------
+        values : Sequence[Any]
+            The values of the row.
+        """
+        self.rows.append([str(x) for x in values])
+
+    def row_values(self, row: int) -> List[str]:
+        """
+        Read a single row.
+
+        Parameters
+        ----------
+        row : int
+            The row number, starting at 1.
+
+        Returns
+        -------
+        List[str]
+            The values of the row.
+        """
+        self.requests += 1
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def get_values(self, range_name: str) -> List[List[str]]:
+        """
+        Read a range of whole rows.
+
+        Parameters
+        ----------
+        range_name : str
+            The range as 'first:last' row numbers.
+
+        Returns
+        -------
+        List[List[str]]
+            The values of the rows in the range that exist.
+        """
+        self.requests += 1
+        first, last = (int(x) for x in range_name.split(":"))
+        return [list(row) for row in self.rows[first - 1:last]]
+
+
+class ZapierMirror:
+    """
+    Local copy of the Zapier spreadsheet in the data base.
+
+    Zapier only appends rows to the sheet, so every sync reads the rows after
+    the last mirrored one, in ranges of `chunk_size` rows, instead of the
+    whole sheet. Per-day counts are then answered by the data base through
+    the index on the upload time.
+
+    If rows are ever edited or deleted in the sheet, the row numbers no
+    longer match and the mirror must be rebuilt with `sync(full=True)`.
+
+    Attributes
+    ----------
+    db : :obj:`DBHandler`
+        The data base handler holding the mirror.
+    chunk_size : int
+        The number of sheet rows requested per range read.
+    api_calls : int
+        The number of reads made to the sheet so far.
+    """
+
+    def __init__(
+            self,
+            db: Optional[DBHandler] = None,
+            worksheet: Optional[Any] = None,
+            chunk_size: Optional[int] = CHUNK_SIZE
+    ):
+        """Set instance attributes."""
+        self.db = db or DBHandler()
+        self.chunk_size = chunk_size
+        self.api_calls = 0
+        self._worksheet = worksheet
+
+    @property
+    def worksheet(self) -> Any:
+        """:obj:`gspread.Worksheet`: The sheet, opened on first use."""
+        if self._worksheet is None:
+            self._worksheet = _open_worksheet()
+        return self._worksheet
+
+    def sync(self, full: Optional[bool] = False) -> int:
+        """
+        Copy the rows appended to the sheet since the last sync.
+
+        Every range is committed on its own, so an interrupted sync resumes
+        where it stopped.
+
+        Parameters
+        ----------
+        full : Optional[bool]
+            If True, the mirror is rebuilt from the first row in a single
+            transaction. The default is False.
+
+        Returns
+        -------
+        int
+            The number of rows added to the mirror.
+        """
+        if full:
+            with self.db.transaction():
+                self.db.clear_zapier_rows()
+                return self._sync()
+        return self._sync()
+
+    def count_activities(self, ts: pd.Timestamp) -> int:
+        """
+        Count the mirrored activities uploaded on a day.
+
+        Parameters
+        ----------
+        ts : :obj:`pd.Timestamp`
+            The local midnight of the day.
+
+        Returns
+        -------
+        int
+            The number of activities.
+        """
+        return self.db.count_zapier_uploads(
+            timestamp_to_unix(ts),
+            timestamp_to_unix(ts + pd.DateOffset(days=1)),
+        )
+
+    def _sync(self) -> int:
+        header = self._read(self.worksheet.row_values, 1)
+        if not header:
+            return 0
+
+        # Row 1 is the header.
+        first = max(self.db.get_last_zapier_row(), 1) + 1
+        added = 0
+        while True:
+            last = first + self.chunk_size - 1
+            values = self._read(
+                self.worksheet.get_values, "{}:{}".format(first, last)
+            )
+            self.db.add_zapier_rows(self._rows(header, values, first))
+            added += len(values)
+            if len(values) < self.chunk_size:
+                break
+            first = last + 1
+
+        LOGGER.info(
+            "%d Zapier rows mirrored (%d requests).", added, self.api_calls
+        )
+        return added
+
+    def _read(self, method: Any, *args: Any) -> Any:
+        self.api_calls += 1
+        METRICS.increment("api_calls", source="zapier")
+        return method(*args)
+
+    def _rows(
+            self,
+            header: List[str],
+            values: List[List[str]],
+            first: int
+    ) -> Iterator[Tuple[int, Optional[int], str]]:
+        for row_number, row in enumerate(values, first):
+            if not any(row):
+                continue
+            # Trailing empty cells are not returned by the API.
+            record = dict(zip(header, row + [""] * (len(header) - len(row))))
+            upload_time = _to_unix(record.get(UPLOAD_TIME))
+            yield row_number, upload_time, json.dumps(record)
 
 
 class ZapierHandler:
@@ -16,16 +228,26 @@ class ZapierHandler:
         The number of activities registered on a given day in Zappier.
     """
 
-    def __init__(self, ts: pd.Timestamp):
+    def __init__(
+            self,
+            ts: pd.Timestamp,
+            mirror: Optional[ZapierMirror] = None
+    ):
         """Set instance attributes."""
-        service_account = gspread.service_account(GOOGLE_CONFIG)
-        ssheet = service_account.open("Stravadictos Activities")
-        wsheet = ssheet.worksheet("Sheet1")
+        mirror = mirror or ZapierMirror()
+        mirror.sync()
+        self.n_activities = mirror.count_activities(ts)
+
+
+def _open_worksheet() -> Any:
+    import gspread
+
+    service_account = gspread.service_account(GOOGLE_CONFIG)
+    return service_account.open(SPREADSHEET).worksheet(WORKSHEET)
 
-        # ! If no significant diff, this will be implemented in a new func.
-        start = timestamp_to_unix(ts)
-        end = timestamp_to_unix(ts + pd.Timedelta(days=1))
 
-        df_all = pd.DataFrame(wsheet.get_all_records())
-        df = df_all[df_all["UNIX_UPLOAD_TIME"].between(start, end)]
-        self.n_activities = df.shape[1]
+def _to_unix(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,404 @@
+from itertools import islice
+from pathlib import Path
+from typing import (TYPE_CHECKING, Any, Dict, Iterable, Iterator, List,
+                    Optional, Set, Tuple)
+
+import pandas as pd
+
+from .activities import Activity, activity_id, dict_hash, legacy_id
+from .athletes import Athletes
+from .handlers.database import DBHandler
+from .handlers.sources import record_activities
+from .reconcile import RECONCILE_MODES, reconcile
+from .utils.log import LOGGER
+from .utils.metrics import METRICS
+
+if TYPE_CHECKING:
+    from .handlers.sources import ActivitySource
+
+# Number of activities saved per transaction.
+BATCH_SIZE = 500
+
+
+def normalize(
+        club_activities: Iterable[Any]
+) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """
+    Turn club activities into dictionaries with their fingerprint.
+
+    Parameters
+    ----------
+    club_activities : Iterable[Any]
+        The club activities, most recent first, either as raw dictionaries
+        or as stravalib objects.
+
+    Yields
+    ------
+    Tuple[Dict[str, Any], str]
+        A copy of the raw activity and its date independent hash.
+    """
+    for activity_raw in club_activities:
+        activity_raw_dict = (
+            dict(activity_raw)
+            if isinstance(activity_raw, dict)
+            else activity_raw.to_dict()
+        )
+        yield activity_raw_dict, dict_hash(activity_raw_dict)
+
+
+def deduplicate(
+        activities: Iterable[Tuple[Dict[str, Any], str]],
+        date: pd.Timestamp,
+        known_fingerprints: Set[str],
+        last_hashes: Optional[Set[str]] = None,
+        saved_fingerprints: Optional[Set[str]] = None
+) -> Iterator[Activity]:
+    """
+    Build the new activities, stopping at the first one already processed.
+
+    Parameters
+    ----------
+    activities : Iterable[Tuple[Dict[str, Any], str]]
+        The normalized activities (see `normalize`).
+    date : :obj:`pd.Timestamp`
+        The date given to the activities.
+    known_fingerprints : Set[str]
+        The fingerprints of the activities already processed.
+    last_hashes : Optional[Set[str]]
+        The hashes from the previous date of the activities saved before
+        fingerprints were stored. The default is None.
+    saved_fingerprints : Optional[Set[str]]
+        The fingerprints of the activities already saved on `date`, which
+        are skipped instead of stopping the reading, e.g. when resuming an
+        interrupted ingest. The default is None.
+
+    Yields
+    ------
+    :obj:`Activity`
+        A new activity.
+    """
+    today = str(date)[:10]
+    yesterday = str(date - pd.DateOffset(days=1))[:10]
+
+    for activity_raw_dict, fingerprint in activities:
+        if fingerprint in known_fingerprints:
+            return
+        if saved_fingerprints and fingerprint in saved_fingerprints:
+            continue
+
+        if last_hashes:
+            # Activities saved without a fingerprint can only be matched
+            # through their legacy id on yesterday's date.
+            if legacy_id(activity_raw_dict, yesterday) in last_hashes:
+                return
+
+        activity_raw_dict["date"] = today
+        yield Activity(
+            activity_id=activity_id(fingerprint, today),
+            fingerprint=fingerprint,
+            **activity_raw_dict
+        )
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """
+    Group items into lists of a given size (the last one may be shorter).
+
+    Parameters
+    ----------
+    items : Iterable[Any]
+        The items to group.
+    size : int
+        The number of items per batch.
+
+    Yields
+    ------
+    List[Any]
+        A batch of items.
+    """
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+class IngestPipeline:
+    """
+    Streaming ingest of the club activities of a day.
+
+    Activities flow through generator stages (fetch, normalize, deduplicate
+    and a batched database sink), so that at most a batch of activities (and
+    the pages in flight of the fetcher) is held in memory and the first rows
+    are written as soon as the first batch is complete.
+
+    Every batch is saved in a single transaction together with a checkpoint
+    of the number of club activities read so far. If a run is interrupted,
+    the next run of the same date reads the club activities from the top
+    again (new ones may have been posted in between), skipping those saved
+    by the interrupted run instead of stopping at them. The position of the
+    checkpoint is informational only (it is logged when resuming); only
+    whether the ingest completed is used.
+
+    Attributes
+    ----------
+    date : :obj:`pd.Timestamp`
+        The date of the ingest.
+    week_number : int
+        The week number of the date.
+    known_fingerprints : Set[str]
+        The fingerprints of the activities already processed.
+    last_hashes : Optional[Set[str]]
+        The legacy hashes from the previous date.
+    batch_size : int
+        The number of activities saved per transaction.
+    position : int
+        The number of club activities read so far.
+    saved : int
+        The number of activities saved (or that would be saved in tests).
+    days : Set[Tuple[str, int]]
+        The (athlete as it appears in Strava, date_unix) pairs of the saved
+        activities.
+    resumed : bool
+        True if the run resumed an interrupted ingest.
+    kind : str
+        'daily' for the ingest of the day or 'poll' for the ingests between
+        daily ones. Each kind keeps its own checkpoint.
+    """
+
+    def __init__(
+            self,
+            db: DBHandler,
+            date: pd.Timestamp,
+            week_number: int,
+            known_fingerprints: Set[str],
+            last_hashes: Optional[Set[str]] = None,
+            batch_size: Optional[int] = BATCH_SIZE,
+            kind: Optional[str] = "daily"
+    ):
+        """Set instance attributes."""
+        self.db = db
+        self.date = date
+        self.week_number = week_number
+        self.known_fingerprints = known_fingerprints
+        self.last_hashes = last_hashes
+        self.batch_size = batch_size
+        self.position = 0
+        self.saved = 0
+        self.days: Set[Tuple[str, int]] = set()
+        self.resumed = False
+        self.kind = kind
+
+    def run(
+            self,
+            source: "ActivitySource",
+            stop_after: Optional[int] = None,
+            to_ignore: Optional[int] = 0,
+            test: Optional[bool] = False,
+            record: Optional[Path] = None
+    ) -> int:
+        """
+        Ingest the new club activities.
+
+        Parameters
+        ----------
+        source : :obj:`ActivitySource`
+            The source of the club activities.
+        stop_after : Optional[int]
+            Number of activities to save before stopping.
+        to_ignore : Optional[int]
+            Number of activities to ignore, starting from the top.
+        test : Optional[bool]
+            If True, nothing is written to the database. The default is
+            False.
+        record : Optional[Path]
+            The path where the read activities are recorded as JSONL. The
+            default is None (no recording).
+
+        Returns
+        -------
+        int
+            The number of activities saved.
+        """
+        today = str(self.date)[:10]
+        checkpoint = self.db.get_ingest_checkpoint(today, self.kind)
+        known_fingerprints = self.known_fingerprints
+        saved_fingerprints = None
+        if checkpoint and not checkpoint[1] and not test:
+            self.resumed = True
+            LOGGER.info(
+                "Resuming the ingest of %s (%d activities read before).",
+                today,
+                checkpoint[0],
+            )
+            # The feed may have changed since the interruption, so the
+            # activities saved today are skipped rather than counted.
+            saved_fingerprints = self.db.get_known_fingerprints(
+                self.date, 0, include_today=True
+            )
+            known_fingerprints = known_fingerprints - saved_fingerprints
+
+        self.position = 0
+        club_activities = self._count(source.iter_club_activities())
+        if record:
+            club_activities = record_activities(club_activities, record)
+
+        activities = deduplicate(
+            normalize(islice(club_activities, to_ignore, None)),
+            self.date,
+            known_fingerprints,
+            self.last_hashes,
+            saved_fingerprints
+        )
+
+        for batch in batched(islice(activities, stop_after), self.batch_size):
+            self._save(batch, today, test)
+        self._save([], today, test, completed=True)
+
+        return self.saved
+
+    def _count(
+            self,
+            club_activities: Iterable[Dict[str, Any]]
+    ) -> Iterator[Dict[str, Any]]:
+        for activity in club_activities:
+            self.position += 1
+            yield activity
+
+    def _save(
+            self,
+            batch: List[Activity],
+            today: str,
+            test: bool,
+            completed: Optional[bool] = False
+    ):
+        if not test:
+            with METRICS.timer("save_batch"), self.db.transaction():
+                self.db.add_activities(
+                    activity.to_row(self.week_number) for activity in batch
+                )
+                self.db.set_ingest_checkpoint(
+                    today, self.position, completed, self.kind
+                )
+
+        self.saved += len(batch)
+        self.days.update((x.athlete, x.date_unix) for x in batch)
+        if batch:
+            LOGGER.info(
+                "%d activities processed (%d read).",
+                self.saved,
+                self.position,
+                extra={"fields": {"saved": self.saved, "read": self.position}},
+            )
+
+
+@METRICS.timed()
+def ingest(
+        db: DBHandler,
+        athletes: Athletes,
+        source: "ActivitySource",
+        date: pd.Timestamp,
+        stop_after: Optional[int] = None,
+        to_ignore: Optional[int] = 0,
+        test: Optional[bool] = False,
+        record: Optional[Path] = None,
+        batch_size: Optional[int] = BATCH_SIZE,
+        window_days: Optional[int] = 1,
+        include_today: Optional[bool] = False,
+        reconcile_mode: Optional[str] = None,
+        kind: Optional[str] = "daily"
+) -> IngestPipeline:
+    """
+    Ingest the new club activities of a day and update its weekly analysis.
+
+    Parameters
+    ----------
+    db : :obj:`DBHandler`
+        The data base handler.
+    athletes : :obj:`Athletes`
+        The registry of the athletes.
+    source : :obj:`ActivitySource`
+        The source of the club activities.
+    date : :obj:`pd.Timestamp`
+        The date given to the activities.
+    stop_after : Optional[int]
+        Number of activities to save before stopping.
+    to_ignore : Optional[int]
+        Number of activities to ignore, starting from the top.
+    test : Optional[bool]
+        True for test runs (nothing is written), otherwise False.
+    record : Optional[Path]
+        The path where the read activities are recorded as JSONL. The default
+        is None (no recording).
+    batch_size : Optional[int]
+        The number of activities saved per transaction.
+    window_days : Optional[int]
+        The number of previous days whose activities stop the reading.
+    include_today : Optional[bool]
+        If True, the activities already saved on `date` also stop the
+        reading, e.g. when ingesting several times a day. The default is
+        False.
+    reconcile_mode : Optional[str]
+        'report' to compare the ingested activities with the Zapier sheet,
+        'backfill' to also save the missing ones. The default is None (no
+        reconciliation). Tests only report, without syncing the sheet.
+    kind : Optional[str]
+        'daily' for the ingest of the day or 'poll' for the ingests between
+        daily ones, so that polls never complete the checkpoint of the
+        daily ingest. The default is 'daily'.
+
+    Returns
+    -------
+    :obj:`IngestPipeline`
+        The pipeline that performed the ingest.
+    """
+    if reconcile_mode not in (None,) + RECONCILE_MODES:
+        msg = "Unknown reconcile mode '{}'.".format(reconcile_mode)
+        LOGGER.error(msg)
+        raise ValueError(msg)
+
+    week_number = db.get_week_number(date)
+    known_fingerprints = db.get_known_fingerprints(
+        date, window_days, include_today
+    )
+    last_hashes = set(db.get_last_hashes(date, legacy_only=True))
+
+    pipeline = IngestPipeline(
+        db,
+        date,
+        week_number,
+        known_fingerprints,
+        last_hashes,
+        batch_size,
+        kind
+    )
+    LOGGER.info("Retreiving activities...")
+    pipeline.run(source, stop_after, to_ignore, test, record)
+
+    LOGGER.info(
+        "Activities received: %d (%d pages requested)",
+        pipeline.saved,
+        source.api_calls,
+        extra={
+            "fields": {"received": pipeline.saved, "pages": source.api_calls}
+        },
+    )
+    if not test:
+        LOGGER.info("Updating weekly analysis...")
+        if pipeline.resumed:
+            # Days saved before the interruption are not known here.
+            athletes.analyze(week_number, in_db=True, with_results=False)
+        else:
+            athletes.update_analysis(week_number, pipeline.days)
+
+    if reconcile_mode:
+        LOGGER.info("Reconciling with Zapier...")
+        reconciliation = reconcile(db, date, sync=not test)
+        reconciliation.report()
+        if reconcile_mode == "backfill" and not test:
+            days = reconciliation.backfill(db, week_number)
+            if days:
+                athletes.update_analysis(week_number, days)
+
+    return pipeline
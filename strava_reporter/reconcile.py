@@ -0,0 +1,322 @@
+import json
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from .activities import Activity, activity_id, dict_hash
+from .config import Config
+from .handlers.database import DBHandler
+from .handlers.zapier import ATHLETE, ELAPSED_TIME, NAME, ZapierMirror
+from .utils.log import LOGGER
+from .utils.time import timestamp_to_unix
+
+# Columns of the Zapier sheet holding the fields of the ACTIVITIES table.
+ZAPIER_COLUMNS = {
+    "athlete": ATHLETE,
+    "name": NAME,
+    "duration_secs": ELAPSED_TIME,
+}
+
+# Modes of the reconciliation stage of the ingest.
+RECONCILE_MODES = ("report", "backfill")
+
+ActivityKey = Tuple[str, str, Optional[int]]
+
+
+def activity_key(
+        athlete: str,
+        name: str,
+        duration_secs: Any
+) -> ActivityKey:
+    """
+    Get the key that matches an activity across Strava and Zapier.
+
+    Parameters
+    ----------
+    athlete : str
+        The athlete name as it appears in Strava.
+    name : str
+        The activity name.
+    duration_secs : Any
+        The number of seconds of the activity, as a number or a string.
+
+    Returns
+    -------
+    ActivityKey
+        The normalized (athlete, name, duration_secs), where the duration is
+        None if it is not a number.
+    """
+    try:
+        duration = int(float(duration_secs))
+    except (TypeError, ValueError):
+        duration = None
+    athlete = " ".join(str(athlete).split()).casefold()
+    return athlete, str(name).strip(), duration
+
+
+class Reconciliation:
+    """
+    Comparison of the activities of a day with the Zapier sheet.
+
+    Attributes
+    ----------
+    date : :obj:`pd.Timestamp`
+        The reconciled date.
+    matched : int
+        The number of Zapier rows matched with an ingested activity.
+    missing : List[Dict[str, Any]]
+        The Zapier records of the day without an ingested activity.
+    unmatched : int
+        The number of activities ingested on the date that are not in the
+        Zapier rows of the day.
+    """
+
+    def __init__(self, date: pd.Timestamp):
+        """Set instance attributes."""
+        self.date = date
+        self.matched = 0
+        self.missing: List[Dict[str, Any]] = []
+        self.unmatched = 0
+
+    def report(self):
+        """Log the outcome and every missing activity."""
+        LOGGER.info(
+            "Reconciliation of %.10s: %d matched, %d missing, %d not in "
+            "Zapier.",
+            self.date,
+            self.matched,
+            len(self.missing),
+            self.unmatched,
+        )
+        for record in self.missing:
+            LOGGER.info("Missing activity: %s", record)
+
+    def backfill(
+            self,
+            db: DBHandler,
+            week_number: int,
+            columns: Optional[Dict[str, str]] = None
+    ) -> Set[Tuple[str, int]]:
+        """
+        Save the missing activities with the reconciled date.
+
+        Activities are saved in a single transaction. Records without a
+        valid duration are left out. Backfilled activities have their own
+        fingerprints, so an activity the club feed only returns later would
+        be ingested again: backfill after the last ingest of the day.
+
+        Parameters
+        ----------
+        db : :obj:`DBHandler`
+            The data base handler.
+        week_number : int
+            The week number of the date.
+        columns : Optional[Dict[str, str]]
+            The sheet column of every field. The default is None (see
+            `get_zapier_columns`).
+
+        Returns
+        -------
+        Set[Tuple[str, int]]
+            The (athlete as it appears in Strava, date_unix) pairs of the
+            saved activities.
+        """
+        columns = columns or get_zapier_columns()
+        today = str(self.date)[:10]
+
+        activities = []
+        for record in self.missing:
+            fields = {k: record.get(v, "") for k, v in columns.items()}
+            key = activity_key(**fields)
+            if key[2] is None:
+                LOGGER.info(
+                    "Activity without duration not backfilled: %s", record
+                )
+                continue
+
+            # Fingerprints of backfilled activities are taken from the
+            # fields, since the raw club activity is not known.
+            fingerprint = dict_hash({"zapier": fields})
+            activities.append(
+                Activity(
+                    activity_id=activity_id(fingerprint, today),
+                    fingerprint=fingerprint,
+                    athlete=str(fields["athlete"]).strip(),
+                    name=key[1],
+                    date=today,
+                    duration_secs=key[2],
+                )
+            )
+
+        db.add_activities(x.to_row(week_number) for x in activities)
+        LOGGER.info("%d activities backfilled.", len(activities))
+        return {(x.athlete, x.date_unix) for x in activities}
+
+
+def join_activities(
+        records: Iterable[Dict[str, Any]],
+        day_keys: Iterable[ActivityKey],
+        window_keys: Iterable[ActivityKey],
+        reconciliation: Reconciliation,
+        columns: Dict[str, str]
+):
+    """
+    Match Zapier records with ingested activities through a hash join.
+
+    The ingested activities are the build side: their keys are counted in
+    hash tables, so that every record is probed in constant time and
+    repeated activities (same athlete, name and duration) are matched one
+    to one. Activities of the reconciled day are probed first, then the ones
+    of the neighbouring days.
+
+    Parameters
+    ----------
+    records : Iterable[Dict[str, Any]]
+        The Zapier records of the day.
+    day_keys : Iterable[ActivityKey]
+        The keys of the activities ingested on the day.
+    window_keys : Iterable[ActivityKey]
+        The keys of the activities ingested on the neighbouring days.
+    reconciliation : :obj:`Reconciliation`
+        The reconciliation updated with the outcome.
+    columns : Dict[str, str]
+        The sheet column of every field.
+    """
+    day_counts = Counter(day_keys)
+    window_counts = Counter(window_keys)
+
+    for record in records:
+        fields = {k: record.get(v, "") for k, v in columns.items()}
+        key = activity_key(**fields)
+        if day_counts[key] > 0:
+            day_counts[key] -= 1
+        elif window_counts[key] > 0:
+            window_counts[key] -= 1
+        else:
+            reconciliation.missing.append(record)
+            continue
+        reconciliation.matched += 1
+
+    reconciliation.unmatched = sum(day_counts.values())
+
+
+def reconcile(
+        db: DBHandler,
+        date: pd.Timestamp,
+        mirror: Optional[ZapierMirror] = None,
+        sync: Optional[bool] = True,
+        window_days: Optional[int] = 1,
+        columns: Optional[Dict[str, str]] = None
+) -> Reconciliation:
+    """
+    Compare the activities ingested on a day with the Zapier sheet.
+
+    Activities uploaded close to midnight may be ingested on either side of
+    it, so the activities of `window_days` around the date also match.
+
+    Parameters
+    ----------
+    db : :obj:`DBHandler`
+        The data base handler.
+    date : :obj:`pd.Timestamp`
+        The date to reconcile.
+    mirror : Optional[ZapierMirror]
+        The mirror of the sheet. The default is None (a mirror on `db`).
+    sync : Optional[bool]
+        If True, the mirror is synced first. The default is True.
+    window_days : Optional[int]
+        The number of days around the date whose activities also match.
+    columns : Optional[Dict[str, str]]
+        The sheet column of every field. The default is None (see
+        `get_zapier_columns`).
+
+    Returns
+    -------
+    :obj:`Reconciliation`
+        The outcome of the comparison.
+    """
+    mirror = mirror or ZapierMirror(db)
+    columns = columns or get_zapier_columns()
+    if sync:
+        mirror.sync()
+
+    today = str(date)[:10]
+    rows = db.get_activity_keys(
+        str(date - pd.DateOffset(days=window_days))[:10],
+        str(date + pd.DateOffset(days=window_days))[:10],
+    )
+    day_keys = (activity_key(*x[1:]) for x in rows if x[0] == today)
+    window_keys = (activity_key(*x[1:]) for x in rows if x[0] != today)
+
+    records = check_columns(
+        (
+            json.loads(record)
+            for _, record in db.get_zapier_records(
+                timestamp_to_unix(date),
+                timestamp_to_unix(date + pd.DateOffset(days=1)),
+            )
+        ),
+        columns
+    )
+
+    reconciliation = Reconciliation(date)
+    join_activities(records, day_keys, window_keys, reconciliation, columns)
+    return reconciliation
+
+
+def check_columns(
+        records: Iterable[Dict[str, Any]],
+        columns: Dict[str, str]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Make sure the mirrored records have the matched columns.
+
+    Every record of the mirror has the columns of the sheet header, so only
+    the first one is checked. Otherwise, every record would be reported as
+    missing.
+
+    Parameters
+    ----------
+    records : Iterable[Dict[str, Any]]
+        The Zapier records.
+    columns : Dict[str, str]
+        The sheet column of every field.
+
+    Yields
+    ------
+    Dict[str, Any]
+        The records, unchanged.
+
+    Raises
+    ------
+    ValueError
+        If the first record lacks any of the columns.
+    """
+    records = iter(records)
+    for record in records:
+        missing = sorted(set(columns.values()) - set(record))
+        if missing:
+            msg = (
+                "Zapier records have no column {}. Set 'zapier_columns' in "
+                "the config to the sheet columns of {}.".format(
+                    ", ".join(missing), ", ".join(sorted(columns))
+                )
+            )
+            LOGGER.error(msg)
+            raise ValueError(msg)
+        yield record
+        break
+    yield from records
+
+
+def get_zapier_columns() -> Dict[str, str]:
+    """
+    Get the sheet column of every field matched by the reconciliation.
+
+    Returns
+    -------
+    Dict[str, str]
+        The 'zapier_columns' of the config, or `ZAPIER_COLUMNS`.
+    """
+    return {**ZAPIER_COLUMNS, **getattr(Config(), "zapier_columns", {})}
@@ -0,0 +1,280 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+from .utils.log import LOGGER
+from .utils.path_index import REPORTS_PATH
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+REPORT_FOLDER = REPORTS_PATH
+SEASON_FOLDER = REPORT_FOLDER / "season"
+
+# Format used when none is given explicitly. See `set_report_format`.
+_REPORT_FORMAT = "csv"
+
+
+class ReportWriter:
+    """
+    Writer of the weekly reports as csv files.
+
+    Reports hold the 'ATHLETE', 'MONDAY'..'SUNDAY' and 'TOTAL_DAYS' columns,
+    where a day is 1 if it counts towards the challenge and empty otherwise.
+
+    Attributes
+    ----------
+    extension : str
+        The extension of the report files.
+    """
+
+    extension = "csv"
+
+    def path(self, week_number: int) -> Path:
+        """
+        Get the path of the report of a week.
+
+        Parameters
+        ----------
+        week_number : int
+            The week number of the report.
+
+        Returns
+        -------
+        :obj:`Path`
+            The path of the report.
+        """
+        file_name = "athlete_records_{}.{}".format(week_number, self.extension)
+        return REPORT_FOLDER / file_name
+
+    def write(self, data: "pd.DataFrame", week_number: int):
+        """
+        Save the report of a week.
+
+        Parameters
+        ----------
+        data : :obj:`pd.DataFrame`
+            The weekly results.
+        week_number : int
+            The week number of the report.
+        """
+        data.to_csv(self.path(week_number), index=False)
+
+    def read(self, week_number: int) -> Optional["pd.DataFrame"]:
+        """
+        Read the report of a week.
+
+        Parameters
+        ----------
+        week_number : int
+            The week number of the report.
+
+        Returns
+        -------
+        Optional[pd.DataFrame]
+            The saved weekly results, or None if the report does not exist.
+        """
+        path = self.path(week_number)
+        if not path.exists():
+            return None
+        return self._read(path)
+
+    def _read(self, path: Path) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.read_csv(path, dtype={"ATHLETE": str})
+
+
+class _ArrowReportWriter(ReportWriter, ABC):
+    """
+    Base writer of typed reports through pyarrow.
+
+    Besides the weekly file, every report is added to a season dataset
+    partitioned by week number ('season/week_number=<n>/'), so that readers
+    can load a single week or athlete without parsing every report. Writing
+    a week again replaces its partition.
+    """
+
+    dataset_format = ""
+
+    def write(self, data: "pd.DataFrame", week_number: int):
+        """
+        Save the report of a week and add it to the season dataset.
+
+        Parameters
+        ----------
+        data : :obj:`pd.DataFrame`
+            The weekly results.
+        week_number : int
+            The week number of the report.
+        """
+        typed = self._typed(data)
+        self._write(typed, self.path(week_number))
+
+        partition = SEASON_FOLDER / "week_number={}".format(week_number)
+        partition.mkdir(parents=True, exist_ok=True)
+        self._write(typed, partition / "part-0.{}".format(self.extension))
+
+    def read_season(
+            self,
+            week_numbers: Optional[List[int]] = None,
+            athletes: Optional[List[str]] = None
+    ) -> "pd.DataFrame":
+        """
+        Read the season dataset.
+
+        Filters are pushed down to pyarrow, so only the partitions (and row
+        groups) of interest are read.
+
+        Parameters
+        ----------
+        week_numbers : Optional[List[int]]
+            The weeks to read. The default is None (every week).
+        athletes : Optional[List[str]]
+            The athletes to read. The default is None (every athlete).
+
+        Returns
+        -------
+        :obj:`pd.DataFrame`
+            The typed weekly results with a 'week_number' column.
+        """
+        ds = _import_pyarrow_dataset()
+        # Only the files of this format, if reports were also written in
+        # another one.
+        files = sorted(
+            str(x) for x in SEASON_FOLDER.glob("*/*.{}".format(self.extension))
+        )
+        dataset = ds.dataset(
+            files,
+            format=self.dataset_format,
+            partitioning="hive",
+            partition_base_dir=str(SEASON_FOLDER),
+        )
+
+        expression = None
+        if week_numbers is not None:
+            expression = ds.field("week_number").isin(week_numbers)
+        if athletes is not None:
+            athlete_filter = ds.field("ATHLETE").isin(athletes)
+            expression = (
+                athlete_filter
+                if expression is None
+                else expression & athlete_filter
+            )
+
+        return dataset.to_table(filter=expression).to_pandas()
+
+    def _typed(self, data: "pd.DataFrame") -> "pd.DataFrame":
+        import numpy as np
+        import pandas as pd
+
+        typed = pd.DataFrame({
+            "ATHLETE": pd.Categorical(data["ATHLETE"].astype(str))
+        })
+        for day in data.columns[1:8]:
+            typed[day] = (data[day].values == 1).astype(np.int8)
+        typed["TOTAL_DAYS"] = data["TOTAL_DAYS"].astype(np.int8).values
+        return typed
+
+    @abstractmethod
+    def _write(self, data: "pd.DataFrame", path: Path):
+        """Write a typed report to a file of the format."""
+
+
+class ParquetReportWriter(_ArrowReportWriter):
+    """Writer of the weekly reports as typed parquet files."""
+
+    extension = "parquet"
+    dataset_format = "parquet"
+
+    def _write(self, data: "pd.DataFrame", path: Path):
+        _import_pyarrow_dataset()
+        data.to_parquet(path, index=False)
+
+    def _read(self, path: Path) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.read_parquet(path)
+
+
+class FeatherReportWriter(_ArrowReportWriter):
+    """Writer of the weekly reports as typed feather (Arrow IPC) files."""
+
+    extension = "feather"
+    dataset_format = "feather"
+
+    def _write(self, data: "pd.DataFrame", path: Path):
+        _import_pyarrow_dataset()
+        data.to_feather(path)
+
+    def _read(self, path: Path) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.read_feather(path)
+
+
+REPORT_WRITERS = {
+    "csv": ReportWriter,
+    "parquet": ParquetReportWriter,
+    "feather": FeatherReportWriter,
+}
+
+
+def set_report_format(report_format: str):
+    """
+    Set the format of the reports written from now on.
+
+    Parameters
+    ----------
+    report_format : str
+        One of 'csv', 'parquet' or 'feather'.
+    """
+    global _REPORT_FORMAT
+    get_report_writer(report_format)
+    _REPORT_FORMAT = report_format
+
+
+def get_report_format() -> str:
+    """
+    Get the format of the reports.
+
+    Returns
+    -------
+    str
+        The current report format.
+    """
+    return _REPORT_FORMAT
+
+
+def get_report_writer(report_format: Optional[str] = None) -> ReportWriter:
+    """
+    Get the writer of a report format.
+
+    Parameters
+    ----------
+    report_format : Optional[str]
+        One of 'csv', 'parquet' or 'feather'. The default is None (the
+        format set by `set_report_format`, csv unless changed).
+
+    Returns
+    -------
+    :obj:`ReportWriter`
+        The report writer.
+    """
+    if report_format is None:
+        report_format = _REPORT_FORMAT
+    if report_format not in REPORT_WRITERS:
+        msg = "Unknown report format '{}'.".format(report_format)
+        LOGGER.error(msg)
+        raise ValueError(msg)
+    return REPORT_WRITERS[report_format]()
+
+
+def _import_pyarrow_dataset():
+    try:
+        import pyarrow.dataset as ds
+    except ImportError:
+        msg = "pyarrow is required for parquet and feather reports."
+        LOGGER.error(msg)
+        raise
+    return ds
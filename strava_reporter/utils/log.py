@@ -1,7 +1,104 @@
+import atexit
+import json
 import logging
-from pathlib import Path
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
 
-LOG_PATH = Path(".").parent / "logs" / "runner.log"
+from .path_index import LOG_PATH
+
+# Attribute of the records with the structured fields of an event, given as
+# `LOGGER.info(msg, extra={"fields": {...}})`.
+FIELDS = "fields"
+
+
+class _JsonFormatter(logging.Formatter):
+    """Formatter of records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Format a record.
+
+        Parameters
+        ----------
+        record : :obj:`logging.LogRecord`
+            The record.
+
+        Returns
+        -------
+        str
+            The JSON event with the time, level, logger and message of the
+            record and its structured fields.
+        """
+        event: Dict[str, Any] = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        event.update(getattr(record, FIELDS, None) or {})
+        if record.exc_info:
+            event["exception"] = self.formatException(record.exc_info)
+        return json.dumps(event, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """
+    Handler that hands records over to a background writer.
+
+    Records are queued as they are, so that their messages are formatted
+    by the writer thread instead of the caller. The writer is started with
+    the first record and flushed when the process exits. Forked processes
+    (e.g. the workers of a process pool) do not inherit the writer and
+    write their records directly; forks wait for the record being written.
+    """
+
+    def __init__(self, handler: logging.Handler):
+        """Set instance attributes."""
+        super().__init__(queue.SimpleQueue())
+        self._handler = handler
+        self._listener = QueueListener(
+            self.queue, handler, respect_handler_level=True
+        )
+        self._lock = threading.Lock()
+        self._started = False
+        self._pid = os.getpid()
+
+        # Otherwise, a fork in the middle of a write leaves the stream
+        # locked forever in the child.
+        os.register_at_fork(
+            before=handler.acquire,
+            after_in_parent=handler.release,
+            after_in_child=handler.createLock,
+        )
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Queue the record unformatted."""
+        return record
+
+    def emit(self, record: logging.LogRecord):
+        """Queue a record, starting the writer if required."""
+        if os.getpid() != self._pid:
+            self._handler.handle(record)
+            return
+        if not self._started:
+            self._start()
+        super().emit(record)
+
+    def stop(self):
+        """Write the queued records and stop the writer."""
+        with self._lock:
+            if self._started:
+                self._listener.stop()
+                self._started = False
+
+    def _start(self):
+        with self._lock:
+            if not self._started:
+                self._listener.start()
+                self._started = True
 
 
 class _Logger:
@@ -12,15 +109,40 @@ class _Logger:
         self.logger = logging.getLogger("my_log")
         self.logger.propagate = False
         self.logger.setLevel(logging.INFO)
-        formatter = logging.Formatter(
-            "%(asctime)s | %(levelname)s | %(message)s", "%m-%d-%Y %H:%M:%S"
-        )
 
-        file_handler = logging.FileHandler(LOG_PATH)
+        # The file is opened by the writer with the first record, not on
+        # import.
+        file_handler = logging.FileHandler(LOG_PATH, delay=True)
         file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(formatter)
+        file_handler.setFormatter(_JsonFormatter())
+
+        self.handler = _QueueHandler(file_handler)
+        self.logger.addHandler(self.handler)
+        atexit.register(self.handler.stop)
+
+        # Per statement tracing of the data base handler, off by default.
+        self.sql_logger = self.logger.getChild("sql")
+        self.sql_logger.setLevel(logging.WARNING)
+
+
+_LOGGER = _Logger()
+LOGGER = _LOGGER.logger
+SQL_LOGGER = _LOGGER.sql_logger
+
+
+def set_sql_tracing(enabled: Optional[bool] = True):
+    """
+    Turn the logging of every SQL statement on or off.
 
-        self.logger.addHandler(file_handler)
+    Parameters
+    ----------
+    enabled : Optional[bool]
+        True to log the statements run by the data base handler with the
+        DEBUG level. The default is True.
+    """
+    SQL_LOGGER.setLevel(logging.DEBUG if enabled else logging.WARNING)
 
 
-LOGGER = _Logger().logger
+def flush_logs():
+    """Write every queued record to the log file."""
+    _LOGGER.handler.stop()
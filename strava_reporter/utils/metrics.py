@@ -0,0 +1,308 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .path_index import METRICS_JSON, METRICS_PROM
+
+# Prefix of the metric names in the Prometheus textfile.
+PROMETHEUS_PREFIX = "strava_reporter"
+
+METRICS_FILES = {"json": METRICS_JSON, "prometheus": METRICS_PROM}
+
+_CounterKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Metrics:
+    """
+    Registry of the timers and counters of a run.
+
+    Timers accumulate the calls and seconds spent in a block of code and
+    counters accumulate values (e.g. rows written) under a name and optional
+    labels. The hits and misses of registered `lru_cache` functions are read
+    when the summary is built, so caches are not slowed down.
+
+    When disabled, timers and counters return right away. Metrics of forked
+    processes (e.g. the workers of a season analysis) stay in those
+    processes.
+
+    Attributes
+    ----------
+    enabled : bool
+        True if timers and counters are recorded.
+    metrics_format : str
+        The default format of the summary, 'json' or 'prometheus'.
+    """
+
+    def __init__(
+            self,
+            enabled: Optional[bool] = True,
+            metrics_format: Optional[str] = "json"
+    ):
+        """Set instance attributes."""
+        self.enabled = enabled
+        self.metrics_format = metrics_format
+        self._lock = threading.Lock()
+        self._timers: Dict[str, List[float]] = {}
+        self._counters: Dict[_CounterKey, float] = {}
+        self._caches: Dict[str, Callable] = {}
+        self._started = time.time()
+
+    def configure(
+            self,
+            enabled: Optional[bool] = None,
+            metrics_format: Optional[str] = None
+    ):
+        """
+        Change the settings of the registry.
+
+        Parameters
+        ----------
+        enabled : Optional[bool]
+            True to record metrics, False to disable them.
+        metrics_format : Optional[str]
+            The default format of the summary, 'json' or 'prometheus'.
+        """
+        if metrics_format is not None and metrics_format not in METRICS_FILES:
+            raise ValueError(
+                "Unknown metrics format '{}'.".format(metrics_format)
+            )
+        if enabled is not None:
+            self.enabled = enabled
+        if metrics_format is not None:
+            self.metrics_format = metrics_format
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """
+        Time a block of code.
+
+        Parameters
+        ----------
+        name : str
+            The name of the timer.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """
+        Time every call of a function.
+
+        Parameters
+        ----------
+        name : Optional[str]
+            The name of the timer. The default is None (the name of the
+            function).
+
+        Returns
+        -------
+        Callable
+            The decorator.
+        """
+        def decorator(func: Callable) -> Callable:
+            timer_name = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._record(timer_name, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def increment(self, name: str, value: Optional[float] = 1, **labels: Any):
+        """
+        Add a value to a counter.
+
+        Parameters
+        ----------
+        name : str
+            The name of the counter, e.g. 'rows_written'.
+        value : Optional[float]
+            The value to add. The default is 1.
+        **labels : Any
+            The labels of the counter, e.g. `table="ACTIVITIES"`.
+        """
+        if not self.enabled or not value:
+            return
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def register_cache(self, name: str, func: Callable):
+        """
+        Report the hits and misses of an `lru_cache` function.
+
+        Parameters
+        ----------
+        name : str
+            The name of the cache.
+        func : Callable
+            The function decorated with `lru_cache`.
+        """
+        self._caches[name] = func
+
+    def reset(self):
+        """Forget every timer and counter recorded so far."""
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self._started = time.time()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get every metric recorded so far.
+
+        Returns
+        -------
+        Dict[str, Any]
+            The 'timers' (calls, seconds and max_seconds by name), the
+            'counters' (name, labels and value) and the 'caches' (hits and
+            misses by name) of the run.
+        """
+        with self._lock:
+            timers = {
+                name: {
+                    "calls": int(calls),
+                    "seconds": round(seconds, 6),
+                    "max_seconds": round(max_seconds, 6),
+                }
+                for name, (calls, seconds, max_seconds)
+                in sorted(self._timers.items())
+            }
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+
+        caches = {}
+        for name, func in sorted(self._caches.items()):
+            info = func.cache_info()
+            caches[name] = {"hits": info.hits, "misses": info.misses}
+
+        return {
+            "started": _isoformat(self._started),
+            "written": _isoformat(time.time()),
+            "timers": timers,
+            "counters": counters,
+            "caches": caches,
+        }
+
+    def write(
+            self,
+            metrics_format: Optional[str] = None,
+            path: Optional[Path] = None
+    ) -> Optional[Path]:
+        """
+        Write the summary of the metrics.
+
+        Parameters
+        ----------
+        metrics_format : Optional[str]
+            'json' or 'prometheus' (a textfile for the node exporter). The
+            default is None (`metrics_format`).
+        path : Optional[Path]
+            The destination. The default is None (see `METRICS_FILES`).
+
+        Returns
+        -------
+        Optional[Path]
+            The path written, or None if metrics are disabled.
+        """
+        if not self.enabled:
+            return None
+        metrics_format = metrics_format or self.metrics_format
+        if metrics_format not in METRICS_FILES:
+            raise ValueError(
+                "Unknown metrics format '{}'.".format(metrics_format)
+            )
+
+        summary = self.summary()
+        if metrics_format == "json":
+            text = json.dumps(summary, indent=4)
+        else:
+            text = _to_prometheus(summary)
+
+        # Written next to its final location and then renamed, so that
+        # collectors never read a partial file.
+        path = Path(path or METRICS_FILES[metrics_format])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(text)
+        tmp_path.replace(path)
+        return path
+
+    def _record(self, name: str, elapsed: float):
+        with self._lock:
+            timer = self._timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += elapsed
+            timer[2] = max(timer[2], elapsed)
+
+
+def _isoformat(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ts))
+
+
+def _to_prometheus(summary: Dict[str, Any]) -> str:
+    lines = []
+
+    def add(name: str, kind: str, samples: List[Tuple[Dict, Any]]):
+        metric = "{}_{}".format(PROMETHEUS_PREFIX, name)
+        lines.append("# TYPE {} {}".format(metric, kind))
+        for labels, value in samples:
+            label_text = ",".join(
+                '{}="{}"'.format(k, str(v).replace('"', '\\"'))
+                for k, v in sorted(labels.items())
+            )
+            lines.append(
+                "{}{} {}".format(
+                    metric, "{" + label_text + "}" if label_text else "", value
+                )
+            )
+
+    timers = summary["timers"]
+    for field, name, kind in (
+            ("calls", "timer_calls_total", "counter"),
+            ("seconds", "timer_seconds_total", "counter"),
+            ("max_seconds", "timer_max_seconds", "gauge"),
+    ):
+        add(name, kind, [({"timer": k}, v[field]) for k, v in timers.items()])
+
+    by_name: Dict[str, List[Tuple[Dict, Any]]] = {}
+    for counter in summary["counters"]:
+        by_name.setdefault(counter["name"], []).append(
+            (counter["labels"], counter["value"])
+        )
+    for name, samples in by_name.items():
+        add("{}_total".format(name), "counter", samples)
+
+    caches = summary["caches"]
+    for field in ("hits", "misses"):
+        add(
+            "cache_{}_total".format(field),
+            "counter",
+            [({"cache": k}, v[field]) for k, v in caches.items()],
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
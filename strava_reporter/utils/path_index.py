@@ -1,11 +1,38 @@
+import os
 from pathlib import Path
 
-CONFIG_PATH = Path(".").parent.parent / "config"
-DATA_PATH = Path(".").parent.parent / "data"
+# Environment variable with the directory holding 'config', 'data' and 'logs'.
+HOME_VAR = "STRAVA_REPORTER_HOME"
+
+
+def _get_home() -> Path:
+    home = os.environ.get(HOME_VAR)
+    if home:
+        return Path(home).expanduser().resolve()
+
+    # Source checkouts keep the folders next to the package.
+    checkout = Path(__file__).resolve().parents[2]
+    if (checkout / "config").is_dir():
+        return checkout
+    return Path.cwd()
+
+
+HOME_PATH = _get_home()
+CONFIG_PATH = HOME_PATH / "config"
+DATA_PATH = HOME_PATH / "data"
+LOGS_PATH = HOME_PATH / "logs"
 
 CONFIG_JSON = CONFIG_PATH / "config.json"
+ATHLETES_JSON = CONFIG_PATH / "athletes.json"
 GOOGLE_CONFIG = CONFIG_PATH / "google_spreadsheet_access.json"
 ENV_VARS = CONFIG_PATH / ".env"
+TOKENS_JSON = CONFIG_PATH / ".tokens.json"
 
 DATABASE = DATA_PATH / "stravadictos.db"
 DATABASE_TEMPLATE = DATA_PATH / "stravadictos_template.db"
+REPORTS_PATH = DATA_PATH / "reports"
+
+LOG_PATH = LOGS_PATH / "runner.log"
+METRICS_JSON = LOGS_PATH / "metrics.json"
+METRICS_PROM = LOGS_PATH / "metrics.prom"
+PROFILE_STATS = LOGS_PATH / "profile.pstats"
@@ -1,6 +1,16 @@
+from functools import lru_cache
+from typing import List, Sequence
+
+import numpy as np
 import pandas as pd
 
+from .metrics import METRICS
+
+TIMEZONE = "America/Mexico_City"
+SECONDS_PER_DAY = 24 * 60 * 60
+
 
+@lru_cache(maxsize=4096)
 def unix_to_timestamp(ut: int) -> pd.Timestamp:
     """
     Convert Unix time to Timestamp.
@@ -18,7 +28,7 @@ def unix_to_timestamp(ut: int) -> pd.Timestamp:
     ts = (
         pd.to_datetime(ut, unit="s")
         .tz_localize("UTC")
-        .tz_convert(tz="America/Mexico_City")
+        .tz_convert(tz=TIMEZONE)
     )
     return ts
 
@@ -76,13 +86,105 @@ def str_to_timestamp(date: str) -> pd.Timestamp:
     :obj:`pd.Timestamp`
         The timestamp that corresponds to a date.
     """
-    today = str(pd.Timestamp.now(tz="America/Mexico_City"))[:10]
-    ts = (
-        pd.Timestamp(today, tz="America/Mexico_City")
-        if date == "today"
-        else pd.Timestamp(date, tz="America/Mexico_City")
-    )
-    return ts
+    if date == "today":
+        today = str(pd.Timestamp.now(tz=TIMEZONE))[:10]
+        return pd.Timestamp(today, tz=TIMEZONE)
+    return _date_to_timestamp(date)
+
+
+@lru_cache(maxsize=4096)
+def _date_to_timestamp(date: str) -> pd.Timestamp:
+    return pd.Timestamp(date, tz=TIMEZONE)
+
+
+@lru_cache(maxsize=4096)
+def date_to_unix(date: str) -> int:
+    """
+    Convert a date str to the Unix time of its local midnight.
+
+    Results are memoized, so repeated dates (e.g. every activity of a day)
+    are only converted once.
+
+    Parameters
+    ----------
+    date : str
+        A date as 'YYYY-MM-DD'.
+
+    Returns
+    -------
+    int
+        A unix time variable.
+    """
+    return timestamp_to_unix(_date_to_timestamp(date))
+
+
+class DayBoundaries:
+    """
+    Table of the local midnights of a span of days.
+
+    Local days are not always 86400 seconds long (DST transitions), so the
+    boundaries are computed once with pandas and unix times are then mapped
+    to days with a binary search on plain integers.
+
+    Attributes
+    ----------
+    dates : :obj:`np.ndarray`
+        The days of the span as 'YYYY-MM-DD'.
+    midnights : :obj:`np.ndarray`
+        The unix time of the local midnight of every day plus the one of the
+        day after the span (int64).
+    """
+
+    def __init__(self, start: str, end: str):
+        """Set instance attributes."""
+        days = pd.date_range(start, end, freq="D", tz=TIMEZONE)
+        self.dates = np.array(days.strftime("%Y-%m-%d"))
+        after = days[-1] + pd.DateOffset(days=1)
+        seconds = (
+            days.tz_convert("UTC").tz_localize(None).values
+            .astype("datetime64[s]").astype(np.int64)
+        )
+        self.midnights = np.append(seconds, timestamp_to_unix(after))
+
+    def day_index(self, unix: Sequence[int]) -> np.ndarray:
+        """
+        Get the position of the day of several unix times.
+
+        Parameters
+        ----------
+        unix : Sequence[int]
+            Unix time variables.
+
+        Returns
+        -------
+        :obj:`np.ndarray`
+            The index of the day of every unix time in `dates`, or -1 if it is
+            outside of the span.
+        """
+        unix = np.asarray(unix, dtype=np.int64)
+        idx = np.searchsorted(self.midnights, unix, side="right") - 1
+        idx[(idx < 0) | (idx >= len(self.dates))] = -1
+        return idx
+
+
+@lru_cache(maxsize=16)
+def get_day_boundaries(start: str, end: str) -> DayBoundaries:
+    """
+    Get the (cached) day boundaries of a span of days.
+
+    Parameters
+    ----------
+    start : str
+        The first day as 'YYYY-MM-DD'.
+    end : str
+        The last day as 'YYYY-MM-DD'.
+
+    Returns
+    -------
+    :obj:`DayBoundaries`
+        The local midnights of the span.
+    """
+    return DayBoundaries(start, end)
 
 
 class Week:
@@ -96,3 +198,21 @@ class Week:
                 setattr(self, t, str_to_timestamp(time))
                 kwargs.pop(t)
         self.__dict__.update(kwargs)
+
+    @property
+    def day_boundaries(self) -> DayBoundaries:
+        """:obj:`DayBoundaries`: The (cached) local midnights of the week."""
+        return get_day_boundaries(
+            str(self.week_start)[:10], str(self.week_end)[:10]
+        )
+
+    @property
+    def days_unix(self) -> List[int]:
+        """List[int]: The unix time of the local midnight of every day."""
+        return self.day_boundaries.midnights[:7].tolist()
+
+
+for _cached in (
+        unix_to_timestamp, _date_to_timestamp, date_to_unix, get_day_boundaries
+):
+    METRICS.register_cache(_cached.__name__, _cached)
@@ -0,0 +1,17 @@
+import atexit
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# The package resolves its config, data and logs folders on import, so the
+# tests get a home of their own before anything of it is imported.
+ROOT = Path(__file__).resolve().parents[1]
+HOME = Path(tempfile.mkdtemp(prefix="strava_reporter_tests_"))
+
+for _folder in ("config", "data", "logs"):
+    (HOME / _folder).mkdir()
+shutil.copy(ROOT / "config" / "config.json", HOME / "config")
+shutil.copy(ROOT / "data" / "stravadictos_template.db", HOME / "data")
+os.environ["STRAVA_REPORTER_HOME"] = str(HOME)
+atexit.register(shutil.rmtree, HOME, ignore_errors=True)
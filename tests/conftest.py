@@ -0,0 +1,43 @@
+import shutil
+
+import pytest
+
+from strava_reporter.handlers.connections import CONNECTION_POOL
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.reports import REPORT_FOLDER, set_report_format
+from strava_reporter.utils.metrics import METRICS
+from strava_reporter.utils.path_index import DATA_PATH
+
+from .helpers import ATHLETES
+
+# Weeks of the test database.
+FIRST_MONDAY = "2023-04-03"
+LAST_SUNDAY = "2023-04-30"
+
+
+def _remove_database():
+    CONNECTION_POOL.close_all()
+    for path in DATA_PATH.glob("stravadictos.db*"):
+        path.unlink()
+
+
+@pytest.fixture
+def empty_db() -> DBHandler:
+    """Migrated database without weeks nor athletes."""
+    _remove_database()
+    shutil.rmtree(REPORT_FOLDER, ignore_errors=True)
+    REPORT_FOLDER.mkdir(parents=True)
+    set_report_format("csv")
+    METRICS.reset()
+
+    yield DBHandler()
+    _remove_database()
+
+
+@pytest.fixture
+def db(empty_db: DBHandler) -> DBHandler:
+    """Migrated database with four weeks and three active athletes."""
+    empty_db.fill_weeks(FIRST_MONDAY, LAST_SUNDAY)
+    for name, strava_name in ATHLETES:
+        empty_db.add_athlete(name, strava_name)
+    return empty_db
@@ -0,0 +1,97 @@
+from typing import Any, Dict, Iterator, List, Optional
+
+from strava_reporter.handlers.sources import ActivitySource
+
+# Athletes of the test database as (name, strava_name).
+ATHLETES = [
+    ("Ana Barbara González", "Ana Barbara G."),
+    ("Daniel Llamas", "Daniel L."),
+    ("Maryfer Gama", "Maryfer G."),
+]
+
+
+def club_activity(
+        athlete: str,
+        name: Optional[str] = "Morning Run",
+        elapsed_time: Optional[int] = 1800,
+        distance: Optional[float] = 5000.0
+) -> Dict[str, Any]:
+    """
+    Build a raw club activity as returned by the Strava API.
+
+    Parameters
+    ----------
+    athlete : str
+        The athlete name as it appears in Strava, e.g. 'Daniel L.'.
+    name : Optional[str]
+        The activity name.
+    elapsed_time : Optional[int]
+        The seconds the activity took.
+    distance : Optional[float]
+        The meters of the activity.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The raw activity.
+    """
+    firstname, lastname = athlete.rsplit(" ", 1)
+    return {
+        "resource_state": 2,
+        "athlete": {
+            "resource_state": 2,
+            "firstname": firstname,
+            "lastname": lastname,
+        },
+        "name": name,
+        "distance": distance,
+        "moving_time": elapsed_time,
+        "elapsed_time": elapsed_time,
+        "total_elevation_gain": 0.0,
+        "type": "Run",
+        "sport_type": "Run",
+        "workout_type": None,
+    }
+
+
+class Interrupted(Exception):
+    """Raised by `ListSource` to simulate an interrupted run."""
+
+
+class ListSource(ActivitySource):
+    """
+    Source of the club activities kept in a list, most recent first.
+
+    Attributes
+    ----------
+    activities : List[Dict[str, Any]]
+        The club feed. New activities are added at the top.
+    fail_after : Optional[int]
+        If given, `Interrupted` is raised after yielding this many
+        activities.
+    read : int
+        The number of activities yielded so far.
+    """
+
+    def __init__(
+            self,
+            activities: List[Dict[str, Any]],
+            fail_after: Optional[int] = None
+    ):
+        """Set instance attributes."""
+        self.activities = activities
+        self.fail_after = fail_after
+        self.read = 0
+
+    def iter_club_activities(
+            self,
+            limit: Optional[int] = None,
+            offset: Optional[int] = 0
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream the activities of the list."""
+        stop = offset + limit if limit is not None else None
+        for activity in self.activities[offset:stop]:
+            if self.fail_after is not None and self.read >= self.fail_after:
+                raise Interrupted("Source interrupted.")
+            self.read += 1
+            yield dict(activity)
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strava_reporter.activities import (Activities, Activity, ActivityTable,
+                                        ActivityView)
+from strava_reporter.analysis import WeeklyAnalysis
+from strava_reporter.athletes import Athlete, Athletes
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.reports import get_report_writer
+from strava_reporter.utils.time import Week, date_to_unix
+
+from .helpers import ATHLETES
+
+WEEK = Week(week_number=1, week_start="2023-04-03", week_end="2023-04-09")
+DATES = [str(x)[:10] for x in pd.date_range("2023-04-03", periods=7)]
+
+
+def _athletes(n: int, seed: int) -> list:
+    """Athletes with random activities, some of them too short."""
+    rng = np.random.default_rng(seed)
+    athletes = []
+    for i in range(n):
+        athlete = Athlete("Athlete {}".format(i), "Athlete{} X.".format(i))
+        for j in range(rng.integers(0, 12)):
+            athlete.activities.append(Activity(
+                activity_id="{}-{}".format(i, j),
+                athlete=athlete.strava_name,
+                name="Activity {}".format(j),
+                date=DATES[rng.integers(0, 7)],
+                elapsed_time=int(rng.choice([600, 900, 1619, 1620, 3600])),
+            ))
+        athletes.append(athlete)
+    return athletes
+
+
+def _frame(athletes: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            (x.athlete, x.date_unix, x.time.total_seconds())
+            for athlete in athletes
+            for x in athlete.activities
+        ],
+        columns=["athlete", "date_unix", "duration_secs"],
+    )
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_vectorized_analysis_matches_the_counters(seed: int):
+    """Counting all athletes at once gives the per athlete results."""
+    athletes = _athletes(40, seed)
+    names = [x.name for x in athletes]
+
+    loop = WeeklyAnalysis(names, WEEK, "csv")
+    for athlete in athletes:
+        loop.count_athlete_activities(athlete)
+
+    vectorized = WeeklyAnalysis(names, WEEK, "csv")
+    vectorized.count_activities(
+        _frame(athletes), {x.strava_name: x.name for x in athletes}
+    )
+
+    pd.testing.assert_frame_equal(vectorized.data, loop.data)
+    assert loop.data["TOTAL_DAYS"].sum() > 0
+
+
+def test_short_activities_add_up_within_a_day():
+    """Two activities of 15 minutes validate the day, one does not."""
+    athlete = Athlete("Daniel Llamas", "Daniel L.")
+    for i, date in enumerate([DATES[0], DATES[0], DATES[1]]):
+        athlete.activities.append(Activity(
+            activity_id=str(i), athlete="Daniel L.", name="Walk",
+            date=date, elapsed_time=900,
+        ))
+    analysis = WeeklyAnalysis([athlete.name], WEEK, "csv")
+    analysis.count_activities(_frame([athlete]), {"Daniel L.": athlete.name})
+
+    row = analysis.data.iloc[0]
+    assert row["MONDAY"] == 1
+    assert row["TUESDAY"] is None
+    assert row["TOTAL_DAYS"] == 1
+
+
+def test_unknown_athletes_and_other_weeks_are_ignored():
+    """Activities of other athletes or outside of the week do not count."""
+    activities = pd.DataFrame({
+        "athlete": ["Daniel L.", "Someone E.", "Daniel L."],
+        "date_unix": [
+            WEEK.days_unix[2], WEEK.days_unix[2], WEEK.days_unix[0] - 86400
+        ],
+        "duration_secs": [1800, 1800, 1800],
+    })
+    analysis = WeeklyAnalysis(["Daniel Llamas"], WEEK, "csv")
+    analysis.count_activities(activities, {"Daniel L.": "Daniel Llamas"})
+
+    assert analysis.data["TOTAL_DAYS"].tolist() == [1]
+    assert analysis.data.iloc[0]["WEDNESDAY"] == 1
+
+
+def _ingest_week(db: DBHandler):
+    """Save activities of every athlete on several days of week 1."""
+    rows = []
+    for i, (_, strava_name) in enumerate(ATHLETES):
+        for j, date in enumerate(DATES[:3 + 2 * i]):
+            rows.append((
+                "{}-{}".format(i, j), 1, "Run", strava_name,
+                900 if j == 1 else 1800, date, date_to_unix(date),
+                "fp-{}-{}".format(i, j),
+            ))
+    db.add_activities(rows)
+
+
+def test_activities_from_db_are_table_views(db: DBHandler):
+    """Weekly activities are loaded as views of a single table."""
+    _ingest_week(db)
+    activities = Activities()
+    activities.get_weekly_activities_from_db(1, db)
+
+    assert len(activities) == 3 + 5 + 7
+    assert {type(x) for x in activities} == {ActivityView}
+    assert {x.athlete for x in activities} == {x[1] for x in ATHLETES}
+    total = sum(x.time.total_seconds() for x in activities)
+    assert total == 12 * 1800 + 3 * 900
+
+
+def test_loaded_activities_match_the_sql_aggregation(db: DBHandler):
+    """Analyzing the loaded activities gives the SQL aggregated report."""
+    _ingest_week(db)
+
+    Athletes().analyze(1, in_db=True, with_results=False)
+    in_db = get_report_writer().read(1)
+    athletes = Athletes()
+    athletes.analyze(1, with_results=False)
+    loaded = get_report_writer().read(1)
+
+    assert all(
+        isinstance(x.activities, ActivityTable) for x in athletes
+    )
+    pd.testing.assert_frame_equal(loaded, in_db)
+    assert loaded["TOTAL_DAYS"].tolist() == [2, 4, 6]
+
+
+def test_reused_registry_analyzes_the_requested_week(db: DBHandler):
+    """Activities of a previous week are not carried over to the next one."""
+    _ingest_week(db)
+    db.add_activities([
+        ("week-2", 2, "Run", "Daniel L.", 1800, "2023-04-10",
+         date_to_unix("2023-04-10"), "fp-week-2"),
+    ])
+    athletes = Athletes()
+    athletes.analyze(1, with_results=False)
+
+    athletes.analyze(2, with_results=False)
+    loaded = get_report_writer().read(2)
+    Athletes().analyze(2, in_db=True, with_results=False)
+
+    assert [len(x.activities) for x in athletes] == [0, 1, 0]
+    pd.testing.assert_frame_equal(loaded, get_report_writer().read(2))
+    assert loaded["TOTAL_DAYS"].tolist() == [0, 1, 0]
+
+
+def test_incremental_update_matches_the_full_analysis(db: DBHandler):
+    """Updating the changed days gives the report of a full analysis."""
+    _ingest_week(db)
+    Athletes().analyze(1, in_db=True, with_results=False)
+
+    def check(days: set):
+        Athletes().update_analysis(1, days)
+        updated = get_report_writer().read(1)
+        Athletes().analyze(1, in_db=True, with_results=False)
+        pd.testing.assert_frame_equal(updated, get_report_writer().read(1))
+        return updated["TOTAL_DAYS"].tolist()
+
+    # A short activity completing a day, a new day and an unknown athlete.
+    added = [
+        ("extra-0", 1, "Run", ATHLETES[0][1], 900, DATES[1]),
+        ("extra-1", 1, "Run", ATHLETES[0][1], 1800, DATES[5]),
+        ("extra-2", 1, "Run", "Someone E.", 1800, DATES[5]),
+    ]
+    db.add_activities(
+        x + (date_to_unix(x[5]), "fp-" + x[0]) for x in added
+    )
+    assert check({(x[3], date_to_unix(x[5])) for x in added}) == [4, 4, 6]
+
+    # Dropping the only activity of a day and part of a valid day.
+    db.drop_activity_by_hash("2-0")
+    db.drop_activity_by_hash("extra-0")
+    days = {
+        (ATHLETES[2][1], date_to_unix(DATES[0])),
+        (ATHLETES[0][1], date_to_unix(DATES[1])),
+    }
+    assert check(days) == [3, 4, 5]
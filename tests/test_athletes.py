@@ -0,0 +1,172 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from strava_reporter.activities import Activities, Activity, ActivityTable
+from strava_reporter.athletes import Athletes
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.reports import get_report_writer
+from strava_reporter.utils.time import date_to_unix, str_to_timestamp
+
+from .helpers import ATHLETES
+
+
+def _table(strava_names: list) -> ActivityTable:
+    n = len(strava_names)
+    return ActivityTable(
+        ["id-{}".format(i) for i in range(n)],
+        strava_names,
+        np.full(n, 1680501600),
+        np.full(n, 1800),
+    )
+
+
+def test_registry_state_is_per_instance(db: DBHandler):
+    """New registries do not keep growing the previous ones."""
+    first = Athletes()
+    second = Athletes()
+
+    assert len(first) == len(second) == len(ATHLETES)
+    assert second.athlete_strava_names == [x[1] for x in ATHLETES]
+    assert first.athlete_names is not second.athlete_names
+
+
+def test_lookups_by_strava_name(db: DBHandler):
+    """Athletes are found by their Strava name and coded by position."""
+    db.add_athlete("Daniel Duplicated", "Daniel L.")
+    db.add_athlete("Inactive Athlete", "Inactive A.", active=False)
+    athletes = Athletes()
+
+    assert len(athletes) == len(ATHLETES)
+    assert athletes.get_athlete("Daniel L.").name == "Daniel Llamas"
+    assert athletes.get_athlete("Inactive A.") is None
+    assert athletes.get_code("Maryfer G.") == 2
+    assert athletes.get_code("Someone E.") == -1
+    assert athletes.encode(
+        ["Maryfer G.", "Someone E.", "Ana Barbara G."]
+    ).tolist() == [2, -1, 0]
+
+
+def test_table_assignment_matches_per_activity(db: DBHandler):
+    """Tables are split by athlete like activities assigned one by one."""
+    names = ["Daniel L.", "Someone E.", "Maryfer G.", "Daniel L."] * 5
+    table = _table(names)
+    by_table = Athletes()
+    by_table.assign_activities(table)
+
+    activities = Activities(
+        Activity(
+            activity_id=x.activity_id, athlete=x.athlete, name="Run",
+            date="2023-04-03", elapsed_time=1800,
+        )
+        for x in table
+    )
+    by_activity = Athletes()
+    by_activity.assign_activities(activities)
+
+    for left, right in zip(by_table, by_activity):
+        assert [x.activity_id for x in left.activities] == [
+            x.activity_id for x in right.activities
+        ]
+    assert [len(x.activities) for x in by_table] == [0, 10, 5]
+    assert isinstance(by_table.get_athlete("Daniel L.").activities,
+                      ActivityTable)
+
+
+def _weekly_state(db: DBHandler) -> tuple:
+    return (
+        db.conn.execute("SELECT COUNT(*) FROM WEEKLY_RESULTS").fetchone()[0],
+        db.conn.execute("SELECT COUNT(*) FROM DEBTS").fetchone()[0],
+        db.conn.execute(
+            "SELECT SUM(weeks_completed) FROM ATHLETES"
+        ).fetchone()[0],
+    )
+
+
+def test_results_of_weeks_in_progress_are_not_saved(db: DBHandler):
+    """The report of a running week is written, but no results nor debts."""
+    db.add_activities(
+        (
+            "id-{}".format(day), 1, "Run", "Daniel L.", 1800, date,
+            date_to_unix(date), "fp-{}".format(day),
+        )
+        for day, date in enumerate(
+            ["2023-04-03", "2023-04-04", "2023-04-05", "2023-04-06",
+             "2023-04-07"]
+        )
+    )
+    athletes = Athletes()
+
+    athletes.analyze(1, in_db=True, now=str_to_timestamp("2023-04-09"))
+
+    assert get_report_writer().read(1)["TOTAL_DAYS"].tolist() == [0, 5, 0]
+    assert _weekly_state(db) == (0, 0, 0)
+
+    athletes.analyze(1, in_db=True, now=str_to_timestamp("2023-04-10"))
+
+    assert _weekly_state(db) == (3, 2, 1)
+
+
+@pytest.mark.parametrize(
+    "config, expected",
+    [({"required_days": 2}, (3, 2, 1)), ({"required_days": 1}, (3, 1, 2)),
+     ({}, (0, 0, 0))],
+)
+def test_required_days_come_from_the_config(
+        db: DBHandler,
+        monkeypatch: pytest.MonkeyPatch,
+        config: dict,
+        expected: tuple
+):
+    """Weeks are completed with the configured days, if any."""
+    monkeypatch.setattr(
+        "strava_reporter.athletes.Config", lambda: SimpleNamespace(**config)
+    )
+    db.add_activities(
+        (
+            "id-{}-{}".format(strava_name, day), 1, "Run", strava_name, 1800,
+            date, date_to_unix(date), "fp-{}-{}".format(strava_name, day),
+        )
+        for strava_name, days in (("Daniel L.", 2), ("Maryfer G.", 1))
+        for day, date in enumerate(["2023-04-03", "2023-04-04"][:days])
+    )
+    Athletes().analyze(1, in_db=True, now=str_to_timestamp("2023-04-10"))
+
+    assert _weekly_state(db) == expected
+
+
+def test_weeks_completed_before_the_results_are_kept(db: DBHandler):
+    """Counts from before WEEKLY_RESULTS existed only grow by new weeks."""
+    db.conn.executemany(
+        "UPDATE ATHLETES SET weeks_completed = ? WHERE strava_name = ?",
+        [(2, "Ana Barbara G."), (1, "Daniel L."), (1, "Maryfer G.")],
+    )
+    db.conn.commit()
+    db.add_activities(
+        (
+            "id-{}-{}".format(strava_name, day), week, "Run", strava_name,
+            1800, date, date_to_unix(date),
+            "fp-{}-{}".format(strava_name, day),
+        )
+        for strava_name, week, dates in (
+            ("Daniel L.", 1, ["2023-04-0{}".format(x) for x in range(3, 8)]),
+            ("Maryfer G.", 2, ["2023-04-1{}".format(x) for x in range(0, 5)]),
+        )
+        for day, date in enumerate(dates)
+    )
+
+    def weeks_completed() -> list:
+        return [
+            x[0] for x in db.conn.execute(
+                "SELECT weeks_completed FROM ATHLETES ORDER BY name"
+            )
+        ]
+
+    athletes = Athletes()
+    athletes.analyze(1, in_db=True, now=str_to_timestamp("2023-04-17"))
+    assert weeks_completed() == [2, 2, 1]
+
+    athletes.analyze(2, in_db=True, now=str_to_timestamp("2023-04-17"))
+    athletes.analyze(1, in_db=True, now=str_to_timestamp("2023-04-17"))
+    assert weeks_completed() == [2, 2, 2]
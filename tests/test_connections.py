@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from strava_reporter.handlers.connections import _ConnectionPool
+
+
+@pytest.fixture
+def pool() -> _ConnectionPool:
+    """Pool of its own, so that the one of the package is not touched."""
+    pool = _ConnectionPool()
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture
+def db_path(pool: _ConnectionPool, tmp_path: Path) -> Path:
+    """Database with a table of numbers."""
+    path = tmp_path / "test.db"
+    conn = pool.get(path)
+    conn.execute("CREATE TABLE NUMBERS (n INTEGER)")
+    conn.execute("INSERT INTO NUMBERS VALUES (1)")
+    conn.commit()
+    return path
+
+
+def _count(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM NUMBERS").fetchone()[0]
+
+
+def test_one_connection_per_thread_and_file(
+        pool: _ConnectionPool,
+        tmp_path: Path
+):
+    """Connections are reused by thread, database file and mode."""
+    first = pool.get(tmp_path / "first.db")
+    other_thread = []
+    thread = threading.Thread(
+        target=lambda: other_thread.append(pool.get(tmp_path / "first.db"))
+    )
+    thread.start()
+    thread.join()
+
+    assert pool.get(tmp_path / "first.db") is first
+    assert pool.get(tmp_path / "data" / ".." / "first.db") is first
+    assert pool.get(tmp_path / "second.db") is not first
+    assert pool.get(tmp_path / "first.db", read_only=True) is not first
+    assert other_thread[0] is not first
+    assert pool.opened == 4
+
+
+def test_pragmas_are_applied(pool: _ConnectionPool, db_path: Path):
+    """Connections use WAL and the configured PRAGMAs."""
+    conn = pool.get(db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+    pool.configure(cached_statements=16, synchronous="FULL")
+    reader = pool.get(db_path, read_only=True)
+    assert reader.execute("PRAGMA synchronous").fetchone()[0] == 2
+    assert reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_read_only_connections_cannot_write(
+        pool: _ConnectionPool,
+        db_path: Path
+):
+    """Writes through read-only connections are refused."""
+    reader = pool.get(db_path, read_only=True)
+
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        reader.execute("INSERT INTO NUMBERS VALUES (2)")
+    assert _count(reader) == 1
+
+
+def test_readers_proceed_while_writing(pool: _ConnectionPool, db_path: Path):
+    """Readers see the last commit while a write transaction is open."""
+    writer = pool.get(db_path)
+    reader = pool.get(db_path, read_only=True)
+
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO NUMBERS VALUES (2)")
+    assert _count(reader) == 1
+
+    writer.commit()
+    assert _count(reader) == 2
+
+
+def test_pool_is_reset_after_a_fork(pool: _ConnectionPool, db_path: Path):
+    """Forked processes open their own connections."""
+    parent = pool.get(db_path)
+    read_fd, write_fd = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            conn = pool.get(db_path)
+            ok = all((
+                conn is not parent,
+                pool._connections == [conn],
+                _count(conn) == 1,
+            ))
+            os.write(write_fd, b"1" if ok else b"0")
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+
+    assert result == b"1"
+    assert pool.get(db_path) is parent
+    assert _count(parent) == 1
@@ -0,0 +1,137 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from strava_reporter.daemon import Daemon
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.utils.time import TIMEZONE, date_to_unix
+
+from .helpers import ListSource, club_activity
+
+
+class FakeClock:
+    """Local clock advanced by the sleeps of the daemon."""
+
+    def __init__(self, now: str):
+        """Set instance attributes."""
+        self.now = pd.Timestamp(now, tz=TIMEZONE)
+
+    def __call__(self) -> pd.Timestamp:
+        """Get the current time."""
+        return self.now
+
+    def sleep(self, seconds: float):
+        """Advance the clock."""
+        self.now += pd.Timedelta(seconds=seconds)
+
+
+def _names_by_date(db: DBHandler) -> dict:
+    res = db.conn.execute("SELECT date, name FROM ACTIVITIES ORDER BY name")
+    names = {}
+    for date, name in res:
+        names.setdefault(date, []).append(name)
+    return names
+
+
+def _weekly_results(db: DBHandler) -> int:
+    return db.conn.execute("SELECT COUNT(*) FROM WEEKLY_RESULTS").fetchone()[0]
+
+
+def test_polls_do_not_complete_the_daily_ingest(db: DBHandler):
+    """A day only polled is ingested again when catching up."""
+    db.set_ingest_checkpoint("2023-04-04", 0, completed=True)
+    source = ListSource([club_activity("Daniel L.", name="Polled")])
+    clock = FakeClock("2023-04-05 12:00")
+    daemon = Daemon(source, poll_minutes=60, clock=clock, sleep=clock.sleep)
+
+    daemon.run(max_runs=1)
+
+    assert clock.now == pd.Timestamp("2023-04-05 13:00", tz=TIMEZONE)
+    assert db.get_ingest_checkpoint("2023-04-05", "poll") == (1, True)
+    assert db.get_ingest_checkpoint("2023-04-05") is None
+
+    # Down during the daily ingest and started again the next morning.
+    source.activities.insert(0, club_activity("Daniel L.", name="Evening"))
+    clock.now = pd.Timestamp("2023-04-06 08:00", tz=TIMEZONE)
+    Daemon(source, clock=clock, sleep=clock.sleep).catch_up()
+
+    assert db.get_ingest_checkpoint("2023-04-05")[1]
+    assert _names_by_date(db) == {"2023-04-05": ["Evening", "Polled"]}
+
+
+def test_failed_ingest_is_caught_up_on_the_next_tick(db: DBHandler):
+    """An ingest that failed is run again without restarting the daemon."""
+    db.set_ingest_checkpoint("2023-04-04", 0, completed=True)
+    source = ListSource([club_activity("Daniel L.")], fail_after=0)
+    clock = FakeClock("2023-04-05 23:00")
+    daemon = Daemon(source, poll_minutes=120, clock=clock, sleep=clock.sleep)
+
+    daemon.run(max_runs=1)
+    assert not db.get_ingest_checkpoint("2023-04-05")
+
+    source.fail_after = None
+    clock.sleep(60)
+    daemon.tick()
+
+    assert db.get_ingest_checkpoint("2023-04-05")[1]
+    assert list(_names_by_date(db)) == ["2023-04-05"]
+
+
+def test_week_results_are_saved_once_the_week_is_over(db: DBHandler):
+    """The daemon wakes up at midnight to save the results of the week."""
+    db.set_ingest_checkpoint("2023-04-08", 0, completed=True)
+    source = ListSource([club_activity("Daniel L.")])
+    clock = FakeClock("2023-04-09 23:00")
+    daemon = Daemon(source, clock=clock, sleep=clock.sleep)
+
+    daemon.run(max_runs=1)
+    assert clock.now == pd.Timestamp("2023-04-09 23:50", tz=TIMEZONE)
+    assert _weekly_results(db) == 0
+
+    daemon.run(max_runs=1)
+    assert clock.now == pd.Timestamp("2023-04-10 00:00", tz=TIMEZONE)
+    assert _weekly_results(db) == 3
+
+
+def test_midnight_does_not_postpone_the_polls(db: DBHandler):
+    """Polls keep their schedule when the daemon wakes up at midnight."""
+    db.set_ingest_checkpoint("2023-04-09", 0, completed=True)
+    source = ListSource([club_activity("Daniel L.")])
+    clock = FakeClock("2023-04-09 23:55")
+    daemon = Daemon(source, poll_minutes=30, clock=clock, sleep=clock.sleep)
+
+    daemon.run(max_runs=1)
+    assert clock.now == pd.Timestamp("2023-04-10 00:00", tz=TIMEZONE)
+    assert db.get_ingest_checkpoint("2023-04-10", "poll") is None
+
+    daemon.run(max_runs=1)
+    assert clock.now == pd.Timestamp("2023-04-10 00:25", tz=TIMEZONE)
+    assert db.get_ingest_checkpoint("2023-04-10", "poll") == (1, True)
+
+
+def test_weeks_are_not_caught_up_without_required_days(
+        db: DBHandler,
+        monkeypatch: pytest.MonkeyPatch
+):
+    """Weeks whose results cannot be saved are not analyzed on every tick."""
+    monkeypatch.setattr(
+        "strava_reporter.athletes.Config", lambda: SimpleNamespace()
+    )
+    db.set_ingest_checkpoint("2023-04-11", 0, completed=True)
+    db.add_activities([
+        ("id-1", 1, "Run", "Daniel L.", 1800, "2023-04-03",
+         date_to_unix("2023-04-03"), "fp-1"),
+    ])
+    clock = FakeClock("2023-04-12 08:00")
+    daemon = Daemon(ListSource([]), clock=clock, sleep=clock.sleep)
+    analyzed = []
+    monkeypatch.setattr(
+        daemon.athletes, "analyze", lambda *args, **kwargs: analyzed.append(1)
+    )
+
+    daemon.catch_up()
+    daemon.tick()
+
+    assert analyzed == []
+    assert _weekly_results(db) == 0
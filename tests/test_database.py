@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.utils.time import date_to_unix
+
+
+def _row(i: int, athlete: str = "Daniel L.", date: str = "2023-04-04"):
+    return (
+        "id-{}".format(i), 1, "Run {}".format(i), athlete, 600, date,
+        date_to_unix(date), "fp-{}".format(i)
+    )
+
+
+def _count(db: DBHandler, table: str) -> int:
+    return db.cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_fill_weeks_writes_contiguous_weeks(db: DBHandler):
+    """Every week starts where the previous one ends."""
+    weeks = db.cur.execute(
+        "SELECT week_number, week_start, week_end, week_start_unix, "
+        "week_end_unix FROM WEEKS ORDER BY week_number"
+    ).fetchall()
+
+    assert [x[0] for x in weeks] == [1, 2, 3, 4]
+    assert weeks[0][1:3] == ("2023-04-03", "2023-04-09")
+    for previous, week in zip(weeks, weeks[1:]):
+        assert week[3] == previous[4]
+
+
+def test_add_activities_saves_rows_and_daily_totals(db: DBHandler):
+    """Activities and the daily totals they change are saved together."""
+    db.add_activities(
+        [_row(1), _row(2), _row(3, date="2023-04-05"), _row(4, "Maryfer G.")]
+    )
+
+    assert _count(db, "ACTIVITIES") == 4
+    assert db.get_daily_total("Daniel L.", date_to_unix("2023-04-04")) == (
+        "Daniel Llamas", 1200
+    )
+    assert db.get_daily_total("Daniel L.", date_to_unix("2023-04-05")) == (
+        "Daniel Llamas", 600
+    )
+
+
+def test_add_activities_is_atomic(db: DBHandler):
+    """A failing row rolls back the whole batch."""
+    db.add_activities([_row(1)])
+
+    with pytest.raises(sqlite3.IntegrityError):
+        db.add_activities([_row(2), _row(1)])
+
+    assert _count(db, "ACTIVITIES") == 1
+    assert db.get_daily_total("Daniel L.", date_to_unix("2023-04-04")) == (
+        "Daniel Llamas", 600
+    )
+
+
+def test_nested_transactions_commit_once(db: DBHandler):
+    """Statements of nested transactions are rolled back altogether."""
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.add_activities([_row(1)])
+            db.add_athlete("Fredy De León", "Fredy D.")
+            raise RuntimeError
+
+    assert _count(db, "ACTIVITIES") == 0
+    assert len(db.get_active_athletes()) == 3
+
+
+def test_add_activity_keeps_quotes(db: DBHandler):
+    """Names are bound as parameters, not formatted into the SQL."""
+    row = list(_row(1))
+    row[2] = "Daniel's 'run'"
+    db.add_activity(*row)
+
+    assert db.get_weekly_activities(1)[0]["name"] == "Daniel's 'run'"
@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import sys
+import threading
+from typing import List
+
+import pytest
+
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.utils.log import (SQL_LOGGER, _JsonFormatter,
+                                       _QueueHandler, set_sql_tracing)
+
+
+class ListHandler(logging.Handler):
+    """Handler keeping the formatted records in a list."""
+
+    def __init__(self):
+        """Set instance attributes."""
+        super().__init__()
+        self.records: List[logging.LogRecord] = []
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        """Keep a record and its message."""
+        self.records.append(record)
+        self.messages.append(self.format(record))
+
+
+class BlockingHandler(ListHandler):
+    """Handler whose writes wait until they are released."""
+
+    def __init__(self):
+        """Set instance attributes."""
+        super().__init__()
+        self.writing = threading.Event()
+        self.released = threading.Event()
+
+    def emit(self, record: logging.LogRecord):
+        """Keep a record once released."""
+        self.writing.set()
+        self.released.wait(5)
+        super().emit(record)
+
+
+class Counted:
+    """Value that counts how many times it is formatted."""
+
+    def __init__(self):
+        """Set instance attributes."""
+        self.calls = 0
+
+    def __str__(self) -> str:
+        """Format the value."""
+        self.calls += 1
+        return "counted"
+
+
+def _record(msg: str, *args, **kwargs) -> logging.LogRecord:
+    return logging.getLogger("test").makeRecord(
+        "test", logging.INFO, __file__, 1, msg, args, None, **kwargs
+    )
+
+
+@pytest.fixture
+def queued():
+    """Logger writing through a queue handler into a list."""
+    target = ListHandler()
+    handler = _QueueHandler(target)
+    # Not registered, so that the handlers of pytest are not attached.
+    logger = logging.Logger("queue", logging.INFO)
+    logger.addHandler(handler)
+    yield logger, handler, target
+    handler.stop()
+    logger.removeHandler(handler)
+
+
+def test_json_formatter_writes_one_event_per_line():
+    """Events have the record fields, the message and the extra fields."""
+    record = _record(
+        "%d activities saved in %s.", 3, "week 1",
+        extra={"fields": {"saved": 3}},
+    )
+
+    event = json.loads(_JsonFormatter().format(record))
+
+    assert list(event) == ["time", "level", "logger", "message", "saved"]
+    assert event["level"] == "INFO"
+    assert event["logger"] == "test"
+    assert event["message"] == "3 activities saved in week 1."
+    assert event["saved"] == 3
+
+
+def test_json_formatter_includes_the_exception():
+    """The traceback of a failed task is kept in the event."""
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.getLogger("test").makeRecord(
+            "test", logging.ERROR, __file__, 1, "Task failed.", (),
+            sys.exc_info(),
+        )
+
+    formatted = _JsonFormatter().format(record)
+
+    assert "\n" not in formatted
+    assert "ValueError: boom" in json.loads(formatted)["exception"]
+
+
+def test_queue_handler_formats_in_the_writer(queued):
+    """Messages are formatted once, by the writer, and only if enabled."""
+    logger, handler, target = queued
+    value = Counted()
+
+    logger.debug("Skipped %s", value)
+    logger.info("Written %s", value)
+    handler.stop()
+
+    assert value.calls == 1
+    assert target.messages == ["Written counted"]
+    assert target.records[0].args == (value,)
+
+
+def test_queue_handler_writes_directly_in_forked_processes(queued):
+    """Without the writer of the parent, records are handled right away."""
+    logger, handler, target = queued
+    handler._pid = -1
+
+    logger.info("From a worker")
+
+    assert target.messages == ["From a worker"]
+    assert not handler._started
+
+
+def test_forks_wait_for_the_record_being_written():
+    """Workers are not forked in the middle of a write of the writer."""
+    target = BlockingHandler()
+    handler = _QueueHandler(target)
+    logger = logging.Logger("queue", logging.INFO)
+    logger.addHandler(handler)
+    logger.info("Slow")
+    assert target.writing.wait(5)
+
+    timer = threading.Timer(0.2, target.released.set)
+    timer.start()
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    released = target.released.is_set()
+    os.waitpid(pid, 0)
+    timer.join()
+    handler.stop()
+
+    assert released
+    assert target.messages == ["Slow"]
+
+
+def test_sql_tracing_is_opt_in(db: DBHandler):
+    """Statements are only logged while the tracing is on."""
+    target = ListHandler()
+    SQL_LOGGER.addHandler(target)
+    try:
+        db.get_week_information(1)
+        set_sql_tracing()
+        assert SQL_LOGGER.isEnabledFor(logging.DEBUG)
+        db.get_week_information(1)
+        set_sql_tracing(False)
+        db.get_week_information(1)
+    finally:
+        set_sql_tracing(False)
+        SQL_LOGGER.removeHandler(target)
+
+    assert not SQL_LOGGER.isEnabledFor(logging.DEBUG)
+    assert len(target.messages) == 1
+    assert "FROM WEEKS" in target.messages[0]
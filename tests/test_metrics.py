@@ -0,0 +1,141 @@
+import argparse
+import json
+import pstats
+from functools import lru_cache
+from pathlib import Path
+
+import pytest
+
+from strava_reporter.__main__ import profile, run
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.utils.metrics import Metrics
+
+
+def _namespace(**kwargs) -> argparse.Namespace:
+    defaults = {
+        "authorize": False,
+        "migrations": False,
+        "daemon": False,
+        "analysis_range": None,
+        "all_weeks": False,
+        "analysis": None,
+        "test": False,
+    }
+    return argparse.Namespace(**{**defaults, **kwargs})
+
+
+def test_disabled_metrics_are_not_recorded(tmp_path: Path):
+    """Timers and counters return right away and nothing is written."""
+    metrics = Metrics(enabled=False)
+
+    @metrics.timed()
+    def double(x: int) -> int:
+        return 2 * x
+
+    with metrics.timer("block"):
+        assert double(2) == 4
+    metrics.increment("rows_written", 3, table="ACTIVITIES")
+
+    summary = metrics.summary()
+    assert summary["timers"] == {}
+    assert summary["counters"] == []
+    assert metrics.write(path=tmp_path / "metrics.json") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_json_summary(tmp_path: Path):
+    """Timers, counters by labels and caches are written as JSON."""
+    metrics = Metrics()
+
+    @metrics.timed("doubled")
+    def double(x: int) -> int:
+        return 2 * x
+
+    for x in range(3):
+        double(x)
+    with metrics.timer("block"):
+        pass
+    metrics.increment("rows_written", 2, table="ACTIVITIES")
+    metrics.increment("rows_written", 3, table="ACTIVITIES")
+    metrics.increment("rows_written", 1, table="ATHLETES")
+    metrics.increment("rows_written", 0, table="WEEKS")
+
+    path = metrics.write("json", tmp_path / "metrics.json")
+    summary = json.loads(path.read_text())
+
+    assert list(summary) == [
+        "started", "written", "timers", "counters", "caches"
+    ]
+    assert list(summary["timers"]) == ["block", "doubled"]
+    assert summary["timers"]["doubled"]["calls"] == 3
+    assert set(summary["timers"]["doubled"]) == {
+        "calls", "seconds", "max_seconds"
+    }
+    assert summary["counters"] == [
+        {"name": "rows_written", "labels": {"table": "ACTIVITIES"},
+         "value": 5},
+        {"name": "rows_written", "labels": {"table": "ATHLETES"},
+         "value": 1},
+    ]
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_prometheus_textfile(tmp_path: Path):
+    """Metrics are written with the prefix, types and escaped labels."""
+    metrics = Metrics(metrics_format="prometheus")
+    with metrics.timer("block"):
+        pass
+    metrics.increment("api_calls", 2, source='say "hi"')
+
+    text = metrics.write(path=tmp_path / "metrics.prom").read_text()
+    lines = text.splitlines()
+
+    assert "# TYPE strava_reporter_timer_calls_total counter" in lines
+    assert 'strava_reporter_timer_calls_total{timer="block"} 1' in lines
+    assert "# TYPE strava_reporter_timer_max_seconds gauge" in lines
+    assert "# TYPE strava_reporter_api_calls_total counter" in lines
+    assert (
+        'strava_reporter_api_calls_total{source="say \\"hi\\""} 2' in lines
+    )
+    assert text.endswith("\n")
+
+
+def test_cache_statistics():
+    """Hits and misses of registered caches are read with the summary."""
+    metrics = Metrics()
+
+    @lru_cache(maxsize=None)
+    def square(x: int) -> int:
+        return x * x
+
+    metrics.register_cache("square", square)
+    for x in (1, 2, 1, 1):
+        square(x)
+
+    assert metrics.summary()["caches"] == {
+        "square": {"hits": 2, "misses": 2}
+    }
+    metrics.reset()
+    assert metrics.summary()["caches"]["square"]["hits"] == 2
+
+
+def test_unknown_format_is_an_error():
+    """Only the JSON and Prometheus formats are supported."""
+    with pytest.raises(ValueError, match="Unknown metrics format"):
+        Metrics().configure(metrics_format="xml")
+
+
+def test_profile_writes_the_stats(
+        db: DBHandler,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch
+):
+    """Subcommands run under --profile save their cProfile stats."""
+    path = tmp_path / "profile.pstats"
+    monkeypatch.setattr("strava_reporter.__main__.PROFILE_STATS", path)
+
+    profile(run, _namespace(analysis=1))
+
+    stats = pstats.Stats(str(path))
+    functions = {name for _, _, name in stats.stats}
+    assert {"run", "analyze"} <= functions
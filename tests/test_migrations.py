@@ -0,0 +1,175 @@
+import logging
+import re
+import sqlite3
+from typing import Callable, Iterator, List
+
+import pandas as pd
+import pytest
+
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.handlers.migrations import (MIGRATIONS, Migration,
+                                                 SchemaMigrator)
+from strava_reporter.utils.log import SQL_LOGGER, set_sql_tracing
+from strava_reporter.utils.path_index import DATABASE_TEMPLATE
+from strava_reporter.utils.time import str_to_timestamp
+
+TS = str_to_timestamp("2023-04-05")
+
+
+@pytest.fixture
+def template() -> Iterator[sqlite3.Connection]:
+    """In-memory copy of the template, before any migration."""
+    source = sqlite3.connect(DATABASE_TEMPLATE)
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    source.backup(conn)
+    source.close()
+    yield conn
+    conn.close()
+
+
+class _Statements(logging.Handler):
+    """Handler that keeps the SQL traced by the data base handler."""
+
+    def __init__(self):
+        """Set instance attributes."""
+        super().__init__(logging.DEBUG)
+        self.sql: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        """Keep the statement of a record."""
+        self.sql.append(record.args[0])
+
+
+def _traced(func: Callable, *args) -> List[str]:
+    handler = _Statements()
+    SQL_LOGGER.addHandler(handler)
+    set_sql_tracing(True)
+    try:
+        func(*args)
+    finally:
+        set_sql_tracing(False)
+        SQL_LOGGER.removeHandler(handler)
+    return handler.sql
+
+
+# The queries run on every ingest or analysis, as (method, arguments).
+HOT_QUERIES = {
+    "get_week_number": ("get_week_number", (TS,)),
+    "get_last_hashes": ("get_last_hashes", (TS, True)),
+    "get_known_fingerprints": ("get_known_fingerprints", (TS, 1, True)),
+    "get_weekly_activities": ("get_weekly_activities", (1,)),
+    "get_weekly_totals": ("get_weekly_totals", (1,)),
+    "get_daily_total": ("get_daily_total", ("Daniel L.", 1680674400)),
+    "get_activity_keys": ("get_activity_keys", ("2023-04-04", "2023-04-06")),
+    "get_debts": ("get_debts", (1,)),
+    "count_zapier_uploads": ("count_zapier_uploads", (0, 1)),
+    "get_zapier_records": ("get_zapier_records", (0, 1)),
+}
+
+
+@pytest.mark.parametrize("query", sorted(HOT_QUERIES))
+def test_hot_queries_use_indexes(db: DBHandler, query: str):
+    """No hot query falls back to a full table scan."""
+    method, args = HOT_QUERIES[query]
+    statements = _traced(getattr(db, method), *args)
+    assert statements
+
+    for sql in statements:
+        params = (None,) * sql.count("?")
+        plan = db.conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        details = [x[-1] for x in plan]
+        scans = [
+            x for x in details
+            if re.match(r"SCAN \w+$", x) or x.startswith("SCAN TABLE")
+        ]
+        assert not scans, "{} scans: {}".format(query, details)
+
+
+def test_migrations_bring_template_to_latest(empty_db: DBHandler):
+    """A template database ends up with every migration and its indexes."""
+    migrator_version = empty_db.conn.execute(
+        "PRAGMA user_version"
+    ).fetchone()[0]
+    indexes = {
+        x[0] for x in empty_db.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )
+    }
+
+    assert migrator_version == MIGRATIONS[-1].version
+    assert {
+        "IDX_ACTIVITIES_WEEK", "IDX_ACTIVITIES_DATE", "IDX_WEEKS_UNIX",
+        "IDX_DEBTS_WEEK", "IDX_ACTIVITIES_FINGERPRINT",
+        "IDX_ATHLETES_STRAVA_NAME", "IDX_ZAPIER_UPLOAD_TIME",
+    } <= indexes
+    assert pd.Series(sorted(indexes)).is_unique
+
+
+def test_dry_run_leaves_the_database_untouched(template: sqlite3.Connection):
+    """A dry run returns the plan without applying anything."""
+    migrator = SchemaMigrator(template)
+    plan = migrator.migrate(dry_run=True)
+
+    assert [x["version"] for x in plan] == [x.version for x in MIGRATIONS]
+    assert migrator.current_version == 0
+    assert len(migrator.pending()) == len(MIGRATIONS)
+
+
+def test_migrate_is_idempotent(template: sqlite3.Connection):
+    """Migrating twice applies every migration once."""
+    migrator = SchemaMigrator(template)
+    migrator.migrate()
+    schema = template.execute(
+        "SELECT sql FROM sqlite_master ORDER BY name"
+    ).fetchall()
+
+    assert migrator.current_version == migrator.latest_version
+    assert migrator.migrate() == []
+    assert template.execute(
+        "SELECT sql FROM sqlite_master ORDER BY name"
+    ).fetchall() == schema
+
+
+def test_interrupted_migration_is_applied_again(template: sqlite3.Connection):
+    """Steps of a migration interrupted halfway can run again."""
+    migration = MIGRATIONS[0]
+    migration.apply(template.cursor())
+
+    migrator = SchemaMigrator(template)
+    migrator.migrate()
+
+    assert migrator.current_version == migrator.latest_version
+
+
+def test_failed_migration_rolls_back(template: sqlite3.Connection):
+    """A failing migration keeps neither its changes nor its version."""
+    broken = Migration(
+        1,
+        "broken",
+        statements=[
+            "CREATE TABLE PARTIAL (id INTEGER)",
+            "INSERT INTO MISSING VALUES (1)",
+        ],
+    )
+
+    with pytest.raises(sqlite3.OperationalError):
+        SchemaMigrator(template, [broken]).migrate()
+
+    assert template.execute("PRAGMA user_version").fetchone()[0] == 0
+    assert not template.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'PARTIAL'"
+    ).fetchone()
+
+
+def test_checkpoints_are_kept_as_daily_ones(template: sqlite3.Connection):
+    """Checkpoints saved before polls had their own are daily ones."""
+    SchemaMigrator(template, MIGRATIONS[:7]).migrate()
+    template.execute(
+        "INSERT INTO INGEST_CHECKPOINTS VALUES ('2023-04-05', 12, 1)"
+    )
+
+    SchemaMigrator(template).migrate()
+
+    assert template.execute(
+        "SELECT date, kind, position, completed FROM INGEST_CHECKPOINTS"
+    ).fetchall() == [("2023-04-05", "daily", 12, 1)]
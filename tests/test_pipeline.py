@@ -0,0 +1,181 @@
+import pandas as pd
+import pytest
+from stravalib.model import Activity as StravaActivity
+
+from strava_reporter.activities import dict_hash
+from strava_reporter.athletes import Athletes
+from strava_reporter.handlers.connections import CONNECTION_POOL
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.pipeline import deduplicate, ingest, normalize
+from strava_reporter.utils.time import date_to_unix, str_to_timestamp
+
+from .conftest import _remove_database
+from .helpers import ATHLETES, Interrupted, ListSource, club_activity
+
+TODAY = str_to_timestamp("2023-04-05")
+YESTERDAY = "2023-04-04"
+
+
+def _activity_ids(db: DBHandler) -> list:
+    res = db.conn.execute("SELECT activity_id FROM ACTIVITIES")
+    return [x[0] for x in res]
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_first_ingest_after_upgrade_skips_legacy_activities(
+        empty_db: DBHandler
+):
+    """Activities saved before fingerprints existed are not saved again."""
+    _remove_database()
+    legacy_db = DBHandler(migrate=False)
+    assert legacy_db.conn.execute("PRAGMA user_version").fetchone()[0] == 0
+
+    # Rows as the code before the upgrade saved them: the id is the hash of
+    # the activity normalized by stravalib together with its date.
+    old = [
+        club_activity(strava_name, name="Evening Run")
+        for _, strava_name in ATHLETES
+    ]
+    with legacy_db.transaction() as cur:
+        cur.execute(
+            "INSERT INTO WEEKS VALUES (1, '2023-04-03', '2023-04-09', ?, ?)",
+            (date_to_unix("2023-04-03"), date_to_unix("2023-04-10") - 1),
+        )
+        for name, strava_name in ATHLETES:
+            cur.execute(
+                "INSERT INTO ATHLETES VALUES (?, ?, 1, 0)",
+                (name, strava_name),
+            )
+        for raw in old:
+            normalized = StravaActivity.parse_obj(raw).to_dict()
+            normalized["date"] = YESTERDAY
+            cur.execute(
+                "INSERT INTO ACTIVITIES VALUES (?, 1, ?, ?, 1800, ?, ?)",
+                (
+                    dict_hash(normalized),
+                    raw["name"],
+                    "{} {}".format(
+                        raw["athlete"]["firstname"],
+                        raw["athlete"]["lastname"],
+                    ),
+                    YESTERDAY,
+                    date_to_unix(YESTERDAY),
+                ),
+            )
+    CONNECTION_POOL.close_all()
+
+    db = DBHandler()
+    new = [club_activity("Daniel L.", name="Lunch Ride")]
+    source = ListSource(new + old)
+    pipeline = ingest(db, Athletes(), source, TODAY)
+
+    assert pipeline.saved == 1
+    assert source.read == 2
+    assert len(_activity_ids(db)) == len(old) + 1
+    saved = db.get_weekly_activities(1, as_frame=True)
+    assert saved.loc[saved["date"] == str(TODAY)[:10], "name"].tolist() == [
+        "Lunch Ride"
+    ]
+    assert pd.Series(_activity_ids(db)).is_unique
+
+
+def test_fingerprint_does_not_depend_on_the_date():
+    """The same activity on two dates has one fingerprint and two ids."""
+    raw = club_activity("Daniel L.")
+    (_, fingerprint), = normalize([raw])
+    (_, dated_fingerprint), = normalize([{**raw, "date": "2023-04-04"}])
+    today, = deduplicate(normalize([raw]), TODAY, set())
+    tomorrow, = deduplicate(
+        normalize([raw]), TODAY + pd.Timedelta(days=1), set()
+    )
+
+    assert fingerprint == today.fingerprint == tomorrow.fingerprint
+    assert dated_fingerprint != fingerprint
+    assert today.activity_id != tomorrow.activity_id
+
+
+def test_deduplicate_stops_at_the_first_known_activity():
+    """Nothing after a known fingerprint is read."""
+    feed = [
+        club_activity("Daniel L.", name="Run {}".format(i)) for i in range(5)
+    ]
+    known = {fp for _, fp in normalize(feed[2:3])}
+    read = []
+
+    def counted():
+        for item in normalize(feed):
+            read.append(item)
+            yield item
+
+    new = list(deduplicate(counted(), TODAY, known))
+
+    assert [x.name for x in new] == ["Run 0", "Run 1"]
+    assert len(read) == 3
+
+
+@pytest.mark.parametrize(
+    "window_days, include_today, expected",
+    [(1, False, {"Day 1"}), (2, False, {"Day 1", "Day 2"}),
+     (1, True, {"Day 0", "Day 1"})],
+)
+def test_known_fingerprints_cover_the_window(
+        db: DBHandler,
+        window_days: int,
+        include_today: bool,
+        expected: set
+):
+    """Only the fingerprints of the days within the window are known."""
+    date = str_to_timestamp("2023-04-07")
+    source = ListSource([])
+    fingerprints = {}
+    for days_ago in (3, 2, 1, 0):
+        raw = club_activity("Daniel L.", name="Day {}".format(days_ago))
+        fingerprints["Day {}".format(days_ago)] = next(normalize([raw]))[1]
+        source.activities.insert(0, raw)
+        ingest(db, Athletes(), source, date - pd.Timedelta(days=days_ago))
+
+    known = db.get_known_fingerprints(date, window_days, include_today)
+
+    assert known == {fingerprints[x] for x in expected}
+
+
+@pytest.mark.parametrize("include_today", [False, True])
+def test_resume_reads_activities_posted_after_the_interruption(
+        db: DBHandler,
+        include_today: bool
+):
+    """A resumed ingest saves the new top activities and skips saved ones."""
+    old = [
+        club_activity("Maryfer G.", name="Old {}".format(i)) for i in (0, 1)
+    ]
+    ingest(db, Athletes(), ListSource(old), TODAY - pd.Timedelta(days=1))
+
+    feed = [
+        club_activity("Daniel L.", name="Run {}".format(i)) for i in range(5)
+    ] + old
+    with pytest.raises(Interrupted):
+        ingest(
+            db, Athletes(), ListSource(feed, fail_after=4), TODAY,
+            batch_size=2, include_today=include_today
+        )
+    assert db.get_ingest_checkpoint(str(TODAY)[:10]) == (4, False)
+
+    posted = [
+        club_activity("Ana Barbara G.", name="New {}".format(i))
+        for i in (0, 1)
+    ]
+    source = ListSource(posted + feed)
+    pipeline = ingest(
+        db, Athletes(), source, TODAY,
+        batch_size=2, include_today=include_today
+    )
+
+    assert pipeline.resumed
+    assert pipeline.saved == 3
+    assert source.read == len(posted) + len(feed) - len(old) + 1
+    assert db.get_ingest_checkpoint(str(TODAY)[:10])[1]
+    saved = db.get_weekly_activities(1, as_frame=True)
+    today = saved.loc[saved["date"] == str(TODAY)[:10], "name"]
+    assert sorted(today) == ["New 0", "New 1"] + [
+        "Run {}".format(i) for i in range(5)
+    ]
@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+from typing import List
+
+import pandas as pd
+import pytest
+
+from strava_reporter.athletes import Athletes
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.handlers.zapier import (ATHLETE, COLUMNS, ELAPSED_TIME,
+                                             NAME, LocalWorksheet,
+                                             ZapierMirror)
+from strava_reporter.pipeline import ingest
+from strava_reporter.reconcile import get_zapier_columns, reconcile
+from strava_reporter.utils.time import str_to_timestamp, timestamp_to_unix
+
+from .helpers import ListSource, club_activity
+
+TODAY = str_to_timestamp("2023-04-05")
+
+
+def _row(
+        athlete: str,
+        name: str,
+        elapsed_time: int = 1800,
+        day: pd.Timestamp = TODAY
+) -> List[str]:
+    return [athlete, name, elapsed_time, timestamp_to_unix(day) + 3600]
+
+
+def _mirror(db: DBHandler, rows: List[List[str]], header=COLUMNS):
+    return ZapierMirror(db, LocalWorksheet([list(header)] + rows))
+
+
+def _ingest(db: DBHandler, date: pd.Timestamp, names: List[str]):
+    # Distances tell apart activities with the same name and duration.
+    source = ListSource(
+        [
+            club_activity("Daniel L.", name=x, distance=5000.0 + i)
+            for i, x in enumerate(names)
+        ]
+    )
+    ingest(db, Athletes(), source, date)
+
+
+def test_activities_are_matched_one_to_one(db: DBHandler):
+    """Repeated activities only match as many ingested ones."""
+    _ingest(db, TODAY - pd.DateOffset(days=1), ["Late Run"])
+    _ingest(db, TODAY, ["Morning Run", "Morning Run", "Not in Zapier"])
+    rows = [
+        _row("Daniel L.", "Morning Run"),
+        _row(" daniel  l. ", "Morning Run"),
+        _row("Daniel L.", "Morning Run"),
+        _row("Daniel L.", "Late Run"),
+        _row("Daniel L.", "Morning Run", elapsed_time=1801),
+        _row("Daniel L.", "Other Day", day=TODAY + pd.DateOffset(days=1)),
+    ]
+
+    reconciliation = reconcile(db, TODAY, _mirror(db, rows))
+
+    assert reconciliation.matched == 3
+    assert [x[NAME] for x in reconciliation.missing] == [
+        "Morning Run", "Morning Run"
+    ]
+    assert reconciliation.unmatched == 1
+
+
+def test_backfill_saves_the_missing_activities(db: DBHandler):
+    """Missing activities with a duration are saved on the date."""
+    _ingest(db, TODAY, ["Morning Run"])
+    mirror = _mirror(
+        db,
+        [
+            _row("Daniel L.", "Morning Run"),
+            _row("Maryfer G.", "Swim", elapsed_time=2400),
+            _row("Maryfer G.", "No duration", elapsed_time=""),
+        ],
+    )
+
+    days = reconcile(db, TODAY, mirror).backfill(db, 1)
+
+    assert days == {("Maryfer G.", timestamp_to_unix(TODAY))}
+    saved = db.get_weekly_activities(1, as_frame=True)
+    assert sorted(saved["name"]) == ["Morning Run", "Swim"]
+
+    reconciliation = reconcile(db, TODAY, mirror)
+    assert reconciliation.matched == 2
+    assert [x[NAME] for x in reconciliation.missing] == ["No duration"]
+
+
+def test_records_without_the_columns_are_an_error(db: DBHandler):
+    """A sheet with other columns fails instead of missing every record."""
+    _ingest(db, TODAY, ["Morning Run"])
+    header = ("Athlete Name", NAME, ELAPSED_TIME) + COLUMNS[3:]
+    mirror = _mirror(db, [_row("Daniel L.", "Morning Run")], header)
+
+    with pytest.raises(ValueError, match="no column {}".format(ATHLETE)):
+        reconcile(db, TODAY, mirror)
+
+    columns = {**get_zapier_columns(), "athlete": "Athlete Name"}
+    reconciliation = reconcile(db, TODAY, mirror, sync=False, columns=columns)
+    assert reconciliation.matched == 1
+
+
+def test_config_overrides_the_columns(monkeypatch: pytest.MonkeyPatch):
+    """Columns missing from the config come from the sheet definitions."""
+    monkeypatch.setattr(
+        "strava_reporter.reconcile.Config",
+        lambda: SimpleNamespace(zapier_columns={"name": "TITLE"}),
+    )
+
+    assert get_zapier_columns() == {
+        "athlete": ATHLETE, "name": "TITLE", "duration_secs": ELAPSED_TIME
+    }
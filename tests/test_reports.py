@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.reports import (_ArrowReportWriter, get_report_writer,
+                                     set_report_format)
+
+DAYS = [
+    "MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY",
+    "SUNDAY",
+]
+
+
+def _results(offset: int) -> pd.DataFrame:
+    data = pd.DataFrame({"ATHLETE": ["Ana Barbara González", "Daniel Llamas"]})
+    for i, day in enumerate(DAYS):
+        data[day] = [1 if i < 5 + offset else None, 1 if i < 2 else None]
+    data["TOTAL_DAYS"] = (data[DAYS] == 1).sum(axis=1)
+    return data
+
+
+def test_arrow_writer_is_abstract():
+    """The base of the typed writers cannot be used on its own."""
+    with pytest.raises(TypeError):
+        _ArrowReportWriter()
+
+
+@pytest.mark.parametrize("report_format", ["parquet", "feather"])
+def test_typed_reports_round_trip(empty_db: DBHandler, report_format: str):
+    """Weekly reports and the season dataset keep the results."""
+    set_report_format(report_format)
+    writer = get_report_writer()
+    for week_number in (1, 2):
+        writer.write(_results(week_number - 1), week_number)
+
+    weekly = writer.read(2)
+    season = writer.read_season()
+    athlete = writer.read_season([1], ["Daniel Llamas"])
+
+    assert writer.path(2).suffix == "." + report_format
+    assert weekly["TOTAL_DAYS"].tolist() == [6, 2]
+    assert weekly["SATURDAY"].tolist() == [1, 0]
+    assert sorted(season["week_number"].unique().tolist()) == [1, 2]
+    assert athlete["TOTAL_DAYS"].tolist() == [2]
+
+
+def test_csv_reports_are_kept_as_is(empty_db: DBHandler):
+    """Csv reports keep empty days and are not added to a season dataset."""
+    writer = get_report_writer("csv")
+    writer.write(_results(0), 1)
+
+    saved = writer.path(1).read_text().splitlines()
+
+    assert saved[0] == ",".join(["ATHLETE"] + DAYS + ["TOTAL_DAYS"])
+    assert saved[2] == "Daniel Llamas,1,1,,,,,,2"
+    assert writer.read(3) is None
@@ -0,0 +1,91 @@
+import argparse
+
+import pandas as pd
+import pytest
+
+from strava_reporter.__main__ import analyze, run
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.reports import REPORT_FOLDER, get_report_writer
+from strava_reporter.utils.time import date_to_unix
+
+from .helpers import ATHLETES
+
+WEEKS = [1, 2, 3, 4]
+
+
+def _ingest_season(db: DBHandler):
+    """Save (i + week) % 5 + 1 valid days of the i-th athlete every week."""
+    rows = []
+    for week_number in WEEKS:
+        dates = pd.date_range(
+            db.get_week_information(week_number)["week_start"], periods=7
+        )
+        for i, (_, strava_name) in enumerate(ATHLETES):
+            days = (i + week_number) % 5 + 1
+            for j, date in enumerate(str(x)[:10] for x in dates):
+                key = "{}-{}-{}".format(week_number, i, j)
+                # Days after the valid ones have a short activity.
+                rows.append((
+                    key, week_number, "Run", strava_name,
+                    1800 if j < days else 600, date, date_to_unix(date),
+                    "fp-" + key,
+                ))
+    db.add_activities(rows)
+
+
+def _namespace(**kwargs) -> argparse.Namespace:
+    defaults = {
+        "authorize": False,
+        "migrations": False,
+        "daemon": False,
+        "analysis_range": None,
+        "all_weeks": False,
+        "workers": None,
+        "test": False,
+    }
+    return argparse.Namespace(**{**defaults, **kwargs})
+
+
+def _weeks_completed(db: DBHandler) -> list:
+    res = db.conn.execute(
+        "SELECT weeks_completed FROM ATHLETES ORDER BY name"
+    )
+    return [x[0] for x in res]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize(
+    "option", [{"analysis_range": [1, 4]}, {"all_weeks": True}]
+)
+def test_season_matches_the_weekly_analyses(
+        db: DBHandler,
+        workers: int,
+        option: dict
+):
+    """Every week is reported as by its own analysis, plus a summary."""
+    _ingest_season(db)
+    weekly = {}
+    for week_number in WEEKS:
+        analyze(week_number)
+        weekly[week_number] = get_report_writer().read(week_number)
+    completed = _weeks_completed(db)
+    for week_number in WEEKS:
+        get_report_writer().path(week_number).unlink()
+
+    run(_namespace(workers=workers, **option))
+
+    for week_number, expected in weekly.items():
+        pd.testing.assert_frame_equal(
+            get_report_writer().read(week_number), expected
+        )
+    summary = pd.read_csv(REPORT_FOLDER / "season_summary.csv")
+    assert summary.columns.tolist() == (
+        ["ATHLETE"] + ["WEEK_{}".format(x) for x in WEEKS] + ["TOTAL_DAYS"]
+    )
+    assert summary["ATHLETE"].tolist() == [x[0] for x in ATHLETES]
+    for week_number, expected in weekly.items():
+        assert summary["WEEK_{}".format(week_number)].tolist() == (
+            expected["TOTAL_DAYS"].astype(int).tolist()
+        )
+    assert summary["TOTAL_DAYS"].tolist() == [14, 13, 12]
+    assert _weeks_completed(db) == completed
@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from strava_reporter.handlers.sources import (ActivitySource, ReplaySource,
+                                              get_activity_source,
+                                              read_fixture, record_activities)
+
+from .helpers import ATHLETES, ListSource, club_activity
+
+
+def _fixture(path: Path, n: int) -> List[dict]:
+    feed = [
+        club_activity(ATHLETES[i % 3][1], name="Run {}".format(i))
+        for i in range(n)
+    ]
+    path.write_text("".join(json.dumps(x) + "\n" for x in feed))
+    return feed
+
+
+def test_activity_source_is_abstract():
+    """Sources must implement the club activities stream."""
+    with pytest.raises(TypeError):
+        ActivitySource()
+
+
+@pytest.mark.parametrize(
+    "limit, offset, pages",
+    [(None, 0, 3), (10, 0, 1), (None, 95, 3), (10, 195, 2), (5, 100, 1)],
+)
+def test_replay_source_pages(
+        tmp_path: Path,
+        limit: int,
+        offset: int,
+        pages: int
+):
+    """Replays stream the recording and count a request per page."""
+    feed = _fixture(tmp_path / "feed.jsonl", 250)
+    sleeps = []
+    source = ReplaySource(
+        tmp_path / "feed.jsonl", per_page=100, latency=0.5,
+        sleep=sleeps.append,
+    )
+
+    activities = list(source.iter_club_activities(limit, offset))
+
+    stop = offset + limit if limit is not None else None
+    assert activities == feed[offset:stop]
+    assert source.api_calls == pages
+    assert sleeps == [0.5] * pages
+
+
+def test_recording_round_trip(tmp_path: Path):
+    """Recorded activities replay unchanged and in order."""
+    feed = [club_activity(x[1]) for x in ATHLETES]
+    path = tmp_path / "recording.jsonl"
+
+    assert list(record_activities(ListSource(feed).iter_club_activities(),
+                                  path)) == feed
+    assert list(read_fixture(path)) == feed
+    assert list(get_activity_source(str(path)).iter_club_activities()) == feed
+
+
+def test_athletes_in_club(tmp_path: Path):
+    """Club members are read from the recent activities."""
+    _fixture(tmp_path / "feed.jsonl", 20)
+    source = ReplaySource(tmp_path / "feed.jsonl")
+
+    assert source.get_athletes_in_club() == {
+        "Ana Barbara G.", "Daniel L.", "Maryfer G."
+    }
+
+
+def test_missing_recording_raises(tmp_path: Path):
+    """Unknown sources are reported before any ingest starts."""
+    with pytest.raises(FileNotFoundError):
+        get_activity_source(str(tmp_path / "missing.jsonl"))
@@ -0,0 +1,111 @@
+from typing import List
+
+import pytest
+
+from strava_reporter.handlers.sources import ReplayServer
+from strava_reporter.handlers.strava import ClubActivitiesFetcher, RateLimiter
+
+from .helpers import club_activity
+
+
+class FakeClock:
+    """Clock whose time only moves when something sleeps."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        """Set instance attributes."""
+        self.now = now
+        self.sleeps: List[float] = []
+
+    def time(self) -> float:
+        """Get the current time."""
+        return self.now
+
+    def sleep(self, seconds: float):
+        """Move the time forward."""
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _feed(n: int) -> list:
+    return [
+        club_activity("Daniel L.", name="Run {}".format(i)) for i in range(n)
+    ]
+
+
+def _fetcher(server: ReplayServer, clock: FakeClock, **kwargs):
+    limiter = RateLimiter(clock=clock.time, sleep=clock.sleep)
+    return ClubActivitiesFetcher(
+        "token", 1, base_url=server.url, rate_limiter=limiter, **kwargs
+    )
+
+
+@pytest.mark.parametrize("offset", [0, 30, 100])
+def test_pages_are_read_in_order(offset: int):
+    """Every activity after the offset is yielded once and in order."""
+    feed = _feed(250)
+    clock = FakeClock()
+    with ReplayServer(feed) as server:
+        fetcher = _fetcher(server, clock, per_page=100, max_workers=3)
+        names = [x["name"] for x in fetcher.iter_activities(offset=offset)]
+
+    assert names == [x["name"] for x in feed[offset:]]
+    assert clock.sleeps == []
+
+
+def test_limit_stops_before_later_pages():
+    """A limit within the first page only requests that page."""
+    with ReplayServer(_feed(250)) as server:
+        fetcher = _fetcher(server, FakeClock(), per_page=100)
+        activities = list(fetcher.iter_activities(limit=10))
+
+    assert len(activities) == 10
+    assert server.requests == 1
+
+
+def test_throttled_page_waits_retry_after():
+    """A 429 with 'Retry-After' waits through the limiter and retries."""
+    clock = FakeClock()
+    feed = _feed(250)
+    with ReplayServer(feed, throttle_every=2, retry_after=7) as server:
+        fetcher = _fetcher(server, clock, per_page=100, max_workers=1)
+        names = [x["name"] for x in fetcher.iter_activities()]
+
+    assert names == [x["name"] for x in feed]
+    assert server.requests == 5
+    assert clock.sleeps == [7.0, 7.0]
+
+
+def test_throttled_page_waits_for_next_window():
+    """A 429 without 'Retry-After' exhausts the short term window."""
+    clock = FakeClock(now=15 * 60 * 1000 + 10)
+    feed = _feed(150)
+    with ReplayServer(feed, throttle_every=2, retry_after=None) as server:
+        fetcher = _fetcher(server, clock, per_page=100, max_workers=1)
+        names = [x["name"] for x in fetcher.iter_activities()]
+
+    assert names == [x["name"] for x in feed]
+    # The window resets 890 s later; the limiter waits one more second.
+    assert clock.sleeps == [891]
+
+
+def test_daily_limit_raises():
+    """Requests stop once the long term limit is reached."""
+    clock = FakeClock()
+    limiter = RateLimiter(short_limit=5, long_limit=1, clock=clock.time)
+    limiter.acquire()
+
+    with pytest.raises(RuntimeError):
+        limiter.acquire()
+
+
+def test_short_limit_waits_for_reset():
+    """The request over the short term limit waits for the next window."""
+    clock = FakeClock(now=15 * 60 * 1000)
+    limiter = RateLimiter(
+        short_limit=2, clock=clock.time, sleep=clock.sleep
+    )
+    for _ in range(3):
+        limiter.acquire()
+
+    assert clock.sleeps == [15 * 60 + 1]
+    assert limiter.short_usage == 1
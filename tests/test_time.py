@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.utils.time import (DayBoundaries, Week, date_to_unix,
+                                        str_to_timestamp, unix_to_timestamp)
+
+HOUR = 60 * 60
+
+# Mexico City DST transitions: a 23 hour day and a 25 hour day.
+SPRING = "2022-04-03"
+FALL = "2022-10-30"
+
+
+def _next_day(date: str) -> str:
+    return str(str_to_timestamp(date) + pd.DateOffset(days=1))[:10]
+
+
+@pytest.mark.parametrize("date, hours", [(SPRING, 23), (FALL, 25)])
+def test_dst_days_have_their_local_length(date: str, hours: int):
+    """Local midnights of DST days are 23 or 25 hours apart."""
+    assert date_to_unix(_next_day(date)) - date_to_unix(date) == hours * HOUR
+
+
+@pytest.mark.parametrize(
+    "date", ["2022-04-02", SPRING, "2022-04-04", FALL, "2022-10-31"]
+)
+def test_midnights_round_trip(date: str):
+    """Converting a local midnight back gives the same date at 00:00."""
+    ts = unix_to_timestamp(date_to_unix(date))
+
+    assert str(ts)[:19] == "{} 00:00:00".format(date)
+    assert ts == str_to_timestamp(date)
+
+
+@pytest.mark.parametrize(
+    "monday, sunday, hours",
+    [("2022-03-28", SPRING, 167), ("2022-10-24", FALL, 169)],
+)
+def test_weeks_across_dst(monday: str, sunday: str, hours: int):
+    """Days of a DST week start at local midnight."""
+    week = Week(week_number=1, week_start=monday, week_end=sunday)
+    days = week.days_unix
+
+    assert days == [date_to_unix(x) for x in pd.date_range(monday, sunday)
+                    .strftime("%Y-%m-%d")]
+    end = week.day_boundaries.midnights[-1]
+    assert end - days[0] == hours * HOUR
+
+
+@pytest.mark.parametrize("date", [SPRING, FALL])
+def test_day_index_around_dst(date: str):
+    """Unix times are mapped to their local day around a transition."""
+    boundaries = DayBoundaries("2022-03-28", "2022-11-06")
+    start, end = date_to_unix(date), date_to_unix(_next_day(date))
+    position = list(boundaries.dates).index(date)
+
+    idx = boundaries.day_index([start - 1, start, start + 12 * HOUR, end - 1])
+
+    assert idx.tolist() == [position - 1, position, position, position]
+    assert boundaries.day_index([start - 400 * 24 * HOUR]).tolist() == [-1]
+    assert boundaries.day_index(np.array([], dtype=int)).tolist() == []
+
+
+def test_fill_weeks_across_dst(empty_db: DBHandler):
+    """Weeks filled over DST changes start and end at local midnights."""
+    empty_db.fill_weeks("2022-03-28", "2022-11-06")
+    weeks = empty_db.conn.execute(
+        "SELECT week_start, week_end, week_start_unix, week_end_unix "
+        "FROM WEEKS ORDER BY week_number"
+    ).fetchall()
+
+    assert len(weeks) == 32
+    for start, end, start_unix, end_unix in weeks:
+        assert start_unix == date_to_unix(start)
+        assert end_unix == date_to_unix(_next_day(end))
+    for (_, _, _, end_unix), (_, _, start_unix, _) in zip(weeks, weeks[1:]):
+        assert end_unix == start_unix
+
+    # The Monday after each transition belongs to the week it starts.
+    assert empty_db.get_week_number(str_to_timestamp("2022-04-04")) == 2
+    assert empty_db.get_week_number(str_to_timestamp("2022-10-31")) == 32
@@ -0,0 +1,201 @@
+import json
+import stat
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qsl
+
+import pytest
+
+from strava_reporter.handlers.tokens import TokenManager, TokenStore
+
+NOW = 1_700_000_000.0
+
+
+class FakeOAuthServer:
+    """Local stand-in of the Strava OAuth token endpoint."""
+
+    def __init__(self, expires_in: int = 6 * 3600):
+        """Set instance attributes."""
+        self.expires_in = expires_in
+        self.requests: List[Dict[str, str]] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = "http://127.0.0.1:{}/oauth/token".format(
+            self._server.server_address[1]
+        )
+
+    def __enter__(self) -> "FakeOAuthServer":
+        """Start serving in a background thread."""
+        threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        ).start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                form = dict(parse_qsl(self.rfile.read(length).decode()))
+                server.requests.append(form)
+                n = len(server.requests)
+                body = json.dumps({
+                    "access_token": "access-{}".format(n),
+                    "refresh_token": "refresh-{}".format(n),
+                    "expires_at": NOW + server.expires_in,
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def no_env_tokens(monkeypatch: pytest.MonkeyPatch):
+    """Environment without the tokens set up before the store existed."""
+    monkeypatch.delenv("REFRESH_TOKEN", raising=False)
+    monkeypatch.delenv("ACCESS_TOKEN", raising=False)
+
+
+def _manager(
+        server: FakeOAuthServer,
+        path: Path,
+        clock: List[float]
+) -> TokenManager:
+    return TokenManager(
+        1234,
+        "secret",
+        store=TokenStore(path),
+        token_url=server.url,
+        clock=lambda: clock[0],
+    )
+
+
+def test_authorization_code_is_exchanged(tmp_path: Path, no_env_tokens):
+    """The code grant posts the credentials and caches the tokens."""
+    path = tmp_path / "tokens.json"
+    with FakeOAuthServer() as server:
+        _manager(server, path, [NOW]).exchange_code("the-code")
+
+    assert server.requests == [{
+        "client_id": "1234",
+        "client_secret": "secret",
+        "grant_type": "authorization_code",
+        "code": "the-code",
+    }]
+    assert TokenStore(path).load() == {
+        "access_token": "access-1",
+        "refresh_token": "refresh-1",
+        "expires_at": NOW + server.expires_in,
+    }
+
+
+def test_cached_tokens_are_reused(tmp_path: Path, no_env_tokens):
+    """Valid cached tokens are read once and never requested again."""
+    path = tmp_path / "tokens.json"
+    TokenStore(path).save({
+        "access_token": "cached",
+        "refresh_token": "cached-refresh",
+        "expires_at": NOW + 3600,
+    })
+    with FakeOAuthServer() as server:
+        manager = _manager(server, path, [NOW])
+        tokens = [manager.get_access_token() for _ in range(3)]
+
+    assert tokens == ["cached"] * 3
+    assert server.requests == []
+
+
+def test_tokens_are_refreshed_before_they_expire(
+        tmp_path: Path,
+        no_env_tokens
+):
+    """Tokens are refreshed within the margin and the new ones are saved."""
+    path = tmp_path / "tokens.json"
+    TokenStore(path).save({
+        "access_token": "cached",
+        "refresh_token": "cached-refresh",
+        "expires_at": NOW + 3600,
+    })
+    clock = [NOW]
+    with FakeOAuthServer() as server:
+        manager = _manager(server, path, clock)
+        assert manager.get_access_token() == "cached"
+
+        # Still before 'expires_at', but within the refresh margin.
+        clock[0] = NOW + 3600 - manager.refresh_margin
+        assert manager.get_access_token() == "access-1"
+        assert manager.get_access_token() == "access-1"
+
+    assert [x["grant_type"] for x in server.requests] == ["refresh_token"]
+    assert server.requests[0]["refresh_token"] == "cached-refresh"
+    assert TokenStore(path).load()["refresh_token"] == "refresh-1"
+
+
+def test_refresh_token_of_the_environment_bootstraps_the_store(
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch
+):
+    """Without a store, the refresh token of the config is exchanged."""
+    monkeypatch.setenv("REFRESH_TOKEN", "env-refresh")
+    monkeypatch.setenv("ACCESS_TOKEN", "env-access")
+    path = tmp_path / "tokens.json"
+    with FakeOAuthServer() as server:
+        token = _manager(server, path, [NOW]).get_access_token()
+
+    assert token == "access-1"
+    assert server.requests[0]["refresh_token"] == "env-refresh"
+    assert TokenStore(path).load()["access_token"] == "access-1"
+
+
+def test_access_token_of_the_environment_is_used_as_is(
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch
+):
+    """An access token alone is used without expiration nor requests."""
+    monkeypatch.delenv("REFRESH_TOKEN", raising=False)
+    monkeypatch.setenv("ACCESS_TOKEN", "env-access")
+    with FakeOAuthServer() as server:
+        manager = _manager(server, tmp_path / "tokens.json", [NOW])
+        assert manager.get_access_token() == "env-access"
+
+    assert server.requests == []
+
+
+def test_missing_tokens_are_an_error(tmp_path: Path, no_env_tokens):
+    """Without any token, the authorization is required."""
+    with FakeOAuthServer() as server:
+        manager = _manager(server, tmp_path / "tokens.json", [NOW])
+        with pytest.raises(RuntimeError, match="--authorize"):
+            manager.get_access_token()
+
+
+def test_store_is_saved_atomically_and_privately(tmp_path: Path):
+    """Saved tokens replace the file in one step with owner-only access."""
+    path = tmp_path / "tokens.json"
+    path.write_text("{}")
+    path.chmod(0o644)
+    store = TokenStore(path)
+
+    store.save({"access_token": "a", "refresh_token": "r", "expires_at": 1})
+
+    assert store.load() == {
+        "access_token": "a", "refresh_token": "r", "expires_at": 1
+    }
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,113 @@
+from typing import List
+
+import pandas as pd
+import pytest
+
+from strava_reporter.handlers.database import DBHandler
+from strava_reporter.handlers.zapier import (UPLOAD_TIME, LocalWorksheet,
+                                             ZapierHandler, ZapierMirror)
+from strava_reporter.utils.time import str_to_timestamp, timestamp_to_unix
+
+HEADER = ["ATHLETE", "NAME", "ELAPSED_TIME", UPLOAD_TIME]
+DAY = str_to_timestamp("2023-04-05")
+
+
+def _row(i: int, day: pd.Timestamp = DAY) -> List[str]:
+    upload_time = timestamp_to_unix(day) + 60 * i
+    return ["Daniel L.", "Run {}".format(i), "1800", str(upload_time)]
+
+
+class FlakyWorksheet(LocalWorksheet):
+    """Worksheet whose range reads fail after a given number of them."""
+
+    def __init__(self, rows: List[List[str]], fail_after: int):
+        """Set instance attributes."""
+        super().__init__(rows)
+        self.fail_after = fail_after
+
+    def get_values(self, range_name: str) -> List[List[str]]:
+        """Read a range of whole rows, or fail."""
+        if self.fail_after == 0:
+            raise ConnectionError("Sheet unavailable.")
+        self.fail_after -= 1
+        return super().get_values(range_name)
+
+
+def test_sync_only_reads_appended_rows(empty_db: DBHandler):
+    """Every sync reads the rows after the last mirrored one by ranges."""
+    worksheet = LocalWorksheet([HEADER] + [_row(i) for i in range(5)])
+    mirror = ZapierMirror(empty_db, worksheet, chunk_size=2)
+
+    # Header, then rows 2-3, 4-5 and 6 (a short range ends the sync).
+    assert mirror.sync() == 5
+    assert worksheet.requests == mirror.api_calls == 4
+
+    assert mirror.sync() == 0
+    assert worksheet.requests == 6
+
+    for i in range(5, 7):
+        worksheet.append_row(_row(i))
+    assert mirror.sync() == 2
+    assert empty_db.get_last_zapier_row() == 8
+    assert mirror.count_activities(DAY) == 7
+
+
+def test_interrupted_sync_resumes_after_the_last_range(empty_db: DBHandler):
+    """Ranges committed before a failure are not read again."""
+    rows = [HEADER] + [_row(i) for i in range(5)]
+    mirror = ZapierMirror(empty_db, FlakyWorksheet(rows, 1), chunk_size=2)
+
+    with pytest.raises(ConnectionError):
+        mirror.sync()
+    assert empty_db.get_last_zapier_row() == 3
+
+    mirror = ZapierMirror(empty_db, LocalWorksheet(rows), chunk_size=2)
+    assert mirror.sync() == 3
+    assert mirror.count_activities(DAY) == 5
+
+
+def test_activities_are_counted_by_upload_day(empty_db: DBHandler):
+    """Counts are per local day; rows without an upload time are skipped."""
+    next_day = DAY + pd.DateOffset(days=1)
+    worksheet = LocalWorksheet([HEADER])
+    for i in range(3):
+        worksheet.append_row(_row(i))
+    for i in range(2):
+        worksheet.append_row(_row(i, next_day))
+    worksheet.append_row(["", "", "", ""])
+    worksheet.append_row(["Daniel L.", "No time", "1800", "n/a"])
+    mirror = ZapierMirror(empty_db, worksheet)
+
+    assert mirror.sync() == 7
+    assert mirror.count_activities(DAY - pd.DateOffset(days=1)) == 0
+    assert mirror.count_activities(DAY) == 3
+    assert mirror.count_activities(next_day) == 2
+    assert ZapierHandler(DAY, mirror).n_activities == 3
+
+
+def test_full_sync_rebuilds_the_mirror(empty_db: DBHandler):
+    """Rows edited in the sheet are only picked up by a full sync."""
+    worksheet = LocalWorksheet([HEADER] + [_row(i) for i in range(4)])
+    mirror = ZapierMirror(empty_db, worksheet)
+    mirror.sync()
+
+    # Two rows moved to the next day and one deleted.
+    next_day = DAY + pd.DateOffset(days=1)
+    worksheet.rows[1:] = [_row(0), _row(1, next_day), _row(2, next_day)]
+    mirror.sync()
+    assert mirror.count_activities(DAY) == 4
+
+    assert mirror.sync(full=True) == 3
+    assert empty_db.get_last_zapier_row() == 4
+    assert mirror.count_activities(DAY) == 1
+    assert mirror.count_activities(next_day) == 2
+
+
+def test_empty_sheet_is_not_read(empty_db: DBHandler):
+    """Without a header row, only the header is requested."""
+    worksheet = LocalWorksheet()
+    mirror = ZapierMirror(empty_db, worksheet)
+
+    assert mirror.sync() == 0
+    assert worksheet.requests == 1
+    assert mirror.count_activities(DAY) == 0